@@ -1,22 +1,29 @@
 import streamlit as st
 import pandas as pd
-from src.data_access import load_scheduling, save_scheduling
-from src.utils import filter_dataframe
-import io
+from src.data_access import load_dataset, get_data_version, list_snapshots, restore_in_background
+from src.changelog import ROW_ID
+from src.utils import filter_positions
+from src.grid import page_slice, sort_positions
+from src.exporter import EXPORT_FORMATS, get_export_job, refresh_export, submit_export
+from src.importer import import_file, preview
 import os
 from dotenv import load_dotenv
 
 # Carica variabili d'ambiente
 load_dotenv()
 
+# Paginazione della griglia: righe per pagina di default configurabili da .env
+DEFAULT_PAGE_SIZE = int(os.getenv("SCHEDULING_PAGE_SIZE", "100"))
+PAGE_SIZES = sorted({50, 100, 250, 500, 1000, DEFAULT_PAGE_SIZE})
+
 st.set_page_config(page_title="Scheduling", page_icon="📅", layout="wide")
 
 # =======================
 # GESTIONE DATI CONDIVISI
 # =======================
-# Inizializza session state per i dati condivisi
-if 'shared_scheduling_data' not in st.session_state:
-    st.session_state.shared_scheduling_data = None
+# Inizializza session state per i dati condivisi (il DataFrame vive nella cache di processo)
+if 'data_version' not in st.session_state:
+    st.session_state.data_version = None
     st.session_state.data_last_updated = None
 
 # Importa funzioni di utilità per i dati condivisi
@@ -70,12 +77,49 @@ if not st.session_state.authenticated:
 # =======================
 st.title("📅 Scheduling – Resource Planning")
 
-# Caricamento dati di schedulazione
-df = load_scheduling()
+# Caricamento dati di schedulazione (normalizzati e validati una volta per versione dei dati)
+dataset = load_dataset()
+df = dataset.frame()
+
+# Registra la versione dei dati condivisi se non è ancora stata impostata
+if st.session_state.data_version is None:
+    st.session_state.data_version = get_data_version()
+    st.session_state.data_last_updated = pd.Timestamp.now()
+
+
+def render_export_job(state_key: str, polling: bool = False) -> None:
+    """Status of the export job stored in ``state_key``; download once the file is ready."""
+    job = get_export_job(st.session_state.get(state_key) or "")
+    if job is None:
+        return
+    if job.active:
+        st.info(f"⏳ Export in preparazione ({job.rows} righe)... la pagina resta utilizzabile.")
+        return
+    if polling:
+        # Job concluso: rerun completo, così il riquadro viene registrato di nuovo senza polling
+        st.rerun()
+    if job.status == "failed":
+        st.error(f"❌ Export non riuscito: {job.error}")
+    elif not refresh_export(job):
+        st.warning("⚠️ Il file esportato è stato rimosso dalla pulizia degli export: avvia di nuovo l'export.")
+    else:
+        export_format = EXPORT_FORMATS[job.fmt]
+        # Il file viene letto da disco solo al click, non a ogni rerun della pagina
+        st.download_button(
+            label=f"📥 Scarica {export_format.label}",
+            data=job.path.read_bytes,
+            file_name=f"scheduling_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}{export_format.extension}",
+            mime=export_format.mime,
+            key=f"{state_key}_download",
+        )
+
+
+def show_export_job(state_key: str) -> None:
+    # Finché il job è in corso il riquadro si aggiorna da solo, senza rieseguire tutta la pagina
+    job = get_export_job(st.session_state.get(state_key) or "")
+    polling = job is not None and job.active
+    st.fragment(render_export_job, run_every=2 if polling else None)(state_key, polling)
 
-# Aggiorna i dati condivisi se non sono ancora stati impostati
-if st.session_state.shared_scheduling_data is None:
-    update_shared_data(df)
 
 # =======================
 # IMPORT/EXPORT DATI
@@ -86,31 +130,19 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📤 Esporta Dati")
-    # Opzioni di export
-    export_format = st.selectbox("Formato di esportazione", ["Excel (.xlsx)", "CSV (.csv)"])
+    # Opzioni di export: il file viene scritto a blocchi e riutilizzato finché i dati non cambiano
+    export_format = st.selectbox(
+        "Formato di esportazione",
+        list(EXPORT_FORMATS),
+        format_func=lambda fmt: EXPORT_FORMATS[fmt].label,
+    )
+    with st.expander("Colonne da esportare"):
+        export_columns = st.multiselect("Colonne", list(df.columns), default=list(df.columns), key="export_columns")
     
     if st.button("💾 Scarica Dati Correnti"):
-        if export_format == "Excel (.xlsx)":
-            # Export come Excel
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Scheduling', index=False)
-            buffer.seek(0)
-            st.download_button(
-                label="📥 Scarica Excel",
-                data=buffer.getvalue(),
-                file_name=f"scheduling_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-        else:
-            # Export come CSV
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="📥 Scarica CSV",
-                data=csv,
-                file_name=f"scheduling_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+        job = submit_export(df, export_format, dataset.version, columns=export_columns)
+        st.session_state.export_job = job.job_id
+    show_export_job("export_job")
 
 with col2:
     st.subheader("📥 Importa Dati")
@@ -122,45 +154,107 @@ with col2:
     
     if uploaded_file is not None:
         try:
-            if uploaded_file.name.endswith('.xlsx'):
-                new_df = pd.read_excel(uploaded_file)
-            else:
-                new_df = pd.read_csv(uploaded_file)
-            
-            st.success(f"✅ File caricato con successo! Righe: {len(new_df)}")
+            # Anteprima delle prime righe: il file completo viene letto a chunk durante l'import
+            if "import_summary" in st.session_state:
+                st.success(st.session_state.pop("import_summary"))
+            preview_df = preview(uploaded_file, uploaded_file.name)
+            st.success(f"✅ File caricato con successo! ({uploaded_file.size / 1024 / 1024:.1f} MB)")
             
             # Mostra preview dei dati
             with st.expander("👀 Anteprima dati caricati"):
-                st.dataframe(new_df.head(), use_container_width=True)
+                st.dataframe(preview_df, use_container_width=True)
             
             # Opzioni di import
+            import_modes = {
+                "Sostituisci tutti i dati": "replace",
+                "Aggiungi ai dati esistenti": "append",
+                "Aggiorna o inserisci (upsert)": "upsert",
+            }
             import_mode = st.radio(
                 "Modalità di import",
-                ["Sostituisci tutti i dati", "Aggiungi ai dati esistenti"],
-                help="Sostituisci: cancella tutto e usa i nuovi dati. Aggiungi: mantieni i dati esistenti e aggiungi i nuovi."
+                list(import_modes),
+                help="Sostituisci: cancella tutto e usa i nuovi dati. Aggiungi: mantieni i dati esistenti e aggiungi i nuovi. "
+                     "Upsert: aggiorna le righe esistenti (per ROW_ID o progetto + risorsa + anno) "
+                     "e inserisce solo quelle nuove; le righe invariate non vengono riscritte."
+            )
+            dry_run = st.checkbox(
+                "Solo verifica (dry run)",
+                help="Legge e valida il file a chunk senza salvare nulla: mostra righe, problemi e colonne mancanti."
             )
             
             if st.button("🔄 Applica Import", type="primary"):
-                if import_mode == "Sostituisci tutti i dati":
-                    save_scheduling(new_df)
-                    # Aggiorna i dati condivisi
-                    update_shared_data(new_df)
-                    st.success("✅ Dati sostituiti con successo e resi disponibili in tutte le sezioni!")
-                    st.info("🔄 I dati sono ora accessibili in Analytics e Chat. Ricarica le altre pagine per vedere i nuovi dati.")
-                    st.rerun()
+                progress_bar = st.progress(0.0, text="Import in corso...")
+                stats = import_file(
+                    uploaded_file,
+                    uploaded_file.name,
+                    mode=import_modes[import_mode],
+                    dry_run=dry_run,
+                    progress=lambda done, message: progress_bar.progress(done, text=message),
+                )
+                upsert_summary = (f"{stats.inserted} righe nuove, {stats.updated} aggiornate, "
+                                  f"{stats.unchanged} invariate, {stats.duplicates} duplicate nel file, "
+                                  f"{stats.ambiguous} con chiave ambigua, "
+                                  f"{stats.stale_ids} con ROW_ID non valido (abbinate per chiave)")
+                if dry_run:
+                    st.info(f"🔍 Verifica completata: {stats.rows} righe in {stats.chunks} blocchi, "
+                            f"{stats.rows_with_issues} con possibili problemi. Nessun dato è stato salvato.")
+                    if import_modes[import_mode] == "upsert":
+                        st.info(f"🔍 Upsert previsto: {upsert_summary}.")
+                    st.json(stats.as_dict())
                 else:
-                    # Aggiungi ai dati esistenti
-                    combined_df = pd.concat([df, new_df], ignore_index=True)
-                    save_scheduling(combined_df)
-                    # Aggiorna i dati condivisi
-                    update_shared_data(combined_df)
-                    st.success("✅ Dati aggiunti con successo e resi disponibili in tutte le sezioni!")
+                    # Aggiorna i dati condivisi (il dataset viene ricaricato dallo storage)
+                    update_shared_data(load_dataset().frame())
+                    if import_modes[import_mode] == "replace":
+                        st.success("✅ Dati sostituiti con successo e resi disponibili in tutte le sezioni!")
+                    elif import_modes[import_mode] == "upsert":
+                        # Il riepilogo sopravvive al rerun della pagina
+                        st.session_state["import_summary"] = f"✅ Upsert completato: {upsert_summary}."
+                    else:
+                        st.success("✅ Dati aggiunti con successo e resi disponibili in tutte le sezioni!")
                     st.info("🔄 I dati sono ora accessibili in Analytics e Chat. Ricarica le altre pagine per vedere i nuovi dati.")
                     st.rerun()
                     
         except Exception as e:
             st.error(f"❌ Errore nel caricamento del file: {str(e)}")
 
+# Snapshot deduplicati presi a ogni salvataggio: il ripristino riporta i file dati a quello scelto
+def render_restore_job(polling: bool = False) -> None:
+    """Progress of the background restore; a full rerun shows the restored data once it is done."""
+    future = st.session_state.get("restore_future")
+    if future is None:
+        return
+    if not future.done():
+        st.info("⏳ Ripristino in corso... la pagina resta utilizzabile.")
+        return
+    label = st.session_state.pop("restore_label", "")
+    del st.session_state["restore_future"]
+    error = future.exception()
+    if error is not None:
+        st.session_state["restore_summary"] = f"❌ Ripristino non riuscito: {error}"
+    else:
+        st.session_state["restore_summary"] = f"✅ Dati ripristinati allo snapshot del {label}."
+    st.rerun()
+
+
+with st.expander("🗂️ Snapshot e ripristino"):
+    if "restore_summary" in st.session_state:
+        summary = st.session_state.pop("restore_summary")
+        (st.success if summary.startswith("✅") else st.error)(summary)
+    snapshots = list_snapshots()
+    if not snapshots:
+        st.info("Nessuno snapshot disponibile.")
+    else:
+        snapshot_labels = {s.label(): s.snapshot_id for s in snapshots}
+        snapshot_label = st.selectbox("Snapshot", list(snapshot_labels))
+        restoring = st.session_state.get("restore_future") is not None
+        if st.button("♻️ Ripristina", disabled=restoring,
+                     help="Lo stato attuale viene salvato in uno snapshot prima del ripristino"):
+            # Il ripristino (snapshot, riscrittura dei file, ricarica) gira sull'executor I/O
+            st.session_state["restore_future"] = restore_in_background(snapshot_labels[snapshot_label])
+            st.session_state["restore_label"] = snapshot_label
+            restoring = True
+        st.fragment(render_restore_job, run_every=1 if restoring else None)(restoring)
+
 # Mostra informazioni sui dati condivisi
 show_data_update_info()
 
@@ -177,9 +271,51 @@ st.markdown("---")
 month_prefixes = ["gen","feb","mar","apr","mag","giu","lug","ago","set","ott","nov","dic"]
 month_cols = [c for c in df.columns if c[:3].lower() in month_prefixes]
 
-# Filtriamo solo su colonne non-mese
-non_month_df = df.drop(columns=month_cols, errors="ignore")
-filtered_non_month = filter_dataframe(non_month_df)
-filtered_full = df.loc[filtered_non_month.index]
+# Filtriamo solo su colonne non-mese (ROW_ID è un identificativo interno):
+# i filtri restituiscono le posizioni delle righe, senza frame intermedi
+filter_columns = [c for c in df.columns if c not in month_cols and c != ROW_ID]
+positions = filter_positions(df, filter_columns, dataset.profiles, dataset.index, dataset.text_index)
+
+# Griglia paginata lato server: al browser viene serializzata solo la pagina visibile
+grid_columns = [c for c in df.columns if c != ROW_ID]
+page_col1, page_col2, page_col3, page_col4 = st.columns([1, 2, 1, 1])
+with page_col1:
+    page_size = st.selectbox("Righe per pagina", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+with page_col2:
+    sort_by = st.selectbox("Ordina per", ["(nessuno)"] + grid_columns)
+with page_col3:
+    sort_ascending = st.radio("Ordine", ["Crescente", "Decrescente"], horizontal=True) == "Crescente"
+with page_col4:
+    total_rows = len(df) if positions is None else len(positions)
+    page_count = max((total_rows + page_size - 1) // page_size, 1)
+    page_number = st.number_input("Pagina", min_value=1, max_value=page_count, value=1, step=1)
+with st.expander("Colonne visibili"):
+    visible_columns = st.multiselect("Colonne", grid_columns, default=grid_columns)
+
+grid_page = page_slice(
+    df,
+    positions,
+    page=page_number,
+    page_size=page_size,
+    sort_by=None if sort_by == "(nessuno)" else sort_by,
+    ascending=sort_ascending,
+    columns=visible_columns,
+)
+st.caption(
+    f"Righe {grid_page.start + 1 if grid_page.total else 0}–{grid_page.end} di {grid_page.total} "
+    f"(pagina {grid_page.page}/{grid_page.pages}, {len(df)} righe totali)"
+)
+st.dataframe(grid_page.rows, use_container_width=True, hide_index=True)
+
+# Export della vista corrente: righe filtrate, nell'ordine e con le colonne visibili della griglia
+if st.button(f"📤 Esporta vista corrente ({grid_page.total} righe)"):
+    view_positions = sort_positions(df, positions, None if sort_by == "(nessuno)" else sort_by, sort_ascending)
+    job = submit_export(df, export_format, dataset.version, positions=view_positions, columns=visible_columns)
+    st.session_state.view_export_job = job.job_id
+show_export_job("view_export_job")
 
-st.dataframe(filtered_full, use_container_width=True)
+# Problemi di qualità dei dati rilevati alla normalizzazione (calcolati una volta per versione)
+issues = dataset.validation.issues
+if len(issues) > 0:
+    with st.expander(f"⚠️ {len(issues)} possibili problemi nei dati"):
+        st.dataframe(issues, use_container_width=True, hide_index=True)
@@ -0,0 +1,62 @@
+"""
+Coverage and latency of the local Chat query engine (src/chat_queries.py)
+on the data questions of benchmarks/intent_eval.jsonl, run against the
+current dataset: share of questions answered without the LLM, operation
+chosen for each one and per-question latency (first call and warm).
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_chat_queries --show
+"""
+import argparse
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.chat_queries import ChatQueryEngine
+from src.data_access import load_dataset
+
+EVAL_FILE = Path(__file__).with_name("intent_eval.jsonl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--show", action="store_true", help="print the operation chosen for each question")
+    args = parser.parse_args()
+
+    with open(EVAL_FILE, encoding="utf-8") as fh:
+        questions = [e["text"] for e in map(json.loads, filter(str.strip, fh)) if e["intent"] == "dati"]
+    dataset = load_dataset()
+
+    # Primo giro: include la costruzione del vocabolario delle entità e del blocco dei mesi
+    start = time.perf_counter()
+    ChatQueryEngine(dataset).parse(questions[0])
+    cold = time.perf_counter() - start
+
+    operations, latencies = Counter(), []
+    for question in questions:
+        start = time.perf_counter()
+        engine = ChatQueryEngine(dataset)
+        query = engine.parse(question)
+        result = engine.run(query) if query is not None else None
+        latencies.append(time.perf_counter() - start)
+        operations[query.operation if query is not None else "llm"] += 1
+        if args.show:
+            label = f"{query.operation}{query.describe()}" if query is not None else "-> LLM"
+            print(f"{question[:60]:<60} {label}")
+            if result is not None:
+                print(f"{'':<60} {len(result.table)} righe")
+
+    ms = np.asarray(latencies) * 1000
+    local = len(questions) - operations["llm"]
+    print(f"\nDomande sui dati: {len(questions)} su {len(dataset.frame())} righe di dataset")
+    print(f"Risposte locali: {local} ({local / len(questions):.0%}), all'LLM: {operations['llm']}")
+    print("Operazioni: " + ", ".join(f"{op}={n}" for op, n in operations.most_common()))
+    print(f"Prima domanda (vocabolario + blocco mesi): {cold * 1000:.1f} ms")
+    print(f"Latenza per domanda: p50 {np.median(ms):.1f} ms, p95 {np.percentile(ms, 95):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Stress benchmark: many sessions committing cell edits at the same time
+through commit_changes (single-writer queue, optimistic version check).
+
+Every writer reads the current data version, edits one cell of its own
+rows and commits with ``expected_version``; on StaleWriteError it reloads
+and retries. With --overlap the writers share their rows, so real
+conflicts are rejected. The run with --batch 1 applies one commit per
+pass (no group commit), the default lets the writer batch the queue.
+
+The change log goes to a temporary directory and compaction is disabled,
+so the data in data/ is only read.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_concurrent_writers --rows 100000 --writers 1 8 32 --commits 20
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_wide_aggregation import synthetic_schedule
+from src import data_access
+from src.changelog import ROW_ID, ChangeLog
+from src.commit_queue import COMMIT_BATCH_MAX, StaleWriteError
+from src.schema import apply_schema
+
+
+def setup(rows: int, log_dir: Path):
+    data_access._change_log = ChangeLog(log_dir / "changes.jsonl")
+    data_access._change_log.clear()
+    data_access.COMPACT_THRESHOLD = 10 ** 9
+    # Gli snapshot riguardano i file in data/ e hanno un benchmark dedicato (bench_snapshots)
+    data_access.SNAPSHOT_ON_COMMIT = False
+    df = synthetic_schedule(rows)
+    df[ROW_ID] = np.arange(rows)
+    data_access._history.reset()
+    data_access._set_shared(apply_schema(df), data_access.get_data_version())
+
+
+def writer(index: int, writers: int, commits: int, rows: int, overlap: bool, stats: dict, lock: threading.Lock):
+    rng = random.Random(index)
+    latencies, rejected = [], 0
+    for n in range(commits):
+        row_id = rng.randrange(rows) if overlap else rng.randrange(index, rows, writers)
+        while True:
+            version = data_access.load_dataset().version
+            start = time.perf_counter()
+            try:
+                data_access.commit_changes(updates={row_id: {"PLANNED_FTE": n}}, expected_version=version)
+                latencies.append(time.perf_counter() - start)
+                break
+            except StaleWriteError:
+                rejected += 1
+    with lock:
+        stats["latencies"] += latencies
+        stats["rejected"] += rejected
+
+
+def run(rows: int, writers: int, commits: int, batch: int, overlap: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(rows, Path(tmp))
+        data_access._commit_queue.batch_max = batch
+        stats, lock = {"latencies": [], "rejected": 0}, threading.Lock()
+        threads = [
+            threading.Thread(target=writer, args=(i, writers, commits, rows, overlap, stats, lock))
+            for i in range(writers)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        written = data_access.flush_changes()
+        elapsed = time.perf_counter() - start
+        lines = len(data_access._change_log.read())
+    latencies = sorted(stats["latencies"])
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "rejected": stats["rejected"],
+        "log_ops": lines,
+        "written": written,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--commits", type=int, default=20, help="commits per writer")
+    parser.add_argument("--overlap", action="store_true", help="writers edit the same rows")
+    args = parser.parse_args()
+
+    print(f"{'writers':>7} | {'batch':>5} | {'commits/s':>9} | {'p50 ms':>7} | {'p95 ms':>7} | {'rejected':>8} | {'log ops':>7}")
+    print("-" * 68)
+    for writers in args.writers:
+        for batch in (1, COMMIT_BATCH_MAX):
+            r = run(args.rows, writers, args.commits, batch, args.overlap)
+            print(f"{writers:>7} | {batch:>5} | {r['throughput']:>9.1f} | {r['p50']:>7.1f} | {r['p95']:>7.1f} | "
+                  f"{r['rejected']:>8} | {r['log_ops']:>7}")
+
+
+if __name__ == "__main__":
+    main()
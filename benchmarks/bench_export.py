@@ -0,0 +1,54 @@
+"""
+Benchmark: export of the scheduling table, the old in-memory path
+(ExcelWriter into a BytesIO + getvalue, one big to_csv string) versus the
+block-wise writers of src/exporter.py (write-only workbook, appended CSV,
+Parquet row groups) writing to data/exports/.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_export --rows 5000 20000
+"""
+import argparse
+import io
+
+import pandas as pd
+
+from benchmarks.bench_wide_aggregation import measure, synthetic_schedule
+from src.exporter import export_file
+from src.schema import apply_schema
+
+
+def in_memory(df, fmt):
+    if fmt == "csv":
+        return df.to_csv(index=False)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name="Scheduling", index=False)
+    return buffer.getvalue()
+
+
+def streamed(df, fmt):
+    # Senza versione: nessun riuso, il file viene sempre riscritto
+    path = export_file(df, fmt)
+    path.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[5_000, 20_000])
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'format':<8} | {'path':<9} | {'time (ms)':>10} | {'peak mem (MB)':>13}")
+    print("-" * 62)
+    for rows in args.rows:
+        df = apply_schema(synthetic_schedule(rows))
+        for fmt in ("xlsx", "csv"):
+            for name, func in (("in-memory", in_memory), ("streamed", streamed)):
+                elapsed, peak, _ = measure(func, df, fmt, repeat=args.repeat)
+                print(f"{rows:>10} | {fmt:<8} | {name:<9} | {elapsed * 1000:>10.1f} | {peak:>13.1f}")
+        elapsed, peak, _ = measure(streamed, df, "parquet", repeat=args.repeat)
+        print(f"{rows:>10} | {'parquet':<8} | {'streamed':<9} | {elapsed * 1000:>10.1f} | {peak:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: multi-filter view of the Scheduling grid, sequential pandas
+filtering (one intermediate DataFrame per filter, then df.loc re-index)
+versus the planned predicate evaluation of src/filters.py.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_filters --rows 100000 1000000
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_wide_aggregation import measure, synthetic_schedule
+from src.dataset import ColumnProfiles
+from src.filters import InPredicate, RangePredicate, TextPredicate, evaluate
+from src.schema import apply_schema
+
+
+def sequential(df):
+    out = df.drop(columns=["gen", "feb", "mar"])
+    out = out[out["USER"].astype(str).str.contains("User 1")]
+    out = out[out["PLANNED_FTE"].between(10, 60)]
+    out = out[out["STATUS"].isin(["Status 1", "Status 2"])]
+    out = out[out["AREA_CC"].isin(["Area 0", "Area 1", "Area 2", "Area 3", "Area 4", "Area 5", "Area 6", "Area 7"])]
+    return df.loc[out.index]
+
+
+PREDICATES = [
+    TextPredicate("USER", "User 1"),
+    RangePredicate("PLANNED_FTE", 10, 60),
+    InPredicate("STATUS", ("Status 1", "Status 2")),
+    InPredicate("AREA_CC", ("Area 0", "Area 1", "Area 2", "Area 3", "Area 4", "Area 5", "Area 6", "Area 7")),
+]
+
+
+def planned(df, profiles):
+    return df.iloc[evaluate(df, PREDICATES, profiles)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'path':<10} | {'time (ms)':>10} | {'peak mem (MB)':>13}")
+    print("-" * 54)
+    for rows in args.rows:
+        df = apply_schema(synthetic_schedule(rows))
+        profiles = ColumnProfiles(df)
+        for column in ("USER", "PLANNED_FTE", "STATUS", "AREA_CC"):
+            profiles[column]  # profili calcolati una volta, come nella cache per versione
+        seq_t, seq_mem, seq = measure(sequential, df, repeat=args.repeat)
+        plan_t, plan_mem, got = measure(planned, df, profiles, repeat=args.repeat)
+        assert np.array_equal(seq.index.to_numpy(), got.index.to_numpy())
+        print(f"{rows:>10} | {'sequential':<10} | {seq_t * 1000:>10.1f} | {seq_mem:>13.1f}")
+        print(f"{rows:>10} | {'planned':<10} | {plan_t * 1000:>10.1f} | {plan_mem:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Evaluation of the chat intent classifier (src/intent.py) on the labelled
+questions of benchmarks/intent_eval.jsonl: accuracy and latency of the
+rules, of the linear model and of their combination, with the share of
+questions left ambiguous (escalated to the LLM by the Chat page).
+
+--train refits the model on src/intent_examples.jsonl and rewrites
+src/intent_model.json before the evaluation. --llm also classifies every
+question with the Gemini prompt (needs google-genai and GOOGLE_API_KEY)
+and reports the accuracy and latency of the LLM-only and the
+local-then-LLM paths.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_intent --train
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+
+from src import intent
+from src.intent import IntentModel, classify_intent, classify_with_llm, evaluate, load_examples, rule_intent
+
+EVAL_FILE = Path(__file__).with_name("intent_eval.jsonl")
+
+
+def timed(classify, examples):
+    start = time.perf_counter()
+    labels = [classify(e["text"]) for e in examples]
+    elapsed = (time.perf_counter() - start) / len(examples)
+    correct = sum(label == e["intent"] for label, e in zip(labels, examples))
+    return correct / len(examples), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help="refit and save the model first")
+    parser.add_argument("--llm", action="store_true", help="also evaluate the Gemini classifier")
+    args = parser.parse_args()
+
+    if args.train:
+        train = load_examples()
+        model = IntentModel.train([e["text"] for e in train], [e["intent"] for e in train])
+        model.save()
+        intent._model = model
+        print(f"Model trained on {len(train)} examples (training accuracy "
+              f"{evaluate(train, lambda t: 'dati' if model.probability(t) >= 0.5 else 'generica')['accuracy']:.1%})")
+
+    examples = load_examples(EVAL_FILE)
+    model = intent.get_intent_model()
+    decisions = [classify_intent(e["text"]) for e in examples]
+    ruled = [(e, d) for e, d in zip(examples, decisions) if d.source == "regole"]
+    ambiguous = [d for d in decisions if d.ambiguous]
+
+    print(f"\n{len(examples)} labelled questions\n")
+    print(f"{'classifier':<26} | {'accuracy':>8} | {'coverage':>8} | {'µs/question':>11}")
+    print("-" * 63)
+    rule_accuracy = sum(d.intent == e["intent"] for e, d in ruled) / max(len(ruled), 1)
+    _, rule_time = timed(rule_intent, examples)
+    print(f"{'rules':<26} | {rule_accuracy:>8.1%} | {len(ruled) / len(examples):>8.1%} | {rule_time * 1e6:>11.1f}")
+    accuracy, model_time = timed(lambda t: "dati" if model.probability(t) >= 0.5 else "generica", examples)
+    print(f"{'model':<26} | {accuracy:>8.1%} | {1:>8.1%} | {model_time * 1e6:>11.1f}")
+    accuracy, local_time = timed(lambda t: classify_intent(t).intent, examples)
+    print(f"{'rules + model':<26} | {accuracy:>8.1%} | {1:>8.1%} | {local_time * 1e6:>11.1f}")
+    confident = [(e, d) for e, d in zip(examples, decisions) if not d.ambiguous]
+    confident_accuracy = sum(d.intent == e["intent"] for e, d in confident) / max(len(confident), 1)
+    print(f"{'rules + model (confident)':<26} | {confident_accuracy:>8.1%} | {len(confident) / len(examples):>8.1%} | "
+          f"{local_time * 1e6:>11.1f}")
+    print(f"\nAmbiguous (escalated to the LLM): {len(ambiguous)} of {len(examples)}")
+    for e, d in zip(examples, decisions):
+        if d.intent != e["intent"] and not d.ambiguous:
+            print(f"  wrong ({d.source}, {d.confidence:.2f}): {e['text']!r} -> {d.intent}")
+
+    if args.llm:
+        from google import genai
+        client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY"))
+        llm = {}
+        accuracy, llm_time = timed(lambda t: llm.setdefault(t, classify_with_llm(client, t, "gemini-2.5-flash")), examples)
+        print(f"\n{'LLM only':<26} | {accuracy:>8.1%} | {1:>8.1%} | {llm_time * 1e6:>11.1f}")
+        hybrid = [llm[e["text"]] if d.ambiguous else d.intent for e, d in zip(examples, decisions)]
+        accuracy = sum(h == e["intent"] for h, e in zip(hybrid, examples)) / len(examples)
+        print(f"{'local, LLM if ambiguous':<26} | {accuracy:>8.1%} | {1:>8.1%} | "
+              f"{local_time * 1e6 + llm_time * 1e6 * len(ambiguous) / len(examples):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Memory report: per-row footprint of the scheduling table before and after
+the typed schema of src/schema.py (categoricals, Arrow strings, small ints,
+float32 month block).
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_schema_memory                 # data/SCHEDULING.xlsx
+    python -m benchmarks.bench_schema_memory --rows 100000   # dati sintetici
+"""
+import argparse
+
+import pandas as pd
+
+from benchmarks.bench_wide_aggregation import synthetic_schedule
+from src.schema import apply_schema, compare_memory
+from src.storage import EXCEL_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=None, help="use synthetic data with this many rows")
+    args = parser.parse_args()
+
+    if args.rows:
+        raw = synthetic_schedule(args.rows)
+        source = f"synthetic, {args.rows} rows"
+    else:
+        raw = pd.read_excel(EXCEL_FILE, sheet_name="Scheduling")
+        source = f"{EXCEL_FILE.name}, {len(raw)} rows"
+
+    typed = apply_schema(raw.copy())
+    report = compare_memory(raw, typed)
+    print(f"Memory footprint per row ({source})")
+    with pd.option_context("display.width", 120, "display.max_rows", 200):
+        print(report.to_string())
+    total = report.loc["TOTAL"]
+    print(f"\nTotal: {total['bytes_per_row_before']:.1f} -> {total['bytes_per_row_after']:.1f} bytes/row "
+          f"({total['ratio']:.2f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: backup cost per commit, a full timestamped copy of the main
+store (the old create_backup) versus a deduplicated snapshot of the main
+store plus the change log (src/snapshots.py).
+
+Each commit appends a few update operations to the change log and is
+followed by one backup; the table reports the time per backup and the
+bytes added to the backup directory. Everything runs in a temporary
+directory, data/ is not touched.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_snapshots --rows 20000 100000 --commits 50
+"""
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.bench_wide_aggregation import synthetic_schedule
+from src.changelog import ROW_ID, ChangeLog, update_ops
+from src.schema import apply_schema
+from src.snapshots import SnapshotStore
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def run(rows: int, commits: int, mode: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        main_store = base / "SCHEDULING.parquet"
+        df = synthetic_schedule(rows)
+        df[ROW_ID] = np.arange(rows)
+        apply_schema(df).to_parquet(main_store, index=False)
+        log = ChangeLog(base / "changes.jsonl")
+        backups = base / "backups"
+        backups.mkdir()
+        store = SnapshotStore(root=backups, base_dir=base)
+        rng = np.random.default_rng(0)
+        elapsed = 0.0
+        for n in range(commits):
+            log.append(update_ops({int(rng.integers(rows)): {"PLANNED_FTE": n} for _ in range(5)}))
+            start = time.perf_counter()
+            if mode == "copy":
+                shutil.copy2(main_store, backups / f"SCHEDULING_backup_{n}.parquet")
+            else:
+                store.take([main_store, log.path], reason="commit")
+            elapsed += time.perf_counter() - start
+        return main_store.stat().st_size, elapsed / commits, dir_size(backups) / commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--commits", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'store (MB)':>10} | {'backup':<8} | {'ms/commit':>9} | {'KB added/commit':>15}")
+    print("-" * 63)
+    for rows in args.rows:
+        for mode in ("copy", "snapshot"):
+            size, per_commit, added = run(rows, args.commits, mode)
+            print(f"{rows:>8} | {size / 1e6:>10.1f} | {mode:<8} | {per_commit * 1000:>9.2f} | {added / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
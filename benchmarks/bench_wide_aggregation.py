@@ -0,0 +1,99 @@
+"""
+Benchmark: pie/trend FTE aggregation with the old melt-to-long path versus
+the wide-format NumPy primitives in src/aggregates.py.
+
+Usage (dalla root del repository):
+    python -m benchmarks.bench_wide_aggregation --rows 10000 100000 1000000
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.aggregates import MONTHS, pie_series, trend_series
+
+
+def synthetic_schedule(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Build a schedule-shaped DataFrame (metadata columns + 12 month columns)."""
+    rng = np.random.default_rng(seed)
+
+    def pick(prefix: str, n: int) -> np.ndarray:
+        return np.array([f"{prefix} {i}" for i in range(n)], dtype=object)[rng.integers(0, n, rows)]
+
+    df = pd.DataFrame({
+        "PROJECT_DESCR": pick("Project", max(rows // 20, 1)),
+        "USER": pick("User", 300),
+        "CLIENT": pick("Client", 80),
+        "PM_SM": pick("PM", 40),
+        "AREA_CC": pick("Area", 8),
+        "ITEM_TYPE": pick("Type", 6),
+        "DELIVERY_TYPE": pick("Delivery", 4),
+        "WORKSTREAM": pick("WS", 12),
+        "STATUS": pick("Status", 5),
+        "SOW_ID": pick("SOW", max(rows // 10, 1)),
+        "JIRA_KEY": pick("JIRA", max(rows // 10, 1)),
+        "JOB": pick("Job", 10),
+        "YEAR": rng.integers(2023, 2026, rows),
+        "START_DATE": pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "PLANNED_FTE": rng.integers(0, 100, rows),
+        "ACTUAL_FTE": rng.integers(0, 100, rows),
+    })
+    block = rng.integers(0, 20, (rows, len(MONTHS))).astype("float64")
+    block[rng.random(block.shape) < 0.3] = np.nan
+    for i, month in enumerate(MONTHS):
+        df[month] = block[:, i]
+    return df
+
+
+def melt_path(df: pd.DataFrame, dimension: str, month_cols):
+    long_df = df.melt(id_vars=df.columns.difference(month_cols), value_vars=month_cols,
+                      var_name="MONTH", value_name="FTE")
+    pie = long_df.groupby(dimension)["FTE"].sum()
+    trend = long_df.groupby("MONTH")["FTE"].sum()
+    return pie, trend
+
+
+def wide_path(df: pd.DataFrame, dimension: str, month_cols):
+    return pie_series(df, dimension, month_cols), trend_series(df, month_cols)
+
+
+def measure(func, *args, repeat: int = 3):
+    """Return (best wall time in seconds, peak traced memory in MB, result)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024 ** 2, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dimension", default="AREA_CC")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} | {'path':<5} | {'time (ms)':>10} | {'peak mem (MB)':>13}")
+    print("-" * 49)
+    for rows in args.rows:
+        df = synthetic_schedule(rows)
+        melt_t, melt_mem, (melt_pie, melt_trend) = measure(melt_path, df, args.dimension, MONTHS, repeat=args.repeat)
+        wide_t, wide_mem, (wide_pie, wide_trend) = measure(wide_path, df, args.dimension, MONTHS, repeat=args.repeat)
+        # I due percorsi devono produrre gli stessi numeri
+        np.testing.assert_allclose(melt_pie.sort_index().to_numpy(), wide_pie.sort_index().to_numpy())
+        np.testing.assert_allclose(melt_trend.reindex(MONTHS).to_numpy(), wide_trend.to_numpy())
+        print(f"{rows:>10} | {'melt':<5} | {melt_t * 1000:>10.1f} | {melt_mem:>13.1f}")
+        print(f"{rows:>10} | {'wide':<5} | {wide_t * 1000:>10.1f} | {wide_mem:>13.1f}")
+        del df
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-from src.data_access import load_scheduling, save_scheduling, load_lovs
+from src.data_access import load_dataset, commit_changes, load_lovs
+from src.changelog import ROW_ID
+from src.commit_queue import StaleWriteError
+from src.schema import to_editable
 from streamlit_tags import st_tags
 
 # ---------------------- PAGE LAYOUT ----------------------
@@ -12,46 +15,15 @@ st.title("📋 Manage Projects")
 from src.utils import show_data_update_info, update_shared_data
 show_data_update_info()
 
-# Load data and ensure optional columns exist
-df = load_scheduling()
-# Ensure text-based metadata columns exist and are stored as strings/object dtype
-for optional_col in ["PM", "CLIENT", "ITEM_TYPE", "DELIVERY_TYPE"]:
-    if optional_col not in df.columns:
-        # create empty string column so dtype becomes 'object'
-        df[optional_col] = ""
-    else:
-        # Cast to string to guarantee compatibility with TextColumn in data_editor
-        df[optional_col] = df[optional_col].fillna("").astype(str)
-
-# Ensure YEAR_OF_COMPETENCE is consistently string type to avoid Arrow conversion issues
-if "YEAR_OF_COMPETENCE" in df.columns:
-    df["YEAR_OF_COMPETENCE"] = df["YEAR_OF_COMPETENCE"].fillna("").astype(str)
-else:
-    df["YEAR_OF_COMPETENCE"] = ""
-
-# Ensure other text columns are also strings
-text_columns = ["PM_SM", "WORKSTREAM", "SOW_ID", "JIRA_KEY", "PROJECT_STREAM", "AREA_CC", "JOB", "STATUS"]
-for col in text_columns:
-    if col in df.columns:
-        df[col] = df[col].fillna("").astype(str)
-    else:
-        df[col] = ""
+# Dataset normalizzato una sola volta per versione dei dati (tipi e colonne opzionali già applicati)
+dataset = load_dataset()
+df, entity_index = dataset.frame(), dataset.index
 
-# Ensure numeric columns are properly typed
-numeric_columns = ["YEAR", "PROGRESS_%", "PLANNED_FTE", "ACTUAL_FTE"]
-for col in numeric_columns:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-    else:
-        df[col] = 0
-
-# Helper per colonne mese
-month_prefixes = ["gen","feb","mar","apr","mag","giu","lug","ago","set","ott","nov","dic"]
-# Escludiamo colonne derivate che terminano con '1'
-month_cols = [c for c in df.columns if c[:3].lower() in month_prefixes and not c.lower().endswith("1")]
+# Colonne mese (escluse le derivate che terminano con '1')
+month_cols = dataset.month_cols
 
 # Suggerimenti per USER basati su dataset esistente
-user_suggestions = sorted(df["USER"].dropna().unique())
+user_suggestions = entity_index.values("USER")
 
 # ---------------------- ADD PROJECT ----------------------
 st.header("Add a new project")
@@ -205,8 +177,8 @@ if submitted:
             new_rows.append(base_record)
             st.warning("Nessun USER inserito: il progetto sarà aggiunto senza allocazione risorse. Potrai modificarlo subito dopo.")
         if new_rows:
-            new_df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
-            save_scheduling(new_df)
+            # Solo le nuove righe vengono scritte (change log), non l'intero dataset
+            new_df = commit_changes(inserts=pd.DataFrame(new_rows))
             # Aggiorna i dati condivisi
             update_shared_data(new_df)
             st.success("Project added and visible in Schedule. Puoi modificarlo subito sotto.")
@@ -214,7 +186,7 @@ if submitted:
 
 # ---------------------- MODIFY / DELETE PROJECT ----------------------
 st.header("Edit or delete existing project")
-project_options = sorted(df["PROJECT_DESCR"].dropna().unique())
+project_options = entity_index.values("PROJECT_DESCR")
 # Multiselect mostra la scelta come "tag" con X per rimuoverla
 proj_selected_list = st.multiselect(
     "Select project (tag removable)",
@@ -226,7 +198,13 @@ proj_selected_list = st.multiselect(
 proj_selected = proj_selected_list[0] if proj_selected_list else None
 
 if proj_selected:
-    proj_df = df[df["PROJECT_DESCR"] == proj_selected].copy()
+    # Le righe del progetto sono indicizzate per ROW_ID: le modifiche vengono salvate riga per riga
+    # Le colonne categoriche diventano stringhe semplici per l'editor
+    proj_df = to_editable(entity_index.select(df, "PROJECT_DESCR", proj_selected).set_index(ROW_ID))
+    # Versione dei dati su cui è iniziata la modifica: al salvataggio le celle cambiate
+    # nel frattempo da altre sessioni vengono segnalate invece di essere sovrascritte
+    base_version_key = f"edit_base_version::{proj_selected}"
+    edit_base_version = st.session_state.setdefault(base_version_key, dataset.version)
 
     # Mostriamo editor per modificare allocazioni e metadati
     base_cols = [
@@ -329,41 +307,58 @@ if proj_selected:
             else:
                 to_keep = edited_df.copy()
 
-            df_no_proj = df[df["PROJECT_DESCR"] != proj_selected].copy()
-            # Assicuriamo INT per mesi e colonne riepilogo
-            for col_int in month_cols + ["YEAR", "PROGRESS_%", "PLANNED_FTE", "ACTUAL_FTE"]:
-                if col_int in to_keep.columns:
-                    to_keep[col_int] = pd.to_numeric(to_keep[col_int], errors="coerce").fillna(0).astype(int)
-            if "YEAR_OF_COMPETENCE" in to_keep.columns:
-                to_keep["YEAR_OF_COMPETENCE"] = to_keep["YEAR_OF_COMPETENCE"].astype(str)
+            # I tipi delle celle modificate vengono allineati allo schema da commit_changes
             # Aggiungiamo/aggiorniamo YEAR basato su START_DATE
             if "START_DATE" in to_keep.columns:
                 start_dates = pd.to_datetime(to_keep["START_DATE"], errors="coerce")
                 to_keep["YEAR"] = start_dates.dt.year.fillna(2024).astype(int)
-            if "YEAR" not in df_no_proj.columns and "START_DATE" in df_no_proj.columns:
-                start_dates = pd.to_datetime(df_no_proj["START_DATE"], errors="coerce")
-                df_no_proj["YEAR"] = start_dates.dt.year.fillna(2024).astype(int)
 
             # Rimuoviamo la colonna di servizio prima di salvare
             to_keep = to_keep.drop(columns=["DELETE"], errors="ignore")
-            updated_df = pd.concat([df_no_proj.drop(columns=["DELETE"], errors="ignore"), to_keep], ignore_index=True)
-            if not isinstance(updated_df, pd.DataFrame):
-                updated_df = pd.DataFrame(updated_df)
-            save_scheduling(updated_df)
-            # Aggiorna i dati condivisi
-            update_shared_data(updated_df)
-            st.success("Project updated and data shared across all sections.")
 
-            # Se non resta alcuna riga per il progetto, informare utente
-            if to_keep.empty:
-                st.info("Tutte le righe del progetto sono state eliminate. Il progetto non esisterà più nella schedule.")
+            # Salviamo solo le differenze: righe eliminate e celle modificate
+            deleted_ids = [row_id for row_id in edited_df.index if row_id not in to_keep.index]
+            updates = {}
+            for row_id, row in to_keep.iterrows():
+                changed = {}
+                for col in to_keep.columns:
+                    old_val, new_val = proj_df.at[row_id, col], row[col]
+                    if pd.isna(old_val) and pd.isna(new_val):
+                        continue
+                    try:
+                        is_changed = bool(old_val != new_val)
+                    except (TypeError, ValueError):
+                        is_changed = True
+                    if is_changed:
+                        changed[col] = new_val
+                if changed:
+                    updates[row_id] = changed
+
+            try:
+                updated_df = commit_changes(updates=updates, deletes=deleted_ids, expected_version=edit_base_version)
+            except StaleWriteError as e:
+                st.session_state.pop(base_version_key, None)
+                st.error(f"❌ Salvataggio non eseguito: {len(e.conflicts) or 'alcune'} righe sono state modificate "
+                         "da un'altra sessione. Ricarica la pagina e ripeti le modifiche.")
+            else:
+                st.session_state.pop(base_version_key, None)
+                # Aggiorna i dati condivisi
+                update_shared_data(updated_df)
+                st.success("Project updated and data shared across all sections.")
+
+                # Se non resta alcuna riga per il progetto, informare utente
+                if to_keep.empty:
+                    st.info("Tutte le righe del progetto sono state eliminate. Il progetto non esisterà più nella schedule.")
 
     with save_col2:
         if st.button("Delete project", type="primary"):
-            df_after = df[df["PROJECT_DESCR"] != proj_selected].copy()
-            if not isinstance(df_after, pd.DataFrame):
-                df_after = pd.DataFrame(df_after)
-            save_scheduling(df_after)
-            # Aggiorna i dati condivisi
-            update_shared_data(df_after)
-            st.success(f"Project '{proj_selected}' deleted and data shared across all sections.")
+            try:
+                df_after = commit_changes(deletes=proj_df.index.tolist(), expected_version=edit_base_version)
+            except StaleWriteError:
+                st.session_state.pop(base_version_key, None)
+                st.error("❌ Il progetto è stato modificato da un'altra sessione: ricarica la pagina prima di eliminarlo.")
+            else:
+                st.session_state.pop(base_version_key, None)
+                # Aggiorna i dati condivisi
+                update_shared_data(df_after)
+                st.success(f"Project '{proj_selected}' deleted and data shared across all sections.")
@@ -3,7 +3,15 @@ import os
 import pandas as pd
 from google import genai
 from dotenv import load_dotenv
-from src.data_access import load_scheduling
+from src.data_access import content_version, get_data_version, load_dataset
+from src.dataset import ScheduleDataset
+from src.text_index import normalize_text
+from src.chat_metrics import StageTimer, record_timings, stage_statistics
+from src.intent import classify_intent, classify_with_llm
+from src.chat_cache import get_chat_cache, image_digest
+from src.chat_queries import answer_locally
+from typing import Optional
+import json
 import difflib
 import base64
 from PIL import Image
@@ -64,6 +72,14 @@ if API_KEY:
 else:
     st.warning("⚠️ Imposta la variabile d'ambiente GOOGLE_API_KEY per utilizzare il chatbot.")
 
+# Modello Gemini usato dalla chat
+CHAT_MODEL = "gemini-2.5-flash"
+
+# Una sola chiamata LLM strutturata per domanda; 0 torna alla pipeline a tre chiamate
+CHAT_SINGLE_CALL = os.getenv("SCHEDULING_CHAT_SINGLE_CALL", "1") != "0"
+# Domande frequenti sui dati (filtri, FTE per mese, top progetti, sovraccarichi) risolte senza LLM
+CHAT_LOCAL_QUERIES = os.getenv("SCHEDULING_CHAT_LOCAL_QUERIES", "1") != "0"
+
 # Nome del chatbot
 BOT_NAME = "Schedulo"
 BOT_DESCRIPTION = "Sono Schedulo, il tuo assistente AI per la pianificazione, l'analisi e la gestione dei progetti e delle risorse. Posso rispondere a domande sui dati di scheduling, generare report, analizzare immagini e aiutarti a ottimizzare il lavoro del team."
@@ -72,77 +88,20 @@ def normalize_string(s):
     import re
     return re.sub(r'[^a-z0-9]', '', s.lower())
 
-def get_table_structure():
-    """Ottiene la struttura della tabella Scheduling per il contesto."""
+def get_table_structure(dataset: Optional[ScheduleDataset] = None) -> str:
+    """Ottiene la struttura della tabella Scheduling per il contesto (calcolata una volta per versione dei dati)."""
     try:
-        df = load_scheduling()
-        structure_info = f"""
-STRUTTURA TABELLA SCHEDULING:
-- Colonne totali: {len(df.columns)}
-- Righe totali: {len(df)}
-- Colonne principali:
-"""
-        
-        # Categorizza le colonne
-        project_cols = ["PROJECT_DESCR", "CLIENT", "PM_SM", "SOW_ID", "JIRA_KEY"]
-        classification_cols = ["ITEM_TYPE", "DELIVERY_TYPE", "WORKSTREAM", "PROJECT_STREAM", "AREA_CC"]
-        timeline_cols = ["START_DATE", "END_DATE", "YEAR", "YEAR_OF_COMPETENCE"]
-        resource_cols = ["USER", "JOB", "PLANNED_FTE", "ACTUAL_FTE", "STATUS", "PROGRESS_%"]
-        
-        # Colonne mese
-        month_prefixes = ["gen","feb","mar","apr","mag","giu","lug","ago","set","ott","nov","dic"]
-        month_cols = [c for c in df.columns if c[:3].lower() in month_prefixes and not c.lower().endswith("1")]
-        
-        structure_info += f"""
-  • Informazioni Progetto: {', '.join([col for col in project_cols if col in df.columns])}
-  • Classificazione: {', '.join([col for col in classification_cols if col in df.columns])}
-  • Timeline: {', '.join([col for col in timeline_cols if col in df.columns])}
-  • Gestione Risorse: {', '.join([col for col in resource_cols if col in df.columns])}
-  • Allocazioni Mensili: {', '.join(month_cols)}
-"""
-        
-        # Aggiungi esempi di valori per colonne importanti
-        structure_info += "\nESEMPI DI VALORI:\n"
-        
-        if "STATUS" in df.columns:
-            statuses = df["STATUS"].dropna().unique()[:5]
-            structure_info += f"  • STATUS: {', '.join(statuses)}\n"
-        
-        if "ITEM_TYPE" in df.columns:
-            item_types = df["ITEM_TYPE"].dropna().unique()[:5]
-            structure_info += f"  • ITEM_TYPE: {', '.join(item_types)}\n"
-        
-        if "USER" in df.columns:
-            users = df["USER"].dropna().unique()[:5]
-            structure_info += f"  • USER: {', '.join(users)}\n"
-        
-        if "CLIENT" in df.columns:
-            clients = df["CLIENT"].dropna().unique()[:5]
-            structure_info += f"  • CLIENT: {', '.join(clients)}\n"
-        
-        return structure_info
+        dataset = dataset if dataset is not None else load_dataset()
+        return dataset.chat_context.structure()
     except Exception as e:
         return f"Errore nel caricamento della struttura: {e}"
 
-def normalize(s):
-    import unicodedata, re
-    s = str(s).lower().strip()
-    s = unicodedata.normalize('NFKD', s)
-    s = ''.join(c for c in s if not unicodedata.combining(c))
-    s = re.sub(r'[^a-z0-9 ]', '', s)
-    return s
+# Stesse regole di normalizzazione dell'indice testuale (minuscole, senza accenti, solo [a-z0-9 ])
+normalize = normalize_text
 
-def query_scheduling_data(query_description: str) -> str:
+def query_scheduling_data(query_description: str, dataset: Optional[ScheduleDataset] = None) -> str:
     import pandas as pd
     import re
-    import unicodedata
-
-    def normalize(s):
-        s = str(s).lower().strip()
-        s = unicodedata.normalize('NFKD', s)
-        s = ''.join(c for c in s if not unicodedata.combining(c))
-        s = re.sub(r'[^a-z0-9 ]', '', s)
-        return s
 
     column_map = {
         'status': ['status', 'stato', 'ongoing', 'in progress', 'completato', 'completed', 'on hold', 'cancellato', 'cancelled', 'chiusi', 'chiuso', 'conclusi', 'terminati', 'closed'],
@@ -160,7 +119,7 @@ def query_scheduling_data(query_description: str) -> str:
         header = "| Progetto | PM | Cliente |\n|---|---|---|"
         lines = []
         if 'PROJECT_DESCR' in rows.columns:
-            grouped = rows.groupby('PROJECT_DESCR').first().reset_index()
+            grouped = rows.groupby('PROJECT_DESCR', observed=True).first().reset_index()
             for _, row in grouped.iterrows():
                 descr = str(row['PROJECT_DESCR']) if 'PROJECT_DESCR' in row else ''
                 pm = str(row['PM_SM']) if 'PM_SM' in row else ''
@@ -199,7 +158,8 @@ def query_scheduling_data(query_description: str) -> str:
             return make_bullet_list(lst)
 
     try:
-        df = load_scheduling()
+        dataset = dataset if dataset is not None else load_dataset()
+        df = dataset.frame()
         question = normalize(query_description)
         filter_col = None
         filter_value = None
@@ -229,9 +189,14 @@ def query_scheduling_data(query_description: str) -> str:
             return ("Non ho capito su quale campo filtrare. Puoi chiedere per: status, cliente, project manager, utente, progetto, tipologia, delivery type. ")
         if filter_col not in df.columns:
             return f"La colonna '{filter_col}' non esiste nei dati. Colonne disponibili: {', '.join(df.columns)}"
-        norm_col = df[filter_col].astype(str).apply(normalize)
         norm_value = normalize(filter_value)
-        filtered = df[norm_col.str.contains(norm_value, na=False)]
+        text_index = dataset.text_index
+        if filter_col in text_index.columns:
+            # Candidati dall'indice a trigrammi sui valori distinti, poi mappati sulle righe
+            filtered = df[text_index.contains(filter_col, norm_value, normalized=True)]
+        else:
+            norm_col = df[filter_col].astype(str).apply(normalize)
+            filtered = df[norm_col.str.contains(norm_value, na=False)]
         if not filtered.empty:
             if filter_col in ['STATUS', 'CLIENT', 'PM_SM', 'USER', 'PROJECT_DESCR']:
                 return f"Progetti trovati per {filter_col} = '{filter_value}':\n" + make_table(filtered)
@@ -290,7 +255,7 @@ EXTRACTION_PROMPT = (
     "- STATUS: Stato progetto\n"
     "- PROGRESS_%: Avanzamento %\n"
     "- YEAR: Anno\n"
-    "- gen, feb, mar, ..., dic: FTE allocato per ciascun mese\n"
+    "- gen, feb, mar, ..., dic: giorni/uomo allocati in ciascun mese (20 giorni = 1 FTE: per gli FTE dividi per 20)\n"
     "\n"
     "ISTRUZIONI:\n"
     "1. Analizza la domanda dell'utente e le immagini fornite (se presenti).\n"
@@ -306,7 +271,7 @@ EXTRACTION_PROMPT = (
     "  'progetti': user_rows['PROJECT_DESCR'].unique().tolist(),\n"
     "  'pm': user_rows['PM_SM'].unique().tolist(),\n"
     "  'clienti': user_rows['CLIENT'].unique().tolist(),\n"
-    "  'fte_mensile': user_rows[['gen','feb','mar','apr','mag','giu','lug','ago','set','ott','nov','dic']].sum().to_dict()\n"
+    "  'giorni_mensili': user_rows[['gen','feb','mar','apr','mag','giu','lug','ago','set','ott','nov','dic']].sum().to_dict()\n"
     "}\n"
     "\n"
     "Domanda: 'Come si usa la funzione di filtro?'\n"
@@ -334,7 +299,7 @@ SYSTEM_PROMPT = (
     "- STATUS: Stato progetto (es: 'In Progress')\n"
     "- PROGRESS_%: Avanzamento %\n"
     "- YEAR: Anno (es: 2024)\n"
-    "- gen, feb, mar, ..., dic: FTE allocato per ciascun mese (interi)\n"
+    "- gen, feb, mar, ..., dic: giorni/uomo allocati in ciascun mese (20 giorni = 1 FTE)\n"
     "\n"
     "Esempi di valori:\n"
     "- USER: 'A. Di Pietro', 'E. Storti', 'L. Mangili', 'C. Esposito', 'M. Sorrentino'\n"
@@ -347,9 +312,10 @@ SYSTEM_PROMPT = (
     "- Se sono presenti immagini, analizzale attentamente e descrivi cosa vedi.\n"
     "- Se le immagini contengono dati di scheduling, tabelle, grafici, cerca di estrarre informazioni utili.\n"
     "- Usa solo i dati forniti nel contesto.\n"
-    "- Se la domanda riguarda un utente, mostra: progetti, FTE mensile, PM, clienti, periodo attività, totale FTE, ecc.\n"
-    "- Se la domanda riguarda un progetto, mostra: utenti coinvolti, FTE allocato, periodo, stato, PM, cliente, ecc.\n"
+    "- Se la domanda riguarda un utente, mostra: progetti, giorni allocati per mese, PM, clienti, periodo attività, giorni totali, ecc.\n"
+    "- Se la domanda riguarda un progetto, mostra: utenti coinvolti, giorni allocati, periodo, stato, PM, cliente, ecc.\n"
     "- Se la domanda riguarda clienti, FTE, periodi, stati, aggrega e riassumi i dati pertinenti.\n"
+    "- I valori dei mesi sono giorni: indicali come giorni e, se la domanda chiede FTE, aggiungi gli FTE (giorni / 20).\n"
     "- Se la risposta non è nei dati forniti, dillo esplicitamente.\n"
     "- Usa tabelle o elenchi puntati se utile.\n"
     "- Sii sintetico e preciso.\n"
@@ -362,8 +328,8 @@ SYSTEM_PROMPT = (
     "- Progetti: CRM Upgrade, Data Migration\n"
     "- PM: L. Mangili, E. Storti\n"
     "- Clienti: ACME, Beta\n"
-    "- FTE totale: 8\n"
-    "- FTE per mese: gen=1, feb=1, mar=2, ...\n"
+    "- Giorni allocati totali: 160\n"
+    "- Giorni per mese: gen=20, feb=20, mar=40, ...\n"
     "- Periodo: 2024-01-01 → 2024-06-30\n"
     "\n"
     "Domanda: 'Quali progetti sono in stato In Progress?'\n"
@@ -373,7 +339,7 @@ SYSTEM_PROMPT = (
     "\n"
     "Domanda: 'Quanti FTE sono allocati a marzo 2024?'\n"
     "Risposta:\n"
-    "- FTE totale allocato a marzo 2024: 12\n"
+    "- Giorni allocati a marzo 2024: 240 (12 FTE)\n"
     "\n"
     "Domanda: 'Chi lavora per il cliente ACME?'\n"
     "Risposta:\n"
@@ -382,81 +348,103 @@ SYSTEM_PROMPT = (
     "\n"
     "---\n"
     "IMPORTANTE:\n"
-    "Se la domanda richiede un riepilogo, aggrega i dati (es: somma FTE, conta progetti, ecc.).\n"
+    "Se la domanda richiede un riepilogo, aggrega i dati (es: somma giorni, conta progetti, ecc.).\n"
     "Se la domanda è generica, fornisci statistiche generali (es: numero utenti, progetti, clienti, ecc.).\n"
     "Se sono presenti immagini, analizzale e fornisci insights basati su quello che vedi.\n"
     "\n"
     "Rispondi sempre in italiano, in modo chiaro e strutturato."
 )
 
-# === INTENT CLASSIFICATION LLM ===
-def classify_intent_with_llm(user_input):
-    """
-    Classifica l'intento della domanda come 'generica' (conversazione, help, spiegazione, onboarding, ecc.)
-    oppure 'dati' (richiesta di consultazione, filtro, analisi, aggregazione dati di scheduling).
-    Usa un prompt strutturato e ricco di contesto.
-    """
-    prompt = f"""
+# =======================
+# PROMPT PER DOMANDE GENERICHE
+# =======================
+GENERIC_PROMPT = """
 # Ruolo
-Sei un classificatore di intenti per un assistente AI integrato in un'applicazione di scheduling e resource planning.
+Sei l'assistente AI dell'app Scheduling, piattaforma per la pianificazione e gestione risorse/progetti.
 
 # Task
-Classifica la domanda utente come:
-- 'generica' se è una richiesta di aiuto, saluto, spiegazione, onboarding, conversazione, o riguarda l'app in generale
-- 'dati' se richiede di consultare, filtrare, analizzare o aggregare i dati di scheduling
+Rispondi in modo amichevole, chiaro e utile a domande generiche, onboarding, spiegazioni, saluti, richieste di aiuto, ecc. Non fornire dati specifici di scheduling.
 
 # Contesto Applicazione
-L'app permette di:
-- Gestire progetti, risorse, clienti, FTE, timeline, ecc.
-- Visualizzare dashboard e report analitici sui dati di scheduling
-- Usare una chat AI per chiedere informazioni sui dati o ricevere aiuto/conversare
-
-# Struttura base dati principale
-Colonne: PROJECT_DESCR (nome progetto), CLIENT (cliente), PM_SM (project manager), USER (utente/risorsa), STATUS (stato), PLANNED_FTE, ACTUAL_FTE, ITEM_TYPE, DELIVERY_TYPE, START_DATE, END_DATE, colonne mensili (gen, feb, ... dic) per FTE allocato.
-
-# Esempi domande generiche
-- "Ciao"
-- "Come si usa la chat?"
-- "Spiegami le funzionalità dell'app"
-- "Quali sono le possibilità di analisi?"
-- "Come posso aggiungere un nuovo progetto?"
-- "A cosa serve questa applicazione?"
-- "Quali sono le feature principali?"
-- "Come posso ricevere supporto?"
-
-# Esempi domande dati
-- "Mostrami i progetti in corso"
-- "Quanti FTE sono allocati a marzo?"
-- "Chi lavora per il cliente ACME?"
-- "Elenca i progetti gestiti da L. Mangili"
-- "Qual è lo stato del progetto CRM Upgrade?"
-- "Dammi la lista degli utenti attivi nel 2024"
-- "Quali progetti sono terminati quest'anno?"
-- "Report FTE per ogni mese"
+- L'app permette di gestire progetti, risorse, clienti, FTE, timeline, ecc.
+- Dashboard e report analitici
+- Chat AI per domande e supporto
+- Funzionalità: CRUD progetti, allocazione risorse, validazione dati, backup automatici, analisi avanzate, AI multimodale
+
+# Esempi domande generiche e risposte
+- "Ciao" → "Ciao! Come posso aiutarti?"
+- "Come si usa la chat?" → "Scrivi la tua domanda o richiesta nella casella in basso. Puoi chiedere sia informazioni sui dati che aiuto sull'app."
+- "Quali sono le funzionalità principali?" → "L'app offre gestione progetti, analisi risorse, dashboard KPI, chat AI, backup automatici e molto altro."
+- "Come posso ricevere supporto?" → "Puoi consultare la documentazione o contattare il team di sviluppo."
 
 # Reminder
-Rispondi solo con 'generica' o 'dati'.
-Non aggiungere spiegazioni.
+Rispondi sempre in italiano, in modo amichevole e sintetico.
+"""
+
+# =======================
+# PROMPT PER CHIAMATA UNICA (INTENTO + PIANO DI ESTRAZIONE + TEMPLATE RISPOSTA)
+# =======================
+RESULTS_PLACEHOLDER = "{risultati}"
+
+# Schema dell'output strutturato richiesto a Gemini
+PLAN_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "intent": {"type": "STRING", "enum": ["generica", "dati"]},
+        "code": {"type": "STRING"},
+        "answer": {"type": "STRING"},
+    },
+    "required": ["intent", "code", "answer"],
+}
+
+PLAN_PROMPT = (
+    "Sei l'assistente AI dell'app Scheduling. Con una sola risposta JSON devi classificare la domanda, "
+    "pianificare l'estrazione dei dati e preparare il testo della risposta.\n"
+    "\n"
+    "CAMPI DELLA RISPOSTA:\n"
+    "- intent: 'generica' per saluti, aiuto, spiegazioni, onboarding o domande sull'app; "
+    "'dati' se bisogna consultare, filtrare, analizzare o aggregare i dati di scheduling.\n"
+    "- code: per 'dati', i comandi Pandas che assegnano a `result` i dati necessari (il DataFrame è `df`), "
+    "come negli esempi sotto; stringa vuota per 'generica'.\n"
+    "- answer: per 'generica', la risposta completa; per 'dati', il testo della risposta con il segnaposto "
+    f"{RESULTS_PLACEHOLDER} dove verranno inseriti i dati estratti (es: 'Ecco i progetti di M. Sorrentino:\\n{RESULTS_PLACEHOLDER}'). "
+    "Non inventare valori: i dati arrivano solo dall'estrazione. Se sono presenti immagini, descrivile nel testo.\n"
+    "Rispondi sempre in italiano, in modo chiaro e sintetico.\n"
+    "\n"
+    "CONTESTO PER LE DOMANDE GENERICHE:\n"
+    f"{GENERIC_PROMPT}\n"
+    "PIANO DI ESTRAZIONE PER LE DOMANDE SUI DATI:\n"
+    f"{EXTRACTION_PROMPT}"
+)
+
+# === INTENT CLASSIFICATION ===
+def classify_intent_with_llm(user_input):
+    """
+    Classifica l'intento della domanda come 'generica' (conversazione, help, spiegazione, onboarding, ecc.)
+    oppure 'dati' (richiesta di consultazione, filtro, analisi, aggregazione dati di scheduling).
+    Decide il classificatore locale (regole + modello lineare, src/intent.py); solo le domande
+    ambigue vengono inviate al classificatore LLM.
+    """
+    decision = classify_intent(user_input)
+    if not decision.ambiguous or client is None:
+        return decision.intent
+    return classify_with_llm(client, user_input, CHAT_MODEL) or decision.intent
+
+def answer_generic(user_input: str, timer: StageTimer) -> str:
+    """Risposta a una domanda generica: prompt solo contesto app, nessun dato."""
+    generic_prompt = f"""
+{GENERIC_PROMPT}
 
 Domanda utente: {user_input}
 """
-    if client is None:
-        return "generica"  # fallback prudente
-    try:
+    with timer.stage("llm_risposta"):
         response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt],
+            model=CHAT_MODEL,
+            contents=[generic_prompt],
         )
-        if hasattr(response, 'text') and response.text:
-            label = response.text.strip().lower()
-            if 'generica' in label:
-                return 'generica'
-            if 'dati' in label:
-                return 'dati'
-        # fallback prudente
-        return 'generica'
-    except Exception:
-        return 'generica'
+    if hasattr(response, 'text') and response.text:
+        return response.text.strip()
+    return "Posso aiutarti con informazioni sull'app o sulle sue funzionalità."
 
 def format_result_for_user(result):
     """
@@ -491,138 +479,135 @@ def format_result_for_user(result):
     else:
         return str(result)
 
-def generate_llm_response(user_input: str, images: list = []) -> str:
+def image_parts(images: list) -> list:
+    """Parti inline_data per Gemini delle immagini allegate alla domanda."""
+    return [
+        {"inline_data": {"data": encode_image_to_base64(img_bytes), "mime_type": mime_type}}
+        for img_bytes, mime_type in images
+    ]
+
+def question_targets_key_column(question: str) -> bool:
+    """Logica per identificare se la domanda riguarda una colonna chiave."""
+    question = question.lower()
+    key_words = [
+        'status', 'stato', 'ongoing', 'in progress', 'completato', 'completed', 'on hold', 'cancellato', 'cancelled',
+        'client', 'cliente',
+        'pm', 'project manager', 'scrum master', 'pm_sm',
+        'user', 'utente', 'risorsa', 'persona', 'collaboratore',
+        'progetto', 'project', 'project_descr', 'nome progetto', 'descrizione progetto',
+        'item_type', 'tipologia', 'tipo attività',
+        'delivery_type', 'tipo delivery'
+    ]
+    return any(k in question for k in key_words)
+
+def extract_data(user_input: str, extraction_code: str, dataset: ScheduleDataset):
+    """Esegue il piano di estrazione (codice Pandas generato dal modello) o la query generalizzata."""
+    # (MODIFICA) Se la domanda riguarda una colonna chiave, chiama SEMPRE la funzione di query generalizzata
+    if question_targets_key_column(user_input):
+        return query_scheduling_data(user_input, dataset)
+    if extraction_code and "Non è necessaria alcuna estrazione dati" not in extraction_code:
+        try:
+            # Copia superficiale: con Copy-on-Write il codice generato non altera il dataset condiviso
+            local_vars = {'df': dataset.frame()}
+            exec(extraction_code, {}, local_vars)
+            if 'result' in local_vars:
+                return local_vars['result']
+            elif 'user_rows' in local_vars:
+                return local_vars['user_rows']
+            else:
+                return {k: v for k, v in local_vars.items() if k not in ['df']}
+        except Exception as e:
+            return query_scheduling_data(user_input, dataset)
+    return query_scheduling_data(user_input, dataset)
+
+def fill_answer_template(template: str, extracted_data) -> str:
+    """Inserisce i dati estratti al posto del segnaposto del template di risposta."""
+    results = format_result_for_user(extracted_data)
+    if RESULTS_PLACEHOLDER in template:
+        return template.replace(RESULTS_PLACEHOLDER, results).strip()
+    return f"{template.strip()}\n\n{results}".strip()
+
+def answer_with_single_call(user_input: str, images: list, dataset: ScheduleDataset, timer: StageTimer) -> Optional[str]:
+    """
+    Una sola chiamata LLM con output strutturato: intento, piano di estrazione e
+    template della risposta. Restituisce None se la risposta non è utilizzabile
+    (il chiamante torna alla pipeline a più chiamate).
+    """
+    timer.pipeline = "single-call"
+    with timer.stage("contesto"):
+        parts = [f"{PLAN_PROMPT}\n\nDomanda utente: {user_input}\nStruttura dati:\n{get_table_structure(dataset)}"]
+        parts += image_parts(images)
+    try:
+        with timer.stage("llm_piano"):
+            response = client.models.generate_content(
+                model=CHAT_MODEL,
+                contents=parts,
+                config={"response_mime_type": "application/json", "response_schema": PLAN_SCHEMA},
+            )
+        plan = json.loads(response.text or "")
+    except Exception as e:
+        print(f"Single-call chat plan failed, falling back: {e}")
+        return None
+    if not isinstance(plan, dict) or plan.get("intent") not in ("generica", "dati"):
+        return None
+    answer = str(plan.get("answer") or "")
+    if plan["intent"] == "generica":
+        return answer.strip() or None
+    with timer.stage("estrazione"):
+        extracted_data = extract_data(user_input, str(plan.get("code") or ""), dataset)
+    with timer.stage("formattazione"):
+        return fill_answer_template(answer, extracted_data)
+
+def answer_with_pipeline(user_input: str, images: list, dataset: ScheduleDataset, timer: StageTimer) -> str:
     """
     Orchestrazione RAG a due step con supporto immagini:
-    1. Classifica l'intento con LLM: 'generica' o 'dati'
+    1. Classifica l'intento (classificatore locale, LLM solo se ambiguo): 'generica' o 'dati'
     2. Se 'generica', rispondi con prompt solo contesto app
     3. Se 'dati', esegui il flusso attuale con query e dati
     """
-    # Risposta custom se l'utente chiede il nome del bot
-    name_queries = [
-        "come ti chiami", "qual è il tuo nome", "chi sei", "come si chiama il bot", "nome del bot", "come ti posso chiamare", "presentati", "parlami di te"
-    ]
-    if any(q in user_input.lower() for q in name_queries):
-        return f"{BOT_DESCRIPTION} Il mio nome è **{BOT_NAME}**."
-
-    if client is None:
-        return "⚠️ API key mancante. Impossibile contattare il modello."
-
+    timer.pipeline = "pipeline"
     # 1. Classificazione intento
-    intent = classify_intent_with_llm(user_input)
+    with timer.stage("intento"):
+        intent = classify_intent_with_llm(user_input)
     if intent == 'generica':
-        # Prompt solo contesto app, nessun dato
-        generic_prompt = f"""
-# Ruolo
-Sei l'assistente AI dell'app Scheduling, piattaforma per la pianificazione e gestione risorse/progetti.
-
-# Task
-Rispondi in modo amichevole, chiaro e utile a domande generiche, onboarding, spiegazioni, saluti, richieste di aiuto, ecc. Non fornire dati specifici di scheduling.
-
-# Contesto Applicazione
-- L'app permette di gestire progetti, risorse, clienti, FTE, timeline, ecc.
-- Dashboard e report analitici
-- Chat AI per domande e supporto
-- Funzionalità: CRUD progetti, allocazione risorse, validazione dati, backup automatici, analisi avanzate, AI multimodale
-
-# Esempi domande generiche e risposte
-- "Ciao" → "Ciao! Come posso aiutarti?"
-- "Come si usa la chat?" → "Scrivi la tua domanda o richiesta nella casella in basso. Puoi chiedere sia informazioni sui dati che aiuto sull'app."
-- "Quali sono le funzionalità principali?" → "L'app offre gestione progetti, analisi risorse, dashboard KPI, chat AI, backup automatici e molto altro."
-- "Come posso ricevere supporto?" → "Puoi consultare la documentazione o contattare il team di sviluppo."
-
-# Reminder
-Rispondi sempre in italiano, in modo amichevole e sintetico.
-
-Domanda utente: {user_input}
-"""
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[generic_prompt],
-        )
-        if hasattr(response, 'text') and response.text:
-            return response.text.strip()
-        return "Posso aiutarti con informazioni sull'app o sulle sue funzionalità."
+        return answer_generic(user_input, timer)
     else:
         # Flusso attuale: prompt con contesto + dati
-        # Logica per identificare se la domanda riguarda una colonna chiave
-        def question_targets_key_column(question: str) -> bool:
-            question = question.lower()
-            key_words = [
-                'status', 'stato', 'ongoing', 'in progress', 'completato', 'completed', 'on hold', 'cancellato', 'cancelled',
-                'client', 'cliente',
-                'pm', 'project manager', 'scrum master', 'pm_sm',
-                'user', 'utente', 'risorsa', 'persona', 'collaboratore',
-                'progetto', 'project', 'project_descr', 'nome progetto', 'descrizione progetto',
-                'item_type', 'tipologia', 'tipo attività',
-                'delivery_type', 'tipo delivery'
-            ]
-            return any(k in question for k in key_words)
         try:
             # 1. Prepara il contenuto per la prima chiamata LLM (estrazione query)
-            parts = []
-            text_content = f"""
+            with timer.stage("contesto"):
+                text_content = f"""
 {EXTRACTION_PROMPT}
 
 Domanda utente: {user_input}
 Struttura dati:
-{get_table_structure()}
+{get_table_structure(dataset)}
 """
-            parts.append(text_content)
-            if images:
-                for img_bytes, mime_type in images:
-                    parts.append({
-                        "inline_data": {
-                            "data": encode_image_to_base64(img_bytes),
-                            "mime_type": mime_type
-                        }
-                    })
-            extraction_response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=parts,
-            )
+                parts = [text_content] + image_parts(images)
+            with timer.stage("llm_estrazione"):
+                extraction_response = client.models.generate_content(
+                    model=CHAT_MODEL,
+                    contents=parts,
+                )
             extraction_code = extraction_response.text.strip() if (hasattr(extraction_response, 'text') and extraction_response.text is not None) else ""
-            extracted_data = None
-            # (MODIFICA) Se la domanda riguarda una colonna chiave, chiama SEMPRE la funzione di query generalizzata
-            if question_targets_key_column(user_input):
-                extracted_data = query_scheduling_data(user_input)
-            elif extraction_code and "Non è necessaria alcuna estrazione dati" not in extraction_code:
-                try:
-                    local_vars = {'df': load_scheduling()}
-                    exec(extraction_code, {}, local_vars)
-                    if 'result' in local_vars:
-                        extracted_data = local_vars['result']
-                    elif 'user_rows' in local_vars:
-                        extracted_data = local_vars['user_rows']
-                    else:
-                        extracted_data = {k: v for k, v in local_vars.items() if k not in ['df']}
-                except Exception as e:
-                    extracted_data = query_scheduling_data(user_input)
-            else:
-                extracted_data = query_scheduling_data(user_input)
-            final_parts = []
-            final_text = f"""
+            with timer.stage("estrazione"):
+                extracted_data = extract_data(user_input, extraction_code, dataset)
+            with timer.stage("contesto"):
+                final_text = f"""
 {SYSTEM_PROMPT}
 
 Domanda utente: {user_input}
 Struttura dati:
-{get_table_structure()}
+{get_table_structure(dataset)}
 """
-            if extracted_data is not None:
-                final_text += f"\nRisultati estratti dal DataFrame:\n{format_result_for_user(extracted_data)}\n"
-            final_parts.append(final_text)
-            if images:
-                for img_bytes, mime_type in images:
-                    final_parts.append({
-                        "inline_data": {
-                            "data": encode_image_to_base64(img_bytes),
-                            "mime_type": mime_type
-                        }
-                    })
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=final_parts,
-            )
+                if extracted_data is not None:
+                    final_text += f"\nRisultati estratti dal DataFrame:\n{format_result_for_user(extracted_data)}\n"
+                final_parts = [final_text] + image_parts(images)
+            with timer.stage("llm_risposta"):
+                response = client.models.generate_content(
+                    model=CHAT_MODEL,
+                    contents=final_parts,
+                )
             if response and hasattr(response, 'text') and response.text:
                 text_val = str(response.text)
                 # Se la risposta del modello non contiene dati reali, mostra direttamente i risultati estratti
@@ -634,6 +619,71 @@ Struttura dati:
         except Exception as e:
             return f"❌ Errore durante la chiamata al modello: {e}"
 
+def generate_llm_response(user_input: str, images: list = [], timer: Optional[StageTimer] = None) -> str:
+    """
+    Risponde alla domanda con il motore di query locale (src/chat_queries.py), dalla cache
+    delle risposte (src/chat_cache.py) o con una sola chiamata LLM strutturata
+    (SCHEDULING_CHAT_SINGLE_CALL) e, se la risposta non è valida, con la pipeline a più chiamate. ``timer`` raccoglie i tempi di ogni fase del turno.
+    """
+    timer = timer if timer is not None else StageTimer()
+    # Risposta custom se l'utente chiede il nome del bot
+    name_queries = [
+        "come ti chiami", "qual è il tuo nome", "chi sei", "come si chiama il bot", "nome del bot", "come ti posso chiamare", "presentati", "parlami di te"
+    ]
+    if any(q in user_input.lower() for q in name_queries):
+        return f"{BOT_DESCRIPTION} Il mio nome è **{BOT_NAME}**."
+
+    # Le domande chiaramente generiche non richiedono contesto dati né piano di estrazione
+    with timer.stage("intento_locale"):
+        decision = classify_intent(user_input)
+    generic = decision.intent == "generica" and not decision.ambiguous and not images
+
+    # Un solo caricamento del dataset per turno: query locale, contesto ed estrazione usano questo
+    dataset = None
+    if not generic:
+        with timer.stage("caricamento"):
+            dataset = load_dataset()
+
+    # Domande coperte dalla grammatica locale: risposta deterministica in pochi millisecondi
+    if CHAT_LOCAL_QUERIES and dataset is not None and not images:
+        with timer.stage("query_locale"):
+            result = answer_locally(user_input, dataset)
+        if result is not None:
+            timer.pipeline = "locale"
+            return result.to_markdown()
+
+    # Cache persistente delle risposte: le generiche non dipendono dai dati e valgono per ogni versione;
+    # le altre usano la versione del contenuto, che non cambia con flush del change log e compattazione
+    cache = get_chat_cache()
+    with timer.stage("cache"):
+        image_hashes = [image_digest(img_bytes) for img_bytes, _ in images]
+        data_version = "" if generic else content_version(dataset.version or get_data_version())
+        cached = cache.get(user_input, image_hashes, data_version)
+    if cached is not None:
+        timer.pipeline = "cache"
+        return cached
+
+    if client is None:
+        return "⚠️ API key mancante. Impossibile contattare il modello."
+
+    if generic:
+        timer.pipeline = "generica"
+        answer = answer_generic(user_input, timer)
+    else:
+        if CHAT_SINGLE_CALL:
+            answer = answer_with_single_call(user_input, images, dataset, timer)
+            if answer is None:
+                answer = answer_with_pipeline(user_input, images, dataset, timer)
+                # I tempi includono anche il tentativo con la chiamata unica
+                timer.pipeline = "fallback"
+        else:
+            answer = answer_with_pipeline(user_input, images, dataset, timer)
+    # Gli errori non vengono messi in cache
+    if not answer.startswith(("❌", "⚠️")):
+        with timer.stage("cache"):
+            cache.put(user_input, image_hashes, data_version, answer)
+    return answer
+
 # Funzione per pulire la conversazione
 def clear_conversation():
     st.session_state.messages = []
@@ -675,6 +725,15 @@ if st.session_state.uploaded_images:
                 st.session_state.uploaded_images.pop(i)
                 st.rerun()
 
+# Tempi per fase degli ultimi turni di chat (chiamate LLM, estrazione dati, ...)
+with st.expander("⏱️ Tempi di risposta per fase"):
+    st.dataframe(stage_statistics(), use_container_width=True, hide_index=True)
+    cache_stats = get_chat_cache().stats()
+    st.caption(f"Cache risposte: {cache_stats['entries']} risposte salvate, {cache_stats['hits']} riutilizzi.")
+    if st.button("🧹 Svuota cache risposte"):
+        get_chat_cache().clear()
+        st.rerun()
+
 # Pulsante per pulire la conversazione
 if st.button("🗑️ Clear Conversation", help="Clear all chat history and images"):
     clear_conversation()
@@ -687,6 +746,8 @@ st.subheader("💬 Chat")
 for message in st.session_state.messages:
     with st.chat_message(message['role']):
         st.write(message['content'])
+        if message.get('timings'):
+            st.caption(f"⏱️ {message['timings']}")
         if message['role'] == 'user' and 'images' in message and message['images']:
             st.write("📷 **Immagini analizzate:**")
             for i, (img_bytes, mime_type) in enumerate(message['images']):
@@ -703,6 +764,9 @@ if prompt:
         'content': prompt,
         'images': current_images
     })
-    assistant_reply = generate_llm_response(prompt, current_images)
-    st.session_state.messages.append({'role': 'assistant', 'content': assistant_reply})
+    timer = StageTimer()
+    assistant_reply = generate_llm_response(prompt, current_images, timer)
+    if timer.stages:
+        record_timings(timer)
+    st.session_state.messages.append({'role': 'assistant', 'content': assistant_reply, 'timings': timer.summary() if timer.stages else None})
     st.rerun() 
\ No newline at end of file
@@ -0,0 +1,156 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.changelog import ROW_ID
+from src.schema import MONTHS
+
+# Dimensioni materializzate nel cubo FTE (oltre a YEAR)
+CUBE_DIMENSIONS = ["USER", "PROJECT_DESCR", "CLIENT", "PM_SM", "AREA_CC", "ITEM_TYPE", "STATUS"]
+# Dimensioni per cui serve anche il dettaglio per progetto (report Utente / PM / Cliente)
+PROJECT_BREAKDOWN_DIMENSIONS = ["USER", "PM_SM", "CLIENT"]
+
+_ROWS = "_ROWS"
+
+
+def month_columns(df: pd.DataFrame) -> List[str]:
+    """Monthly allocation columns (gen..dic), excluding the derived '...1' columns."""
+    return [c for c in df.columns if str(c).lower() in MONTHS]
+
+
+# ---------------------- primitive wide-format ----------------------
+# Riduzioni NumPy sul blocco dei mesi: nessun melt in formato long, quindi
+# nessuna replica x12 delle righe e delle colonne di metadati.
+
+def month_block(df: pd.DataFrame, month_cols: List[str]) -> np.ndarray:
+    """Month allocations as a contiguous float 2-D array (rows x months), NaN as 0."""
+    block = df[month_cols].to_numpy(dtype="float64", na_value=np.nan)
+    # Con copy-on-write il blocco può essere una vista in sola lettura del frame
+    return np.nan_to_num(block, copy=not block.flags.writeable)
+
+
+def trend_series(df: pd.DataFrame, month_cols: List[str]) -> pd.Series:
+    """Month -> total FTE (the monthly trend line)."""
+    return pd.Series(month_block(df, month_cols).sum(axis=0), index=pd.Index(month_cols, name="MONTH"), name="FTE")
+
+
+def pie_series(df: pd.DataFrame, dimension: str, month_cols: List[str]) -> pd.Series:
+    """Dimension value -> total FTE over all months (the pie slices)."""
+    codes, uniques = pd.factorize(df[dimension], sort=True)
+    totals = month_block(df, month_cols).sum(axis=1)
+    valid = codes >= 0
+    sums = np.bincount(codes[valid], weights=totals[valid], minlength=len(uniques))
+    return pd.Series(sums, index=pd.Index(uniques, name=dimension), name="FTE")
+
+
+def dimension_month_matrix(df: pd.DataFrame, dimension: str, month_cols: List[str]) -> pd.DataFrame:
+    """Dimension value x month FTE (e.g. the USER heatmap)."""
+    codes, uniques = pd.factorize(df[dimension], sort=True)
+    block = month_block(df, month_cols)
+    valid = codes >= 0
+    matrix = np.zeros((len(uniques), len(month_cols)))
+    np.add.at(matrix, codes[valid], block[valid])
+    return pd.DataFrame(matrix, index=pd.Index(uniques, name=dimension), columns=month_cols)
+
+
+def _year_keys(df: pd.DataFrame) -> pd.DataFrame:
+    if "YEAR" in df.columns:
+        return df
+    out = df.copy(deep=False)
+    if "START_DATE" in out.columns:
+        out["YEAR"] = pd.to_datetime(out["START_DATE"], errors="coerce").dt.year.astype("Int64")
+    else:
+        out["YEAR"] = pd.NA
+    return out
+
+
+def _aggregate(df: pd.DataFrame, keys: Tuple[str, ...], month_cols: List[str]) -> pd.DataFrame:
+    grouped = df.groupby(list(keys), observed=True, sort=True)
+    table = grouped[month_cols].sum() if month_cols else pd.DataFrame(index=grouped.size().index)
+    table[_ROWS] = grouped.size()
+    return table
+
+
+class FteCube:
+    """
+    Materialized FTE sums by YEAR x dimension value x month.
+
+    Built once per data version; the Analytics dashboard and reports read
+    pre-aggregated slices instead of re-scanning the raw table. Like the
+    entity index it is never modified in place: ``updated`` returns a new
+    cube with only the contributions of the changed rows re-aggregated.
+    """
+
+    def __init__(self, df: pd.DataFrame, month_cols: Optional[List[str]] = None,
+                 dimensions: Iterable[str] = CUBE_DIMENSIONS,
+                 _tables: Optional[Dict[Tuple[str, ...], pd.DataFrame]] = None):
+        self.month_cols = list(month_cols) if month_cols is not None else month_columns(df)
+        self.dimensions = [d for d in dimensions if d in df.columns]
+        self.groupings: List[Tuple[str, ...]] = [("YEAR",)]
+        self.groupings += [("YEAR", d) for d in self.dimensions]
+        if "PROJECT_DESCR" in df.columns:
+            self.groupings += [
+                ("YEAR", d, "PROJECT_DESCR") for d in PROJECT_BREAKDOWN_DIMENSIONS if d in self.dimensions
+            ]
+        if _tables is None:
+            keyed = _year_keys(df)
+            _tables = {keys: _aggregate(keyed, keys, self.month_cols) for keys in self.groupings}
+        self._tables = _tables
+
+    # ---------------------- letture ----------------------
+    def years(self) -> List[int]:
+        return sorted(int(y) for y in self._tables[("YEAR",)].index.dropna())
+
+    def year_totals(self) -> pd.DataFrame:
+        """YEAR x month FTE totals."""
+        return self._tables[("YEAR",)][self.month_cols]
+
+    def by_dimension(self, dimension: str, year: Optional[int] = None) -> pd.DataFrame:
+        """Dimension value x month FTE, for one year or summed over all years."""
+        table = self._tables.get(("YEAR", dimension))
+        if table is None:
+            return pd.DataFrame(columns=pd.Index(self.month_cols))
+        if year is not None:
+            if year not in table.index.get_level_values("YEAR"):
+                return pd.DataFrame(columns=pd.Index(self.month_cols))
+            return table.xs(year, level="YEAR")[self.month_cols]
+        return table.groupby(level=dimension, observed=True)[self.month_cols].sum()
+
+    def entity_months(self, dimension: str, value) -> pd.Series:
+        """Month -> FTE for one entity (all years)."""
+        table = self._tables.get(("YEAR", dimension))
+        if table is None or value not in table.index.get_level_values(dimension):
+            return pd.Series(0.0, index=self.month_cols)
+        return table.xs(value, level=dimension)[self.month_cols].sum()
+
+    def entity_total(self, dimension: str, value) -> float:
+        return float(self.entity_months(dimension, value).sum())
+
+    def projects_for(self, dimension: str, value) -> pd.Series:
+        """Project -> total FTE for one user / PM / client (all years)."""
+        table = self._tables.get(("YEAR", dimension, "PROJECT_DESCR"))
+        if table is None or value not in table.index.get_level_values(dimension):
+            return pd.Series(dtype="float64")
+        sliced = table.xs(value, level=dimension)
+        return sliced.groupby(level="PROJECT_DESCR", observed=True)[self.month_cols].sum().sum(axis=1)
+
+    # ---------------------- aggiornamento incrementale ----------------------
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "FteCube":
+        """
+        Return a new cube for ``after`` by re-aggregating only the rows in ``row_ids``.
+
+        The old contribution of those rows (taken from ``before``) is
+        subtracted and the new one (taken from ``after``) added, group by group.
+        """
+        row_ids = list(set(int(r) for r in row_ids))
+        old_rows = _year_keys(before[before[ROW_ID].isin(row_ids)])
+        new_rows = _year_keys(after[after[ROW_ID].isin(row_ids)])
+        tables = {}
+        for keys, table in self._tables.items():
+            delta = _aggregate(new_rows, keys, self.month_cols).sub(
+                _aggregate(old_rows, keys, self.month_cols), fill_value=0
+            )
+            merged = table.add(delta, fill_value=0)
+            tables[keys] = merged[merged[_ROWS] > 0]
+        return FteCube(after, self.month_cols, self.dimensions, _tables=tables)
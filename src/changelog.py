@@ -0,0 +1,217 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.schema import coerce_new_values
+from src.storage import DATA_DIR
+
+ROW_ID = "ROW_ID"
+LOG_FILE = DATA_DIR / "SCHEDULING.changes.jsonl"
+
+# Numero di operazioni nel log oltre il quale viene avviata la compattazione
+COMPACT_THRESHOLD = int(os.getenv("SCHEDULING_COMPACT_THRESHOLD", "500"))
+
+
+def _jsonable(value):
+    """Convert a cell value to something json.dumps can write."""
+    if isinstance(value, (list, tuple, dict)):
+        return value
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _records(df: pd.DataFrame) -> List[dict]:
+    return [{k: _jsonable(v) for k, v in row.items()} for row in df.to_dict(orient="records")]
+
+
+class ChangeLog:
+    """
+    Append-only log of row-level changes keyed by ROW_ID.
+
+    Each line is a JSON object: ``{"op": "insert", "row_id": 7, "values": {...}}``,
+    ``{"op": "update", "row_id": 7, "values": {"gen": 1}}`` or
+    ``{"op": "delete", "row_id": 7}``. The log is replayed on top of the main
+    store at load time and folded into it by compaction.
+    """
+
+    def __init__(self, path: Path = LOG_FILE):
+        self.path = path
+
+    def size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, ops: Iterable[dict]) -> int:
+        """Append operations to the log and flush them to disk. Returns the number written."""
+        lines = [json.dumps(op, ensure_ascii=False, default=str) for op in ops]
+        if not lines:
+            return 0
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        return len(lines)
+
+    def read(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        ops = []
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Riga troncata (es. crash durante la scrittura): viene ignorata
+                    print(f"Skipping corrupted change log line: {line[:80]}")
+        return ops
+
+    def count(self) -> int:
+        if not self.path.exists():
+            return 0
+        with open(self.path, encoding="utf-8") as fh:
+            return sum(1 for line in fh if line.strip())
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
+
+
+def insert_ops(rows: pd.DataFrame) -> List[dict]:
+    return [
+        {"op": "insert", "row_id": int(rec[ROW_ID]), "values": rec}
+        for rec in _records(rows)
+    ]
+
+
+def update_ops(updates: Dict[int, dict]) -> List[dict]:
+    return [
+        {"op": "update", "row_id": int(row_id), "values": {k: _jsonable(v) for k, v in values.items()}}
+        for row_id, values in updates.items()
+        if values
+    ]
+
+
+def delete_ops(row_ids: Iterable[int]) -> List[dict]:
+    return [{"op": "delete", "row_id": int(row_id)} for row_id in row_ids]
+
+
+def ensure_row_ids(df: pd.DataFrame, start: Optional[int] = None) -> pd.DataFrame:
+    """Assign a ROW_ID to the rows that do not have one yet."""
+    if ROW_ID not in df.columns:
+        df[ROW_ID] = pd.array([pd.NA] * len(df), dtype="Int64")
+    ids = pd.to_numeric(df[ROW_ID], errors="coerce")
+    missing = ids.isna().to_numpy()
+    if missing.any():
+        if start is None:
+            start = int(ids.max()) + 1 if ids.notna().any() else 0
+        ids = ids.to_numpy(dtype="float64", na_value=np.nan)
+        ids[missing] = np.arange(start, start + int(missing.sum()))
+    df[ROW_ID] = np.asarray(ids, dtype="int64")
+    return df
+
+
+def next_row_id(df: pd.DataFrame) -> int:
+    if ROW_ID not in df.columns or df.empty:
+        return 0
+    return int(df[ROW_ID].max()) + 1
+
+
+def _coerce_like(column: pd.Series, values: list) -> pd.Series:
+    """Cast new cell values to the dtype of the target column."""
+    typed = coerce_new_values(column, values)
+    if typed is not None:
+        return typed
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return pd.Series(pd.to_datetime(values, errors="coerce"))
+    if pd.api.types.is_string_dtype(column) and all(v is None or isinstance(v, str) for v in values):
+        return pd.Series(values, dtype=column.dtype)
+    if pd.api.types.is_bool_dtype(column):
+        return pd.Series(values, dtype=object)
+    if pd.api.types.is_numeric_dtype(column):
+        coerced = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        if pd.api.types.is_integer_dtype(column) and coerced.notna().all() and (coerced % 1 == 0).all():
+            return coerced.astype(column.dtype)
+        return coerced.astype("float64")
+    return pd.Series(values, dtype=object)
+
+
+def apply_changes(df: pd.DataFrame, ops: List[dict]) -> pd.DataFrame:
+    """Replay change-log operations on top of ``df`` and return the resulting frame."""
+    if not ops:
+        return df
+
+    inserts: Dict[int, dict] = {}
+    updates: Dict[int, dict] = {}
+    deletes = set()
+    for op in ops:
+        row_id = int(op["row_id"])
+        kind = op.get("op")
+        if kind == "insert":
+            inserts[row_id] = dict(op.get("values") or {})
+            deletes.discard(row_id)
+        elif kind == "update":
+            if row_id in inserts:
+                inserts[row_id].update(op.get("values") or {})
+            else:
+                updates.setdefault(row_id, {}).update(op.get("values") or {})
+        elif kind == "delete":
+            if inserts.pop(row_id, None) is None:
+                deletes.add(row_id)
+            updates.pop(row_id, None)
+
+    row_index = pd.Index(df[ROW_ID]) if ROW_ID in df.columns else pd.Index([])
+
+    if updates:
+        by_column: Dict[str, Dict[int, object]] = {}
+        for row_id, values in updates.items():
+            for col, value in values.items():
+                if col in df.columns:
+                    by_column.setdefault(col, {})[row_id] = value
+        for col, cells in by_column.items():
+            positions = row_index.get_indexer(list(cells.keys()))
+            found = positions >= 0
+            if not found.any():
+                continue
+            new_values = _coerce_like(df[col], [v for v, ok in zip(cells.values(), found) if ok])
+            column = df[col]
+            if new_values.dtype != column.dtype:
+                column = column.astype(new_values.dtype)
+            column = column.copy()
+            column.iloc[positions[found]] = new_values.to_numpy()
+            df[col] = column
+
+    # Un insert di una riga già presente (replay dopo una compattazione interrotta)
+    # la sostituisce: il replay del log resta idempotente
+    if deletes or inserts:
+        df = df[~df[ROW_ID].isin(list(deletes) + list(inserts.keys()))]
+
+    if inserts:
+        new_rows = pd.DataFrame(list(inserts.values()))
+        new_rows[ROW_ID] = list(inserts.keys())
+        # Stesso dtype delle colonne esistenti, così concat non degrada le categorie a object
+        for col in new_rows.columns.intersection(df.columns):
+            typed = coerce_new_values(df[col], new_rows[col].tolist())
+            if typed is None:
+                continue
+            if isinstance(typed.dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.set_categories(typed.cat.categories)
+            new_rows[col] = typed.array
+        df = pd.concat([df, new_rows], ignore_index=True)
+
+    return df.reset_index(drop=True)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src.storage import DATA_DIR
+from src.text_index import normalize_text
+
+CHAT_CACHE_FILE = DATA_DIR / "chat_cache.sqlite3"
+
+# Validità delle risposte in cache e numero massimo di risposte (LRU); 0 disattiva la cache
+CHAT_CACHE_TTL_HOURS = float(os.getenv("SCHEDULING_CHAT_CACHE_TTL_HOURS", "24"))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("SCHEDULING_CHAT_CACHE_MAX_ENTRIES", "1000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+
+def image_digest(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class ChatAnswerCache:
+    """
+    Persistent cache of Chat answers (SQLite, shared by all sessions and processes).
+
+    The key is the normalized question, the hashes of the attached images
+    and the data version the answer was computed on; answers that do not
+    depend on the data use the empty version and survive data changes.
+    Entries expire after ``ttl_hours``, the least recently used ones are
+    dropped beyond ``max_entries``, and answers of older data versions are
+    purged as soon as an answer for a newer version is stored.
+    """
+
+    def __init__(self, path: Path = CHAT_CACHE_FILE, ttl_hours: float = CHAT_CACHE_TTL_HOURS,
+                 max_entries: int = CHAT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        # Con WAL basta un fsync al checkpoint: la cache può perdere le ultime scritture, non corrompersi
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._init_lock:
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._ready = True
+        return conn
+
+    @staticmethod
+    def key(question: str, image_hashes: Iterable[str], data_version: str) -> str:
+        question = " ".join(normalize_text(question).split())
+        raw = json.dumps([question, sorted(image_hashes), data_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, image_hashes: Iterable[str], data_version: str) -> Optional[str]:
+        """The cached answer, or None if missing or expired."""
+        if not self.enabled:
+            return None
+        key = self.key(question, image_hashes, data_version)
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            return row[0]
+        finally:
+            conn.close()
+
+    def put(self, question: str, image_hashes: Iterable[str], data_version: str, answer: str) -> None:
+        if not self.enabled:
+            return
+        key = self.key(question, image_hashes, data_version)
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, question, data_version, answer, created, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (key, question, data_version, answer, now, now),
+                )
+                # Le risposte calcolate su versioni dei dati precedenti non verranno più lette
+                if data_version:
+                    conn.execute("DELETE FROM answers WHERE data_version NOT IN ('', ?)", (data_version,))
+                conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+                conn.execute(
+                    "DELETE FROM answers WHERE key IN "
+                    "(SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+        finally:
+            conn.close()
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM answers")
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Number of cached answers and total hits."""
+        conn = self._connect()
+        try:
+            entries, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM answers").fetchone()
+        finally:
+            conn.close()
+        return {"entries": entries, "hits": hits}
+
+
+_cache: Optional[ChatAnswerCache] = None
+
+
+def get_chat_cache() -> ChatAnswerCache:
+    """Process-wide Chat answer cache, created on first use."""
+    global _cache
+    if _cache is None:
+        _cache = ChatAnswerCache()
+    return _cache
@@ -0,0 +1,138 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.aggregates import month_block, month_columns
+from src.text_index import normalize_text
+
+# Raggruppamento delle colonne presentato al modello nella struttura della tabella
+COLUMN_GROUPS = {
+    "Informazioni Progetto": ["PROJECT_DESCR", "CLIENT", "PM_SM", "SOW_ID", "JIRA_KEY"],
+    "Classificazione": ["ITEM_TYPE", "DELIVERY_TYPE", "WORKSTREAM", "PROJECT_STREAM", "AREA_CC"],
+    "Timeline": ["START_DATE", "END_DATE", "YEAR", "YEAR_OF_COMPETENCE"],
+    "Gestione Risorse": ["USER", "JOB", "PLANNED_FTE", "ACTUAL_FTE", "STATUS", "PROGRESS_%"],
+}
+
+# Colonne di cui vengono mostrati esempi di valori e numero di valori distinti
+SAMPLE_COLUMNS = ["STATUS", "ITEM_TYPE", "USER", "CLIENT"]
+COUNT_COLUMNS = ["PROJECT_DESCR", "USER", "CLIENT", "PM_SM"]
+SAMPLE_SIZE = 5
+
+# Colonne le cui entità vengono riconosciute nelle domande (in ordine di preferenza)
+ENTITY_COLUMNS = ["USER", "PM_SM", "CLIENT", "PROJECT_DESCR"]
+
+
+class ChatContext:
+    """
+    Table context for the Chat prompts, computed once per data version.
+
+    The schema summary, value samples, column statistics, month block and
+    entity vocabulary are built on first use and memoized; commits hand
+    the next version a fresh context that is rebuilt lazily, like the
+    other derived artifacts.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._samples: Dict[str, List[str]] = {}
+        self._stats: Optional[dict] = None
+        self._structure: Optional[str] = None
+        self._allocations: Optional[Tuple[List[str], np.ndarray]] = None
+        self._entities: Optional[Dict[str, Dict[str, List]]] = None
+
+    def allocations(self) -> Tuple[List[str], np.ndarray]:
+        """Month columns and the rows x months allocation block (NaN as 0)."""
+        if self._allocations is None:
+            months = month_columns(self._df)
+            self._allocations = (months, month_block(self._df, months))
+        return self._allocations
+
+    def entities(self) -> Dict[str, Dict[str, List]]:
+        """
+        Normalized phrase -> {column: [values]} for recognizing entities in
+        questions. Values differing only in case or punctuation share a
+        phrase; people are also reachable by surname ("Storti" for "E. Storti").
+        """
+        if self._entities is None:
+            entities: Dict[str, Dict[str, List]] = {}
+
+            def add(phrase: str, column: str, value) -> None:
+                if len(phrase) >= 3 and not phrase.isdigit():
+                    entities.setdefault(phrase, {}).setdefault(column, []).append(value)
+
+            for column in ENTITY_COLUMNS:
+                if column not in self._df.columns:
+                    continue
+                for value in self._df[column].dropna().unique():
+                    phrase = " ".join(normalize_text(value).split())
+                    add(phrase, column, value)
+                    words = phrase.split()
+                    if column in ("USER", "PM_SM") and len(words) >= 2 and len(words[0]) == 1:
+                        surname = " ".join(words[1:])
+                        if len(surname) >= 4:
+                            add(surname, column, value)
+            self._entities = entities
+        return self._entities
+
+    def samples(self, column: str, n: int = SAMPLE_SIZE) -> List[str]:
+        """First ``n`` distinct non-empty values of ``column`` (in table order)."""
+        key = f"{column}:{n}"
+        if key not in self._samples:
+            values = self._df[column].dropna() if column in self._df.columns else pd.Series(dtype=object)
+            self._samples[key] = [str(v) for v in values.unique()[:n] if str(v).strip()]
+        return self._samples[key]
+
+    def stats(self) -> dict:
+        """Row and distinct counts, FTE totals and total allocation per month."""
+        if self._stats is None:
+            df = self._df
+            months, allocations = self.allocations()
+            self._stats = {
+                "rows": len(df),
+                "columns": len(df.columns),
+                "distinct": {c: int(df[c].nunique()) for c in COUNT_COLUMNS if c in df.columns},
+                "fte": {
+                    c: float(pd.to_numeric(df[c], errors="coerce").sum())
+                    for c in ("PLANNED_FTE", "ACTUAL_FTE") if c in df.columns
+                },
+                "months": dict(zip(months, allocations.sum(axis=0).round(2).tolist())),
+            }
+        return self._stats
+
+    def structure(self) -> str:
+        """Schema summary, value samples and statistics as prompt text."""
+        if self._structure is None:
+            df = self._df
+            stats = self.stats()
+            text = f"""
+STRUTTURA TABELLA SCHEDULING:
+- Colonne totali: {stats['columns']}
+- Righe totali: {stats['rows']}
+- Colonne principali:
+"""
+            text += "\n"
+            for label, columns in COLUMN_GROUPS.items():
+                text += f"  • {label}: {', '.join(c for c in columns if c in df.columns)}\n"
+            text += f"  • Allocazioni Mensili: {', '.join(stats['months'])}\n"
+
+            text += "\nESEMPI DI VALORI:\n"
+            for column in SAMPLE_COLUMNS:
+                if column in df.columns:
+                    text += f"  • {column}: {', '.join(self.samples(column))}\n"
+
+            text += "\nSTATISTICHE:\n"
+            for column, count in stats["distinct"].items():
+                text += f"  • Valori distinti di {column}: {count}\n"
+            for column, total in stats["fte"].items():
+                text += f"  • Totale {column}: {total:g}\n"
+            if stats["months"]:
+                # Le colonne mese contengono giorni/uomo: stessa unità delle risposte locali (src/chat_queries.py)
+                text += ("  • Giorni allocati per mese (20 giorni = 1 FTE): "
+                         + ", ".join(f"{m}={v:g}" for m, v in stats["months"].items()) + "\n")
+            self._structure = text
+        return self._structure
+
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "ChatContext":
+        # Contesto ricalcolato pigramente sulla nuova versione
+        return ChatContext(after)
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+# Turni di chat recenti di cui vengono conservati i tempi per fase
+CHAT_TIMINGS_KEEP = 200
+
+
+class StageTimer:
+    """Wall-clock time of the stages of one chat turn (LLM calls, data extraction, ...)."""
+
+    def __init__(self, pipeline: str = ""):
+        self.pipeline = pipeline
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Una fase ripetuta nello stesso turno si somma
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def summary(self) -> str:
+        parts = " · ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.stages.items())
+        text = f"{parts} (totale {self.total * 1000:.0f} ms)"
+        return f"{self.pipeline}: {text}" if self.pipeline else text
+
+
+_recent: deque = deque(maxlen=CHAT_TIMINGS_KEEP)
+_recent_lock = threading.Lock()
+
+
+def record_timings(timer: StageTimer) -> None:
+    """Keep the stage timings of a finished turn for stage_statistics()."""
+    with _recent_lock:
+        _recent.append((timer.pipeline, dict(timer.stages)))
+
+
+def stage_statistics() -> pd.DataFrame:
+    """Median, p95 and count per pipeline and stage over the recent turns, in milliseconds."""
+    with _recent_lock:
+        rows: List[dict] = [
+            {"pipeline": pipeline, "stage": name, "ms": seconds * 1000}
+            for pipeline, stages in _recent for name, seconds in stages.items()
+        ]
+    if not rows:
+        return pd.DataFrame(columns=pd.Index(["pipeline", "stage", "turni", "p50 ms", "p95 ms"]))
+    grouped = pd.DataFrame(rows).groupby(["pipeline", "stage"], sort=False)["ms"]
+    return pd.DataFrame({
+        "turni": grouped.size(),
+        "p50 ms": grouped.median().round(0),
+        "p95 ms": grouped.quantile(0.95).round(0),
+    }).reset_index()
@@ -0,0 +1,371 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.chat_context import ENTITY_COLUMNS
+from src.schema import MONTHS
+from src.text_index import normalize_text
+from src.utils import to_fte
+
+# Allocazione mensile (in FTE) oltre la quale una risorsa è considerata sovraccarica.
+# Le colonne mese contengono giorni: vengono convertite con src/utils.to_fte (20 giorni = 1 FTE)
+OVERLOAD_THRESHOLD = float(os.getenv("SCHEDULING_OVERLOAD_THRESHOLD", "1"))
+
+# Righe massime mostrate nelle tabelle delle risposte
+MAX_ROWS = 30
+DEFAULT_TOP = 10
+
+MONTH_NAMES = dict(zip(
+    ["gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno",
+     "luglio", "agosto", "settembre", "ottobre", "novembre", "dicembre"],
+    MONTHS,
+))
+
+# Stati del dataset (normalizzati, senza spazi) e frasi con cui vengono chiesti
+STATUS_SYNONYMS = {
+    "ongoing": ["in corso", "on going", "ongoing", "in progress", "attivi", "aperti"],
+    "closed": ["chiusi", "chiuso", "completati", "completato", "conclusi", "terminati", "closed"],
+    "onhold": ["on hold", "sospesi", "sospeso", "in pausa"],
+    "tostart": ["da iniziare", "non iniziati", "non ancora iniziati", "to start", "da avviare"],
+    "proposal": ["proposta", "proposte", "proposal"],
+}
+_STATUS_ALIASES = {"tobestart": "tostart", "inprogress": "ongoing", "completed": "closed"}
+
+# Parole che precedono un'entità e ne indicano la colonna
+_COLUMN_HINTS = {
+    "CLIENT": {"cliente", "clienti", "client"},
+    "PROJECT_DESCR": {"progetto", "project"},
+    "PM_SM": {"pm", "manager", "gestiti", "gestito", "gestisce", "segue", "responsabile"},
+    "USER": {"risorsa", "utente", "user", "collaboratore", "persona"},
+}
+
+# Frasi comuni che non vanno scambiate per entità di una sola parola
+_STOPWORDS = {
+    "progetto", "progetti", "cliente", "clienti", "utente", "utenti", "risorsa", "risorse",
+    "stato", "mese", "mesi", "anno", "totale", "totali", "report", "dati", "info", "lista",
+    "chi", "quanti", "quante", "quali", "mostra", "mostrami", "elenca", *MONTH_NAMES,
+}
+
+# Parole che possono comparire in maiuscolo senza essere entità
+_KNOWN_WORDS = _STOPWORDS | {"fte", "pm", "sm", "jira", "kpi"} | {
+    w for phrases in STATUS_SYNONYMS.values() for p in phrases for w in p.split()
+}
+
+# Concetti fuori dalla grammatica (colonne PLANNED/ACTUAL_FTE, medie, assenze): risponde l'LLM
+_UNSUPPORTED = re.compile(r"\b(effettiv|actual|pianificat|planned|media|medio|senza|liber|meno)\w*")
+
+_OVERLOAD = re.compile(r"\b(sovraccaric|sovrallocat|overload|oltre capacita|superano|supera)\w*")
+_TOP = re.compile(r"\b(top|primi|prime|maggiori|piu fte|con piu|con il maggior|classifica)\b")
+_WHO = re.compile(r"\bchi\b|\brisorse\b|\bpersone\b|\bcollaboratori\b|\bsu cosa lavora\b")
+_FTE = re.compile(r"\b(fte|allocat\w*|allocazion\w*|carico|capacita|impegno)\b")
+_COUNT = re.compile(r"\b(?:top|primi|prime)\s+(\d{1,3})\b|\b(\d{1,3})\s+progetti\b")
+_THRESHOLD = re.compile(
+    r"\b(?:piu di|oltre|sopra|superiore a|supera|superano)\s+(?:il\s+)?(\d+(?:virgola\d+)?)\s*(percento|giorni|gg|fte)?\b"
+)
+
+
+@dataclass
+class ChatQuery:
+    """A question compiled to the grammar: one operation plus its filters."""
+    operation: str  # "fte", "top_projects", "who", "overload", "summary"
+    entities: List[Tuple[str, List]] = field(default_factory=list)
+    statuses: List[str] = field(default_factory=list)
+    months: List[str] = field(default_factory=list)
+    year: Optional[int] = None
+    top: int = DEFAULT_TOP
+    threshold: float = OVERLOAD_THRESHOLD  # FTE per mese
+
+    def describe(self) -> str:
+        parts = [f"{column} = {', '.join(dict.fromkeys(str(v).strip() for v in values))}" for column, values in self.entities]
+        if self.statuses:
+            parts.append(f"STATUS = {', '.join(self.statuses)}")
+        if self.year is not None:
+            parts.append(f"anno {self.year}")
+        if self.months:
+            parts.append(f"mesi {', '.join(self.months)}")
+        return f" ({'; '.join(parts)})" if parts else ""
+
+
+@dataclass
+class QueryResult:
+    """Structured answer of the local query engine."""
+    title: str
+    table: pd.DataFrame
+    notes: List[str] = field(default_factory=list)
+
+    def to_markdown(self) -> str:
+        text = f"**{self.title}**\n\n"
+        if not self.table.empty:
+            text += markdown_table(self.table.head(MAX_ROWS)) + "\n"
+            if len(self.table) > MAX_ROWS:
+                text += f"\n_... e altre {len(self.table) - MAX_ROWS} righe._\n"
+        if self.notes:
+            text += "\n" + "\n".join(f"- {note}" for note in self.notes) + "\n"
+        return text.strip()
+
+
+def _format(value) -> str:
+    if isinstance(value, (float, np.floating)):
+        return f"{round(float(value), 2):g}"
+    return str(value).strip()
+
+
+def markdown_table(df: pd.DataFrame) -> str:
+    header = "| " + " | ".join(str(c) for c in df.columns) + " |\n|" + "---|" * len(df.columns)
+    rows = ["| " + " | ".join(_format(v) for v in row) + " |" for row in df.itertuples(index=False)]
+    return header + "\n" + "\n".join(rows)
+
+
+def _is_name(question: str, word: str) -> bool:
+    # Una singola parola vale come entità solo se scritta con l'iniziale maiuscola ("Storti", non "cielo")
+    if word in _STOPWORDS:
+        return False
+    return any(
+        normalize_text(token) == word and token[:1].isupper()
+        for token in re.findall(r"[^\W_]+", question)
+    )
+
+
+def _status_key(value) -> str:
+    key = normalize_text(value).replace(" ", "")
+    return _STATUS_ALIASES.get(key, key)
+
+
+class ChatQueryEngine:
+    """
+    Deterministic answers to the common Chat questions.
+
+    ``parse`` maps a question onto a small grammar (entity filters, month
+    and year, top-N projects by allocated days, who works for an entity, overloaded
+    resources, entity summary) using the entity vocabulary of the data
+    version; ``run`` evaluates it with the entity index and NumPy
+    reductions over the cached month block. Questions outside the grammar
+    return None and are left to the LLM.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.df = dataset.frame()
+        self.context = dataset.chat_context
+
+    # ---------------------- parsing ----------------------
+
+    def _mentions(self, question: str, words: List[str]) -> List[Tuple[int, str]]:
+        # Corrispondenza più lunga per prima sugli n-grammi della domanda
+        vocabulary = self.context.entities()
+        found, i = [], 0
+        while i < len(words):
+            for n in range(min(6, len(words) - i), 0, -1):
+                phrase = " ".join(words[i:i + n])
+                if phrase in vocabulary and (n > 1 or _is_name(question, phrase)):
+                    found.append((i, phrase))
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    def _resolve(self, words: List[str], start: int, phrase: str) -> Tuple[str, List]:
+        candidates = self.context.entities()[phrase]
+        before = set(words[max(start - 3, 0):start])
+        for column, hints in _COLUMN_HINTS.items():
+            if column in candidates and before & hints:
+                return column, candidates[column]
+        column = next(c for c in ENTITY_COLUMNS if c in candidates)
+        return column, candidates[column]
+
+    def parse(self, question: str) -> Optional[ChatQuery]:
+        q = " ".join(normalize_text(question).split())
+        words = q.split()
+        query = ChatQuery("summary")
+        mentions = self._mentions(question, words)
+        # Un nome proprio che non è un'entità dei dati (cliente o progetto inesistente, stato
+        # non previsto) cambierebbe il significato della risposta: la domanda passa all'LLM
+        covered = {w for _, phrase in mentions for w in phrase.split()}
+        if _UNSUPPORTED.search(q) or any(
+            token[:1].isupper() and normalize_text(token) not in covered | _KNOWN_WORDS
+            for token in re.findall(r"[^\W_]+", question)[1:]
+        ):
+            return None
+        query.entities = [self._resolve(words, start, phrase) for start, phrase in mentions]
+        query.statuses = [key for key, phrases in STATUS_SYNONYMS.items()
+                          if any(re.search(rf"\b{p}\b", q) for p in phrases)]
+        month_cols = {c[:3].lower(): c for c in self.context.allocations()[0]}
+        query.months = [month_cols[m] for name, m in MONTH_NAMES.items() if re.search(rf"\b{name}\b", q) and m in month_cols]
+        year = re.search(r"\b(20\d\d)\b", q)
+        query.year = int(year.group(1)) if year else None
+        count = _COUNT.search(q)
+        if count:
+            query.top = int(count.group(1) or count.group(2))
+        elif re.search(r"\bil progetto\b", q):
+            query.top = 1
+        # La normalizzazione toglie punti e "%": decimali e percentuali vengono prima resi a parole
+        threshold = _THRESHOLD.search(" ".join(normalize_text(
+            re.sub(r"(\d)[.,](\d)", r"\1virgola\2", question.replace("%", " percento "))
+        ).split()))
+        if threshold:
+            # Soglia in FTE: "100%" vale 1 FTE, "40 giorni" 2 FTE, un numero senza unità è già in FTE
+            value, unit = float(threshold.group(1).replace("virgola", ".")), threshold.group(2)
+            query.threshold = value / 100 if unit == "percento" else to_fte(value) if unit in ("giorni", "gg") else value
+
+        if _OVERLOAD.search(q) or (threshold and _WHO.search(q)):
+            query.operation = "overload"
+        elif _TOP.search(q) and "progett" in q:
+            query.operation = "top_projects"
+        elif _WHO.search(q) and (query.entities or query.statuses):
+            query.operation = "who"
+        elif _FTE.search(q) and (query.months or query.year or query.entities or "totale" in q or "mese" in q):
+            query.operation = "fte"
+        elif query.entities or query.statuses:
+            query.operation = "summary"
+        else:
+            return None
+        return query
+
+    # ---------------------- valutazione ----------------------
+
+    def _positions(self, query: ChatQuery) -> np.ndarray:
+        df, index = self.df, self.dataset.index
+        positions = np.arange(len(df))
+        for column, values in query.entities:
+            if column in index.columns:
+                matched = np.concatenate([index.positions(column, v) for v in values])
+            else:
+                matched = np.flatnonzero(df[column].isin(values).to_numpy())
+            positions = np.intersect1d(positions, matched, assume_unique=False)
+        if query.statuses and "STATUS" in df.columns:
+            codes, uniques = pd.factorize(df["STATUS"])
+            wanted = np.flatnonzero([_status_key(u) in query.statuses for u in uniques])
+            positions = positions[np.isin(codes[positions], wanted)]
+        if query.year is not None and "YEAR" in df.columns:
+            years = pd.to_numeric(df["YEAR"], errors="coerce").to_numpy()
+            positions = positions[years[positions] == query.year]
+        return positions
+
+    def _block(self, query: ChatQuery, positions: np.ndarray) -> Tuple[List[str], np.ndarray]:
+        months, block = self.context.allocations()
+        selected = query.months or months
+        columns = [months.index(m) for m in selected]
+        return selected, block[positions][:, columns]
+
+    def run(self, query: ChatQuery) -> QueryResult:
+        positions = self._positions(query)
+        where = query.describe()
+        if len(positions) == 0:
+            return QueryResult(f"Nessuna riga trovata{where}", pd.DataFrame())
+        return getattr(self, f"_run_{query.operation}")(query, positions, where)
+
+    def _run_fte(self, query, positions, where) -> QueryResult:
+        months, block = self._block(query, positions)
+        totals = block.sum(axis=0)
+        table = pd.DataFrame({"Mese": months, "Giorni": totals, "FTE": to_fte(totals)})
+        notes = [
+            f"Totale: {_format(totals.sum())} giorni su {len(positions)} righe",
+            f"Media: {_format(to_fte(totals.mean()))} FTE al mese",
+        ]
+        return QueryResult(f"Allocazione mensile{where}", table, notes)
+
+    def _group(self, column: str, positions: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Distinct values of ``column`` among ``positions`` with their weight sums and first row."""
+        codes, uniques = pd.factorize(self.df[column].to_numpy()[positions])
+        valid = codes >= 0
+        sums = np.bincount(codes[valid], weights=weights[valid], minlength=len(uniques))
+        _, first = np.unique(codes, return_index=True)
+        first = first[np.unique(codes) >= 0]
+        return np.asarray(uniques, dtype=object), sums, positions[first]
+
+    def _first(self, column: str, rows: np.ndarray) -> List:
+        if column not in self.df.columns:
+            return [""] * len(rows)
+        return self.df[column].to_numpy()[rows].tolist()
+
+    def _run_top_projects(self, query, positions, where) -> QueryResult:
+        _, block = self._block(query, positions)
+        projects, sums, first = self._group("PROJECT_DESCR", positions, block.sum(axis=1))
+        order = np.argsort(-sums, kind="stable")[:query.top]
+        table = pd.DataFrame({
+            "Progetto": projects[order],
+            "Cliente": self._first("CLIENT", first[order]),
+            "PM": self._first("PM_SM", first[order]),
+            "Giorni": sums[order],
+        })
+        title = "Progetto con più giorni allocati" if query.top == 1 else f"Primi {len(table)} progetti per giorni allocati"
+        return QueryResult(title + where, table)
+
+    def _run_who(self, query, positions, where) -> QueryResult:
+        _, block = self._block(query, positions)
+        users, sums, _ = self._group("USER", positions, block.sum(axis=1))
+        pairs = self.df[["USER", "PROJECT_DESCR"]].iloc[positions].drop_duplicates()
+        projects = pairs.groupby("USER", observed=True, sort=False)["PROJECT_DESCR"].agg(
+            lambda values: ", ".join(str(v).strip() for v in values)
+        )
+        order = np.argsort(-sums, kind="stable")
+        table = pd.DataFrame({
+            "Risorsa": users[order],
+            "Progetti": [projects.get(u, "") for u in users[order]],
+            "Giorni": sums[order],
+        })
+        return QueryResult(f"Risorse coinvolte{where}", table, [f"Risorse: {len(table)}"])
+
+    def _run_overload(self, query, positions, where) -> QueryResult:
+        months, block = self._block(query, positions)
+        # Una riga della matrice per coppia (risorsa, anno): i mesi di anni diversi non si sommano
+        years = self.df["YEAR"].to_numpy()[positions] if "YEAR" in self.df.columns else np.zeros(len(positions))
+        codes, keys = pd.factorize(pd.MultiIndex.from_arrays([self.df["USER"].to_numpy()[positions], years]))
+        valid = codes >= 0
+        matrix = np.zeros((len(keys), len(months)))
+        np.add.at(matrix, codes[valid], block[valid])
+        fte = to_fte(matrix)
+        rows, cols = np.nonzero(fte > query.threshold)
+        excess = fte[rows, cols] - query.threshold
+        order = np.argsort(-excess, kind="stable")
+        table = pd.DataFrame({
+            "Risorsa": keys.get_level_values(0).to_numpy(dtype=object)[rows[order]],
+            "Anno": keys.get_level_values(1).to_numpy(dtype=object)[rows[order]],
+            "Mese": np.asarray(months, dtype=object)[cols[order]],
+            "Giorni": matrix[rows, cols][order],
+            "FTE": fte[rows, cols][order],
+            "Eccedenza FTE": excess[order],
+        })
+        notes = [
+            f"Soglia: {_format(query.threshold)} FTE al mese ({_format(query.threshold / to_fte(1))} giorni)",
+            f"Risorse sovraccariche: {table['Risorsa'].nunique()}",
+        ]
+        return QueryResult(f"Risorse oltre la soglia di allocazione{where}", table, notes)
+
+    def _run_summary(self, query, positions, where) -> QueryResult:
+        _, block = self._block(query, positions)
+        projects, sums, first = self._group("PROJECT_DESCR", positions, block.sum(axis=1))
+        pairs = self.df[["PROJECT_DESCR", "USER"]].iloc[positions].drop_duplicates()
+        people = pairs.groupby("PROJECT_DESCR", observed=True, sort=False)["USER"].nunique()
+        order = np.argsort(-sums, kind="stable")
+        table = pd.DataFrame({
+            "Progetto": projects[order],
+            "Cliente": self._first("CLIENT", first[order]),
+            "PM": self._first("PM_SM", first[order]),
+            "Stato": self._first("STATUS", first[order]),
+            "Risorse": [int(people.get(p, 0)) for p in projects[order]],
+            "Giorni": sums[order],
+        })
+        notes = [
+            f"Progetti: {len(table)}, risorse: {int(pairs['USER'].nunique())}, righe: {len(positions)}",
+            f"Giorni allocati: {_format(sums.sum())}",
+        ]
+        for column, label in (("START_DATE", "Inizio"), ("END_DATE", "Fine")):
+            if column in self.df.columns:
+                dates = self.df[column].iloc[positions].dropna()
+                if not dates.empty:
+                    day = dates.min() if column == "START_DATE" else dates.max()
+                    notes.append(f"{label}: {day:%Y-%m-%d}")
+        return QueryResult(f"Riepilogo{where}", table, notes)
+
+
+def answer_locally(question: str, dataset) -> Optional[QueryResult]:
+    """Answer ``question`` with the local query engine, or None if it is outside the grammar."""
+    engine = ChatQueryEngine(dataset)
+    query = engine.parse(question)
+    return engine.run(query) if query is not None else None
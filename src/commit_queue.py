@@ -0,0 +1,153 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+# Numero massimo di commit applicati insieme dallo scrittore unico
+COMMIT_BATCH_MAX = int(os.getenv("SCHEDULING_COMMIT_BATCH_MAX", "64"))
+
+# Versioni dei dati ricordate per il controllo ottimistico (e il rebase) dei commit
+HISTORY_LIMIT = 1000
+
+# Celle toccate da un commit: ROW_ID -> colonne (None = riga intera, inserita o eliminata)
+Touched = Dict[int, Optional[Set[str]]]
+
+
+class StaleWriteError(RuntimeError):
+    """A write based on a data version that changed underneath it, with overlapping edits."""
+
+    def __init__(self, message: str, conflicts: Iterable = ()):
+        super().__init__(message)
+        self.conflicts = list(conflicts)
+
+
+@dataclass
+class ChangeSet:
+    """One commit request: row inserts, cell updates and deletes, plus the version it was based on."""
+    inserts: Optional[pd.DataFrame] = None
+    updates: Optional[Dict[int, dict]] = None
+    deletes: Optional[List[int]] = None
+    expected_version: Optional[str] = None
+
+    def touched(self) -> Touched:
+        cells: Touched = {}
+        for row_id, values in (self.updates or {}).items():
+            cells.setdefault(int(row_id), set()).update(values)
+        for row_id in self.deletes or ():
+            cells[int(row_id)] = None
+        return cells
+
+
+def merge_touched(target: Touched, cells: Touched) -> None:
+    for row_id, columns in cells.items():
+        if columns is None or target.get(row_id, set()) is None:
+            target[row_id] = None
+        else:
+            target.setdefault(row_id, set()).update(columns)
+
+
+def conflicts(ours: Touched, theirs: Touched) -> List[tuple]:
+    """(ROW_ID, columns) edited by both sides; a deleted row conflicts with any edit."""
+    found = []
+    for row_id, columns in ours.items():
+        if row_id not in theirs:
+            continue
+        other = theirs[row_id]
+        if columns is None or other is None:
+            found.append((row_id, None))
+        elif columns & other:
+            found.append((row_id, sorted(columns & other)))
+    return found
+
+
+class VersionHistory:
+    """
+    Cells touched by the recent commits, keyed by the data version each
+    commit was applied on, so a write based on an older version can be
+    rebased when its edits do not overlap the ones made since.
+    """
+
+    def __init__(self, limit: int = HISTORY_LIMIT):
+        self._entries: deque = deque(maxlen=limit)
+        self._aliases: Dict[str, str] = {}
+
+    def canonical(self, version: Optional[str]) -> Optional[str]:
+        return self._aliases.get(version, version)
+
+    def record(self, version_before: str, cells: Touched) -> None:
+        self._entries.append((self.canonical(version_before), cells))
+
+    def alias(self, new_version: str, old_version: str) -> None:
+        """``new_version`` names the same data as ``old_version`` (log flush, compaction)."""
+        if new_version != old_version:
+            self._aliases[new_version] = self.canonical(old_version)
+            if len(self._aliases) > self._entries.maxlen:
+                self._aliases.pop(next(iter(self._aliases)))
+
+    def reset(self) -> None:
+        self._entries.clear()
+        self._aliases.clear()
+
+    def touched_since(self, version: str, current: str) -> Optional[Touched]:
+        """Cells changed after ``version`` (None if the version is unknown or too old)."""
+        version = self.canonical(version)
+        if version == self.canonical(current):
+            return {}
+        cells: Touched = {}
+        found = False
+        for before, touched in self._entries:
+            found = found or before == version
+            if found:
+                merge_touched(cells, touched)
+        return cells if found else None
+
+
+class CommitQueue:
+    """
+    Single writer for the scheduling data.
+
+    Sessions enqueue their change sets and wait on a future; one thread
+    drains the queue and hands up to COMMIT_BATCH_MAX change sets at a time
+    to ``apply_batch``, which applies them with one pass over the dataset
+    and one log write (group commit) and returns one result or exception
+    per change set.
+    """
+
+    def __init__(self, apply_batch: Callable[[List[ChangeSet]], List[object]], batch_max: int = COMMIT_BATCH_MAX):
+        self._apply_batch = apply_batch
+        self.batch_max = max(int(batch_max), 1)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, changes: ChangeSet) -> Future:
+        future: Future = Future()
+        self._queue.put((changes, future))
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="scheduling-writer", daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                results = self._apply_batch([changes for changes, _ in batch])
+            except BaseException as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -1,23 +1,106 @@
-from pathlib import Path
 import pandas as pd
-import shutil
-from datetime import datetime
-import streamlit as st
-
-DATA_FILE = Path(__file__).resolve().parent.parent / "data" / "SCHEDULING.xlsx"
-DATA_FILE.parent.mkdir(exist_ok=True, parents=True)
-
-def create_backup():
-    """Create a backup of the current file if it exists."""
-    if DATA_FILE.exists():
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = DATA_FILE.parent / f"SCHEDULING_backup_{timestamp}.xlsx"
-        try:
-            shutil.copy2(DATA_FILE, backup_file)
-            return backup_file
-        except Exception as e:
-            print(f"Failed to create backup: {e}")
-    return None
+import atexit
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+from src.storage import DATA_DIR, EXCEL_FILE, atomic_replace, get_storage
+from src.snapshots import Snapshot, SnapshotStore
+from src.io_executor import get_io_executor
+from src.locking import FileLock
+from src.commit_queue import ChangeSet, CommitQueue, StaleWriteError, VersionHistory, conflicts, merge_touched
+from src.indexes import EntityIndex
+from src.aggregates import FteCube
+from src.text_index import TextIndex
+from src.chat_context import ChatContext
+from src.schema import SCHEMA, apply_schema, ensure_columns
+from src.dataset import ColumnProfiles, ScheduleDataset, ValidationReport
+from src.changelog import (
+    COMPACT_THRESHOLD, ROW_ID, ChangeLog, apply_changes, delete_ops, ensure_row_ids,
+    insert_ops, next_row_id, update_ops,
+)
+
+DATA_FILE = EXCEL_FILE
+
+# Copy-on-Write (sempre attivo da pandas 3): le copie superficiali restano isolate
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Dataset condiviso a livello di processo, indicizzato per versione dei dati
+_shared_lock = threading.Lock()
+# "derived" contiene gli artefatti calcolati sul dataset (indici, cubo FTE, ...)
+_shared_cache = {"version": None, "df": None, "derived": {}}
+
+# Scritture serializzate: salvataggi completi, change log e compattazione.
+# _write_lock protegge lo stato del processo, il lock su file le scritture su disco
+# rispetto ad altri processi che usano la stessa cartella data/
+_write_lock = threading.RLock()
+_file_lock = FileLock(DATA_DIR / "SCHEDULING.lock")
+# Celle toccate dai commit recenti, per il controllo ottimistico delle versioni
+_history = VersionHistory()
+_change_log = ChangeLog()
+# Operazioni già applicate al dataset in memoria ma non ancora scritte nel change log:
+# i commit ravvicinati vengono accorpati in una sola scrittura dall'executor di I/O
+_pending_ops: list = []
+_pending_commits = 0
+# Snapshot deduplicati dei file dati (data/snapshots/), presi a ogni scrittura su disco
+_snapshots = SnapshotStore()
+SNAPSHOT_ON_COMMIT = os.getenv("SCHEDULING_SNAPSHOT_ON_COMMIT", "1") != "0"
+
+@contextmanager
+def _exclusive_write():
+    """Hold the process write lock and the inter-process file lock."""
+    with _write_lock, _file_lock:
+        yield
+
+def _take_snapshot(reason: str) -> Optional[Snapshot]:
+    """Snapshot the data files (main store, LoVs, change log); errors are logged, not raised."""
+    try:
+        with _file_lock:
+            snapshot = _snapshots.take(get_storage().files() + [_change_log.path], reason)
+    except Exception as e:
+        print(f"Failed to create snapshot: {e}")
+        return None
+    try:
+        get_io_executor().submit_coalesced("snapshot-prune", _snapshots.prune)
+    except RuntimeError:
+        # Executor già chiuso (flush all'uscita): la pulizia avverrà al prossimo snapshot
+        pass
+    return snapshot
+
+def create_backup() -> Optional[str]:
+    """Snapshot the current data files. Returns the snapshot id (or None)."""
+    snapshot = _take_snapshot("backup")
+    return snapshot.snapshot_id if snapshot is not None else None
+
+def list_snapshots() -> List[Snapshot]:
+    """Available snapshots, newest first."""
+    return _snapshots.list()
+
+def restore_snapshot(snapshot_id: str) -> None:
+    """
+    Bring the data files back to a snapshot. The current state is
+    snapshotted first, so a restore can itself be undone.
+    """
+    global _pending_commits
+    flush_changes()
+    with _exclusive_write():
+        _take_snapshot("before restore")
+        _snapshots.restore(snapshot_id)
+        _pending_ops.clear()
+        _pending_commits = 0
+        _history.reset()
+        invalidate_shared_data()
+
+def _restore_and_reload(snapshot_id: str) -> None:
+    restore_snapshot(snapshot_id)
+    # Il dataset ripristinato viene caricato dal worker: il rerun della pagina lo trova già in cache
+    load_dataset()
+
+def restore_in_background(snapshot_id: str) -> Future:
+    """Queue restore_snapshot (and the reload of the dataset) on the I/O executor; the page polls the future."""
+    return get_io_executor().submit_coalesced("restore", _restore_and_reload, snapshot_id, delay=0)
 
 def create_new_scheduling_file():
     """Create a new scheduling Excel file with proper structure."""
@@ -78,103 +161,446 @@ def create_new_scheduling_file():
     }
     lovs_df = pd.DataFrame(lovs_data)
     
-    # Save to new Excel file
-    with pd.ExcelWriter(DATA_FILE, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Scheduling', index=False)
-        lovs_df.to_excel(writer, sheet_name='LoVs', index=False)
+    # Save through the configured storage engine
+    df = ensure_row_ids(df)
+    storage = get_storage()
+    with _exclusive_write():
+        storage.write(df)
+        storage.write_lovs(lovs_df)
+        _clear_log()
+        _history.reset()
+        _take_snapshot("new file")
     
     return df
 
-def load_shared_scheduling_data():
-    """Load scheduling data from session state if available, otherwise from file."""
+def normalize_scheduling(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the missing schema columns and cast the dataset to its compact
+    typed schema (ensure_columns ends with src/schema.apply_schema).
+
+    Runs once per data version (load, save, commit), so pages never need
+    to re-check or re-cast the columns.
+    """
+    return ensure_columns(df, [spec.name for spec in SCHEMA])
+
+def get_data_version() -> str:
+    """Return the version token of the dataset currently on disk (main store + change log)."""
+    storage = get_storage()
+    version = f"{storage.name}:{storage.version()}:{_change_log.size()}"
+    return f"{version}+{_pending_commits}" if _pending_ops else version
+
+def content_version(version: Optional[str]) -> Optional[str]:
+    """
+    Stable name of the data behind ``version``: change-log flushes and
+    compactions relabel the version of unchanged data, this maps every
+    label back to the first one (for caches keyed on the content).
+    """
+    return _history.canonical(version)
+
+def _clear_log() -> None:
+    """Truncate the change log, pending (not yet written) operations included."""
+    global _pending_commits
+    _change_log.clear()
+    _pending_ops.clear()
+    _pending_commits = 0
+
+def _flush_pending() -> int:
+    """Write the pending operations to the change log in one append. Returns the number written."""
+    global _pending_commits
+    with _exclusive_write():
+        if not _pending_ops:
+            return 0
+        before = get_data_version()
+        written = _change_log.append(_pending_ops)
+        _pending_ops.clear()
+        _pending_commits = 0
+        if SNAPSHOT_ON_COMMIT:
+            _take_snapshot("commit")
+        # Il dataset in memoria contiene già queste operazioni: cambia solo la versione.
+        # Se un altro processo ha scritto nel frattempo le versioni non coincidono
+        # e il prossimo accesso rilegge storage e change log
+        after = get_data_version()
+        with _shared_lock:
+            if _shared_cache["version"] == before:
+                _shared_cache["version"] = after
+                _history.alias(after, before)
+        if _change_log.count() >= COMPACT_THRESHOLD:
+            compact_in_background()
+    return written
+
+def flush_changes() -> int:
+    """Write the committed changes still waiting in the coalescing window to disk now."""
+    executor = get_io_executor()
+    scheduled = executor.pending("changelog")
+    executor.flush("changelog")
+    written = scheduled.result() if scheduled is not None else 0
+    return written + _flush_pending()
+
+def _share(df: pd.DataFrame, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    # Copia superficiale: con Copy-on-Write i dati vengono duplicati solo se la pagina li modifica
+    if columns is not None:
+        return df[[c for c in columns if c in df.columns]]
+    return df.copy(deep=False)
+
+# Artefatti derivati dal dataset: costruiti al primo uso per ogni versione dei dati
+# e aggiornati in modo incrementale da commit_changes tramite il loro metodo updated()
+_DERIVED_BUILDERS = {
+    "index": EntityIndex,
+    "cube": FteCube,
+    "validation": ValidationReport,
+    "profiles": ColumnProfiles,
+    "text": TextIndex,
+    "chat": ChatContext,
+}
+
+def _set_shared(df: pd.DataFrame, version: str, derived: Optional[dict] = None) -> None:
+    with _shared_lock:
+        _shared_cache["version"] = version
+        _shared_cache["df"] = df
+        _shared_cache["derived"] = dict(derived or {})
+
+def _derived_for(df: pd.DataFrame) -> dict:
+    with _shared_lock:
+        return dict(_shared_cache["derived"]) if _shared_cache["df"] is df else {}
+
+def _get_derived(df: pd.DataFrame, name: str):
+    """Return the derived artifact ``name`` for the cached frame ``df``, building it if needed."""
+    artifact = _derived_for(df).get(name)
+    if artifact is None:
+        artifact = _DERIVED_BUILDERS[name](df)
+        with _shared_lock:
+            if _shared_cache["df"] is df:
+                _shared_cache["derived"][name] = artifact
+    return artifact
+
+def _snapshot() -> pd.DataFrame:
+    try:
+        return _current_frame()
+    except Exception:
+        # Percorso di recupero di load_scheduling (backup + file di esempio)
+        load_scheduling()
+        return _current_frame()
+
+def load_shared_scheduling_data(columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Return the process-wide cached dataset if it matches the data on disk.
+
+    The cached DataFrame is shared by all sessions and never handed out
+    directly: callers receive a shallow copy, so memory is duplicated only
+    for the columns a page actually modifies.
+    """
     try:
-        # Check if shared data is available in session state
-        if hasattr(st, 'session_state') and 'shared_scheduling_data' in st.session_state:
-            shared_data = st.session_state.shared_scheduling_data
-            if shared_data is not None:
-                return shared_data.copy()
+        version = get_data_version()
+        with _shared_lock:
+            if _shared_cache["df"] is not None and _shared_cache["version"] == version:
+                return _share(_shared_cache["df"], columns)
     except Exception as e:
         print(f"Error loading shared data: {e}")
     
     # Fallback to file loading
     return None
 
-def load_scheduling(sheet_name: str = "Scheduling") -> pd.DataFrame:
-    """Load the scheduling sheet as DataFrame with error handling."""
-    # First try to load from shared session state
-    shared_df = load_shared_scheduling_data()
+def publish_shared_data(df: pd.DataFrame) -> str:
+    """
+    Register ``df`` (already saved to disk) as the process-wide cached dataset.
+
+    save_scheduling and commit_changes publish the frame they wrote, so if
+    the cache already matches the data on disk it is left untouched.
+    Returns the data version the DataFrame is registered under.
+    """
+    version = get_data_version()
+    with _shared_lock:
+        if _shared_cache["df"] is not None and _shared_cache["version"] == version:
+            return version
+    _set_shared(normalize_scheduling(df.copy(deep=False)), version)
+    return version
+
+def invalidate_shared_data() -> None:
+    """Drop the process-wide cached dataset so the next load re-reads the storage."""
+    _set_shared(None, None)
+
+def _load_full(storage) -> pd.DataFrame:
+    """Read the main store, replay the change log and cache the result."""
+    _flush_pending()
+    with _file_lock:
+        version = get_data_version()
+        df = storage.read()
+        ops = _change_log.read()
+    if ROW_ID in df.columns:
+        df = apply_changes(df, ops)
+    elif ops:
+        print("Change log ignored: the main store has no ROW_ID column")
+    if ROW_ID not in df.columns or df[ROW_ID].isna().any():
+        # Migrazione una tantum: assegna gli identificativi di riga e li salva nello storage
+        with _exclusive_write():
+            df = ensure_row_ids(df)
+            storage.write(df)
+            _clear_log()
+        version = get_data_version()
+    df = normalize_scheduling(df)
+    _set_shared(df, version)
+    return df
+
+def _current_frame() -> pd.DataFrame:
+    """Return the cached full dataset, loading it if the cache is stale."""
+    version = get_data_version()
+    with _shared_lock:
+        if _shared_cache["df"] is not None and _shared_cache["version"] == version:
+            return _shared_cache["df"]
+    # Ricontrollo sotto il lock di scrittura: la versione letta può cadere a metà
+    # di un commit o di un flush del change log, che non richiedono di rileggere il disco
+    with _write_lock:
+        version = get_data_version()
+        with _shared_lock:
+            if _shared_cache["df"] is not None and _shared_cache["version"] == version:
+                return _shared_cache["df"]
+        return _load_full(get_storage())
+
+def load_dataset() -> ScheduleDataset:
+    """
+    Return the normalized dataset of the current data version.
+
+    The frame, its entity index, FTE cube and validation report all come
+    from the same snapshot; the derived artifacts are built on first use.
+    """
+    df = _snapshot()
+    with _shared_lock:
+        version = _shared_cache["version"] if _shared_cache["df"] is df else None
+    return ScheduleDataset(df, version, lambda name: _get_derived(df, name))
+
+def load_scheduling(sheet_name: str = "Scheduling", columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Load the scheduling dataset as DataFrame with error handling.
+
+    ``columns`` restricts the load to a projection of the table; with the
+    Parquet engine only those columns are read from disk.
+    """
+    # First try to load from the process-wide shared cache
+    shared_df = load_shared_scheduling_data(columns)
     if shared_df is not None:
         return shared_df
     
     # Fallback to file loading
     try:
-        df = pd.read_excel(DATA_FILE, sheet_name=sheet_name)
-        
-        # Normalize data types to prevent Arrow conversion issues
-        # Ensure YEAR_OF_COMPETENCE is always string
-        if "YEAR_OF_COMPETENCE" in df.columns:
-            df["YEAR_OF_COMPETENCE"] = df["YEAR_OF_COMPETENCE"].fillna("").astype(str)
-        
-        # Ensure other text columns are strings
-        text_columns = ["PM_SM", "WORKSTREAM", "SOW_ID", "JIRA_KEY", "PROJECT_STREAM", "AREA_CC", "JOB", "STATUS", 
-                       "CLIENT", "ITEM_TYPE", "DELIVERY_TYPE"]
-        for col in text_columns:
-            if col in df.columns:
-                df[col] = df[col].fillna("").astype(str)
-        
-        # Ensure numeric columns are integers
-        numeric_columns = ["YEAR", "PROGRESS_%", "PLANNED_FTE", "ACTUAL_FTE"]
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
-        
-        # Ensure date columns are datetime objects
-        date_columns = ["START_DATE", "END_DATE"]
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-        
-        return df
+        storage = get_storage()
+        if storage.name == "excel" and sheet_name != "Scheduling":
+            storage.sheet_name = sheet_name
+        # Only the full table is cached: projections are cheap to re-read
+        if columns is not None:
+            _flush_pending()
+            df = storage.read(columns=list(columns) + [ROW_ID])
+            if ROW_ID in df.columns:
+                df = apply_changes(df, _change_log.read())
+                return apply_schema(df[[c for c in columns if c in df.columns]])
+        return _share(_load_full(storage), columns)
     except Exception as e:
-        print(f"Error loading Excel file: {e}")
+        print(f"Error loading scheduling data ({get_storage().name}): {e}")
         print("Creating backup and new file...")
         
-        # Create backup of corrupted file
-        backup_file = create_backup()
-        if backup_file:
-            print(f"Backup created: {backup_file}")
+        # Snapshot of the corrupted files
+        backup_id = create_backup()
+        if backup_id:
+            print(f"Snapshot created: {backup_id}")
         
         # Create new file with sample data
         print("Creating new scheduling file with sample data...")
-        return create_new_scheduling_file()
+        df = create_new_scheduling_file()
+        if columns is not None:
+            return df[[c for c in columns if c in df.columns]]
+        return df
 
-def save_scheduling(df: pd.DataFrame, sheet_name: str = "Scheduling") -> None:
-    """Save the DataFrame back to the Excel file with error handling."""
-    try:
-        # Load existing LoVs if they exist
+def save_scheduling(df: pd.DataFrame, sheet_name: str = "Scheduling",
+                    expected_version: Optional[str] = None) -> None:
+    """
+    Save the whole DataFrame through the configured storage engine with error handling.
+
+    The main store is rewritten and the change log is truncated; for edits
+    touching a few rows use commit_changes instead. With ``expected_version``
+    (the data version ``df`` was loaded from) the save is rejected with
+    StaleWriteError if the data changed since: a full rewrite cannot be rebased.
+    """
+    storage = get_storage()
+    if storage.name == "excel" and sheet_name != "Scheduling":
+        storage.sheet_name = sheet_name
+    with _exclusive_write():
+        current_version = get_data_version()
+        if expected_version is not None and _history.canonical(expected_version) != _history.canonical(current_version):
+            raise StaleWriteError(
+                f"The data changed since version {expected_version} (now {current_version}): reload before saving"
+            )
+        df = ensure_row_ids(df.copy(deep=False))
         try:
-            existing_lovs = pd.read_excel(DATA_FILE, sheet_name="LoVs")
-        except:
-            existing_lovs = None
-        
-        with pd.ExcelWriter(DATA_FILE, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            if existing_lovs is not None:
-                existing_lovs.to_excel(writer, sheet_name="LoVs", index=False)
+            storage.write(df)
+        except Exception as e:
+            print(f"Error saving scheduling data ({storage.name}): {e}")
+            if storage.name != "excel":
+                raise
+            # Fallback: try to save with overwrite
+            try:
+                with atomic_replace(storage.path) as tmp_path:
+                    with pd.ExcelWriter(tmp_path, engine="openpyxl", mode="w") as writer:
+                        df.to_excel(writer, sheet_name=sheet_name, index=False)
+            except Exception as e2:
+                print(f"Failed to save file: {e2}")
+                raise
+        _clear_log()
+        _history.reset()
+        _take_snapshot("save")
+        _set_shared(normalize_scheduling(df), get_data_version())
+
+def save_scheduling_chunks(chunks: Iterable[pd.DataFrame]) -> int:
+    """
+    Replace the whole dataset with a stream of DataFrame chunks.
+
+    Each chunk gets consecutive ROW_IDs and is handed to the storage engine
+    as it arrives (the Parquet engine writes one row group per chunk), so
+    a large import never needs the full table in memory. The shared cache
+    is dropped and rebuilt from storage on the next load.
+    """
+    def numbered():
+        next_id = 0
+        for chunk in chunks:
+            chunk = ensure_row_ids(chunk.drop(columns=[ROW_ID], errors="ignore").reset_index(drop=True), start=next_id)
+            next_id += len(chunk)
+            yield chunk
+
+    with _exclusive_write():
+        rows = get_storage().write_chunks(numbered())
+        _clear_log()
+        _history.reset()
+        _take_snapshot("import")
+        invalidate_shared_data()
+    return rows
+
+def _apply_batch(batch: List[ChangeSet]) -> List[object]:
+    """
+    Apply a batch of change sets from the commit queue (single writer).
+
+    Each change set based on an older version is rebased if the cells it
+    edits were not changed since (by earlier commits or by the change sets
+    before it in the batch), otherwise it gets a StaleWriteError. The
+    accepted ones are applied in one pass: one new dataset version, one
+    incremental update of the derived artifacts, one pending log append.
+    """
+    global _pending_commits
+    results: List[object] = []
+    with _write_lock:
+        current = _current_frame()
+        version = get_data_version()
+        ops: List[dict] = []
+        accepted: dict = {}
+        next_id = next_row_id(current)
+        for changes in batch:
+            cells = changes.touched()
+            if changes.expected_version is not None:
+                since = _history.touched_since(changes.expected_version, version)
+                if since is None:
+                    results.append(StaleWriteError(
+                        f"Data version {changes.expected_version} is no longer available: reload and retry"
+                    ))
+                    continue
+                merge_touched(since, accepted)
+                found = conflicts(cells, since)
+                if found:
+                    results.append(StaleWriteError(
+                        f"{len(found)} edited rows were changed by another session: reload and retry", found
+                    ))
+                    continue
+            if changes.inserts is not None and len(changes.inserts) > 0:
+                inserts = changes.inserts.reset_index(drop=True)
+                inserts[ROW_ID] = range(next_id, next_id + len(inserts))
+                next_id += len(inserts)
+                ops += insert_ops(inserts)
+                cells.update({int(row_id): None for row_id in inserts[ROW_ID]})
+            if changes.updates:
+                ops += update_ops(changes.updates)
+            if changes.deletes:
+                ops += delete_ops(changes.deletes)
+            merge_touched(accepted, cells)
+            results.append(None)
+        if not ops:
+            df = current
+        else:
+            _pending_ops.extend(ops)
+            _pending_commits += 1
+            df = normalize_scheduling(apply_changes(current.copy(deep=False), ops))
+            # Indici e cubo FTE vengono aggiornati solo per le righe toccate
+            touched = [op["row_id"] for op in ops]
+            derived = {
+                name: artifact.updated(current, df, touched)
+                for name, artifact in _derived_for(current).items()
+            }
+            _history.record(version, accepted)
+            _set_shared(df, get_data_version(), derived)
+    if ops:
+        get_io_executor().submit_coalesced("changelog", _flush_pending)
+    return [result if result is not None else df for result in results]
+
+_commit_queue = CommitQueue(_apply_batch)
+
+def commit_changes(
+    inserts: Optional[pd.DataFrame] = None,
+    updates: Optional[Dict[int, dict]] = None,
+    deletes: Optional[Iterable[int]] = None,
+    expected_version: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Apply row-level changes by appending them to the change log.
+
+    Args:
+        inserts: new rows; they receive fresh ROW_IDs
+        updates: ``{row_id: {column: value}}`` with only the changed cells
+        deletes: ROW_IDs of the rows to remove
+        expected_version: data version the edits were based on; if the
+            data changed since, the commit is rebased when it does not
+            touch the same cells, otherwise StaleWriteError is raised
+
+    Returns the updated dataset. Commits go through a single-writer queue
+    that applies concurrent commits together; the shared dataset is
+    updated at once, while the changed rows are appended to the log by
+    the I/O executor, and the commits made within the coalescing window
+    (SCHEDULING_WRITE_COALESCE_MS) share one append. Once the log grows
+    past COMPACT_THRESHOLD it is folded into the main store by a
+    background compaction.
+    """
+    changes = ChangeSet(inserts, updates, list(deletes) if deletes is not None else None, expected_version)
+    return _share(_commit_queue.submit(changes).result())
+
+def compact() -> bool:
+    """Fold the change log into the main store. Returns True if anything was compacted."""
+    with _exclusive_write():
+        if _change_log.size() == 0 and not _pending_ops:
+            return False
+        df = _current_frame()
+        before = get_data_version()
+        derived = _derived_for(df)
+        get_storage().write(df)
+        _clear_log()
+        if SNAPSHOT_ON_COMMIT:
+            _take_snapshot("compaction")
+        after = get_data_version()
+        _history.alias(after, before)
+        _set_shared(df, after, derived)
+    return True
+
+def _compact_logged() -> bool:
+    try:
+        return compact()
     except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        # Fallback: try to save with overwrite
-        try:
-            with pd.ExcelWriter(DATA_FILE, engine="openpyxl", mode="w") as writer:
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-        except Exception as e2:
-            print(f"Failed to save file: {e2}")
-            raise
+        print(f"Change log compaction failed: {e}")
+        return False
+
+def compact_in_background() -> Future:
+    """Queue a compaction on the I/O executor; requests made before it starts share it."""
+    return get_io_executor().submit_coalesced("compact", _compact_logged, delay=0)
+
+# Le modifiche ancora nella finestra di accorpamento vengono scritte prima dell'uscita
+atexit.register(flush_changes)
 
 def load_lovs() -> pd.DataFrame:
     """Load the LoVs sheet as DataFrame with error handling."""
     try:
-        return pd.read_excel(DATA_FILE, sheet_name="LoVs")
+        return get_storage().read_lovs()
     except Exception as e:
         print(f"Error loading LoVs: {e}")
         # Return empty DataFrame with expected structure
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.aggregates import month_columns
+from src.changelog import ROW_ID
+from src.schema import allocation_columns
+
+_ISSUE_COLUMNS = [ROW_ID, "COLUMN", "ISSUE"]
+
+
+def find_issues(df: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized data-quality checks; one row per (ROW_ID, column, issue)."""
+    checks = []
+    for col in ("PROJECT_DESCR", "USER"):
+        if col in df.columns:
+            checks.append((col, "empty value", df[col].astype(str).str.strip() == ""))
+    if "START_DATE" in df.columns:
+        checks.append(("START_DATE", "missing or invalid date", df["START_DATE"].isna()))
+    if "START_DATE" in df.columns and "END_DATE" in df.columns:
+        checks.append(("END_DATE", "ends before START_DATE", df["END_DATE"] < df["START_DATE"]))
+    if "PROGRESS_%" in df.columns:
+        checks.append(("PROGRESS_%", "outside 0-100", ~df["PROGRESS_%"].between(0, 100)))
+    for col in month_columns(df):
+        checks.append((col, "negative allocation", df[col] < 0))
+
+    frames = []
+    ids = df[ROW_ID].to_numpy() if ROW_ID in df.columns else np.arange(len(df))
+    for col, issue, mask in checks:
+        mask = mask.to_numpy(dtype=bool, na_value=False)
+        if mask.any():
+            frames.append(pd.DataFrame({ROW_ID: ids[mask], "COLUMN": col, "ISSUE": issue}))
+    if not frames:
+        return pd.DataFrame(columns=pd.Index(_ISSUE_COLUMNS))
+    return pd.concat(frames, ignore_index=True)
+
+
+class ValidationReport:
+    """
+    Data-quality issues of the scheduling table, computed once per data version.
+
+    Like the entity index and the FTE cube, ``updated`` re-checks only the
+    rows touched by a commit.
+    """
+
+    def __init__(self, df: pd.DataFrame, _issues: Optional[pd.DataFrame] = None):
+        self.issues = find_issues(df) if _issues is None else _issues
+
+    def __len__(self) -> int:
+        return len(self.issues)
+
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "ValidationReport":
+        row_ids = list(set(int(r) for r in row_ids))
+        kept = self.issues[~self.issues[ROW_ID].isin(row_ids)]
+        rechecked = find_issues(after[after[ROW_ID].isin(row_ids)])
+        frames = [f for f in (kept, rechecked) if len(f)]
+        issues = pd.concat(frames, ignore_index=True) if frames else rechecked
+        return ValidationReport(after, _issues=issues)
+
+
+# Colonne con meno valori distinti di questa soglia vengono filtrate con una multiselect
+CATEGORICAL_MAX_VALUES = 10
+
+
+@dataclass(frozen=True)
+class ColumnProfile:
+    """Filter metadata of one column: detected kind, cardinality, distinct values, range."""
+    name: str
+    kind: str  # "categorical", "numeric", "datetime" o "text"
+    cardinality: int
+    values: Tuple[Any, ...] = ()
+    min: Any = None
+    max: Any = None
+
+
+def profile_column(name: str, values: pd.Series) -> ColumnProfile:
+    """Inspect a column once: the filter widgets are then set up from the profile."""
+    cardinality = int(values.nunique())
+    if cardinality < CATEGORICAL_MAX_VALUES:
+        distinct = tuple(sorted(values.dropna().unique().tolist(), key=str))
+        return ColumnProfile(name, "categorical", cardinality, values=distinct)
+    if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return ColumnProfile(name, "datetime", cardinality, min=values.min(), max=values.max())
+        return ColumnProfile(name, "text", cardinality)
+    return ColumnProfile(name, "numeric", cardinality, min=float(values.min()), max=float(values.max()))
+
+
+class ColumnProfiles:
+    """
+    Column metadata for filter_dataframe, computed once per data version.
+
+    Each column is profiled on first request and memoized, so setting up
+    the filter widgets does not scan the data again on later reruns.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._profiles: Dict[str, ColumnProfile] = {}
+
+    def __getitem__(self, column: str) -> ColumnProfile:
+        profile = self._profiles.get(column)
+        if profile is None:
+            profile = profile_column(column, self._df[column])
+            self._profiles[column] = profile
+        return profile
+
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "ColumnProfiles":
+        # Profili ricalcolati pigramente sulla nuova versione
+        return ColumnProfiles(after)
+
+
+class ScheduleDataset:
+    """
+    The normalized scheduling table for one data version, shared by all pages.
+
+    Normalization (src/schema.py) runs once when the version is loaded or
+    committed; pages read ``frame()`` and the derived artifacts (entity
+    index, FTE cube, validation report) without re-coercing any column.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: Optional[str], artifact: Callable[[str], object]):
+        self._df = df
+        self.version = version
+        self._artifact = artifact
+        self.month_cols: List[str] = month_columns(df)
+        self.allocation_cols: List[str] = allocation_columns(df)
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Shallow (copy-on-write) copy of the table, optionally projected on ``columns``."""
+        if columns is not None:
+            return self._df[[c for c in columns if c in self._df.columns]]
+        return self._df.copy(deep=False)
+
+    @property
+    def index(self):
+        """EntityIndex for PROJECT_DESCR, USER, PM_SM and CLIENT."""
+        return self._artifact("index")
+
+    @property
+    def cube(self):
+        """FteCube with the pre-aggregated FTE totals."""
+        return self._artifact("cube")
+
+    @property
+    def validation(self) -> ValidationReport:
+        return self._artifact("validation")
+
+    @property
+    def text_index(self):
+        """TextIndex (trigrams) over PROJECT_DESCR, USER, CLIENT, PM_SM, JIRA_KEY and SOW_ID."""
+        return self._artifact("text")
+
+    @property
+    def profiles(self) -> ColumnProfiles:
+        """Per-column filter metadata (kind, cardinality, distinct values, min/max)."""
+        return self._artifact("profiles")
+
+    @property
+    def chat_context(self):
+        """ChatContext with the schema summary, value samples and statistics for the Chat prompts."""
+        return self._artifact("chat")
@@ -0,0 +1,246 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.storage import DATA_DIR, atomic_replace, write_parquet_chunks
+
+# Cartella dei file esportati (riutilizzati finché la versione dei dati non cambia)
+EXPORT_DIR = DATA_DIR / "exports"
+
+# Righe per blocco durante la scrittura dei file esportati
+EXPORT_CHUNK_ROWS = int(os.getenv("SCHEDULING_EXPORT_CHUNK_ROWS", "10000"))
+
+# Retention dei file esportati: età massima (ore) e numero massimo di file tenuti
+EXPORT_RETENTION_HOURS = float(os.getenv("SCHEDULING_EXPORT_RETENTION_HOURS", "24"))
+EXPORT_MAX_FILES = int(os.getenv("SCHEDULING_EXPORT_MAX_FILES", "20"))
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """One downloadable file format."""
+    label: str
+    extension: str
+    mime: str
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "xlsx": ExportFormat("Excel (.xlsx)", ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ExportFormat("CSV (.csv)", ".csv", "text/csv"),
+    "parquet": ExportFormat("Parquet (.parquet)", ".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_export_chunks(df: pd.DataFrame, positions: Optional[np.ndarray] = None,
+                       columns: Optional[Sequence[str]] = None,
+                       chunksize: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield the selected rows (positions, None = all) and columns of ``df`` in blocks."""
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    total = len(df) if positions is None else len(positions)
+    for start in range(0, total, chunksize):
+        end = min(start + chunksize, total)
+        yield df.iloc[start:end] if positions is None else df.iloc[positions[start:end]]
+
+
+def _write_xlsx(chunks: Iterator[pd.DataFrame], path: Path, columns: Sequence[str]) -> int:
+    # Workbook in sola scrittura: le righe vanno su disco man mano, senza tenere il foglio in memoria
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Scheduling")
+    sheet.append(list(columns))
+    rows = 0
+    for chunk in chunks:
+        values = chunk.astype(object)
+        for row in values.where(chunk.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+        rows += len(chunk)
+    workbook.save(path)
+    return rows
+
+
+def _write_csv(chunks: Iterator[pd.DataFrame], path: Path, columns: Sequence[str]) -> int:
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+        if rows == 0:
+            pd.DataFrame(columns=pd.Index(list(columns))).to_csv(f, index=False)
+    return rows
+
+
+def _write_parquet(chunks: Iterator[pd.DataFrame], path: Path, columns: Sequence[str]) -> int:
+    rows = write_parquet_chunks(chunks, path)
+    if not path.exists():
+        pd.DataFrame(columns=pd.Index(list(columns))).to_parquet(path, index=False)
+    return rows
+
+
+_WRITERS = {
+    "xlsx": _write_xlsx,
+    "csv": _write_csv,
+    "parquet": _write_parquet,
+}
+
+
+def export_key(version: str, fmt: str, positions: Optional[np.ndarray] = None,
+               columns: Optional[Sequence[str]] = None) -> str:
+    """Digest identifying an export: data version, format, selected rows and columns."""
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(f"{version}|{fmt}|{list(columns) if columns is not None else '*'}|".encode())
+    digest.update(b"*" if positions is None else np.asarray(positions, dtype="int64").tobytes())
+    return digest.hexdigest()
+
+
+def export_file(df: pd.DataFrame, fmt: str, version: Optional[str] = None,
+                positions: Optional[np.ndarray] = None, columns: Optional[Sequence[str]] = None,
+                chunksize: int = EXPORT_CHUNK_ROWS, key: Optional[str] = None) -> Path:
+    """
+    Write the selected rows / columns of ``df`` to an export file and return its path.
+
+    The rows are written in blocks of ``chunksize`` (write-only workbook,
+    appended CSV, one Parquet row group per block). With a data ``version``
+    the file name is derived from the version and the selection, so a
+    repeated download of the same view reuses the file already written.
+    ``key`` overrides the derived file name.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Available: {', '.join(EXPORT_FORMATS)}")
+    export_format = EXPORT_FORMATS[fmt]
+    EXPORT_DIR.mkdir(exist_ok=True, parents=True)
+    if key is None:
+        key = export_key(version, fmt, positions, columns) if version else uuid.uuid4().hex
+    path = EXPORT_DIR / f"scheduling_{key}{export_format.extension}"
+    if version and path.exists():
+        os.utime(path)
+        return path
+
+    selected = [c for c in columns if c in df.columns] if columns is not None else list(df.columns)
+    with atomic_replace(path) as tmp_path:
+        _WRITERS[fmt](iter_export_chunks(df, positions, selected, chunksize), tmp_path, selected)
+    return path
+
+
+@dataclass
+class ExportJob:
+    """State of one export running (or run) in the background worker."""
+    job_id: str
+    fmt: str
+    rows: int
+    status: str = "pending"  # "pending", "running", "done" o "failed"
+    path: Optional[Path] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("pending", "running")
+
+
+# Un solo worker: gli export vengono scritti uno alla volta, fuori dal thread dello script
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scheduling-export")
+_jobs: Dict[str, ExportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def evict_exports(now: Optional[float] = None) -> List[Path]:
+    """
+    Apply the retention policy to data/exports/: drop files older than
+    SCHEDULING_EXPORT_RETENTION_HOURS, then the least recently used ones
+    beyond SCHEDULING_EXPORT_MAX_FILES. Files of running jobs are kept;
+    files with a download button on screen are refreshed by
+    refresh_export at every render, so they are the last to go.
+    Returns the removed paths.
+    """
+    if not EXPORT_DIR.exists():
+        return []
+    now = time.time() if now is None else now
+    with _jobs_lock:
+        busy = {job.job_id for job in _jobs.values() if job.active}
+    files = []
+    for path in EXPORT_DIR.iterdir():
+        if any(job_id in path.name for job_id in busy):
+            continue
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    files.sort(reverse=True)
+    max_age = EXPORT_RETENTION_HOURS * 3600
+    removed = [p for i, (mtime, p) in enumerate(files) if i >= EXPORT_MAX_FILES or now - mtime > max_age]
+    for path in removed:
+        path.unlink(missing_ok=True)
+    # I job il cui file è stato rimosso vengono dimenticati: una nuova richiesta lo riscrive
+    with _jobs_lock:
+        stale = [job_id for job_id, job in _jobs.items()
+                 if job.path in removed or (not job.active and now - (job.finished or now) > max_age)]
+        for job_id in stale:
+            del _jobs[job_id]
+    return removed
+
+
+def _run_export(job: ExportJob, df: pd.DataFrame, version: str, positions, columns) -> None:
+    job.status = "running"
+    try:
+        job.path = export_file(df, job.fmt, version, positions, columns, key=job.job_id)
+        job.status = "done"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"
+        print(f"Export {job.job_id} failed: {e}")
+    finally:
+        job.finished = time.time()
+    evict_exports()
+
+
+def submit_export(df: pd.DataFrame, fmt: str, version: Optional[str] = None,
+                  positions: Optional[np.ndarray] = None,
+                  columns: Optional[Sequence[str]] = None) -> ExportJob:
+    """
+    Queue an export in the background worker and return its job at once.
+
+    The job id is the export key, so asking again for the same view of the
+    same data version returns the running job or the file already written
+    (its last-use time is refreshed for the retention policy).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Available: {', '.join(EXPORT_FORMATS)}")
+    job_id = export_key(version, fmt, positions, columns) if version else uuid.uuid4().hex
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None and (job.active or (job.path is not None and job.path.exists())):
+            if not job.active:
+                os.utime(job.path)
+            return job
+        job = ExportJob(job_id, fmt, rows=len(df) if positions is None else len(positions))
+        _jobs[job_id] = job
+    _executor.submit(_run_export, job, df, version, positions, columns)
+    return job
+
+
+def refresh_export(job: ExportJob) -> bool:
+    """
+    Mark the file of a finished job as just used, so the retention policy
+    drops other files first. Returns False if the file is already gone.
+    """
+    try:
+        os.utime(job.path)
+    except (FileNotFoundError, TypeError):
+        return False
+    return True
+
+
+def get_export_job(job_id: str) -> Optional[ExportJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
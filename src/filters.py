@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.dataset import ColumnProfile, ColumnProfiles
+
+
+def _take(values: pd.Series, positions: Optional[np.ndarray]) -> pd.Series:
+    return values if positions is None else values.iloc[positions]
+
+
+@dataclass(frozen=True)
+class InPredicate:
+    """``column`` is one of ``values`` (multiselect filters)."""
+    column: str
+    values: Tuple[Any, ...]
+    cost = 1
+
+    def selectivity(self, profile: ColumnProfile) -> float:
+        return min(len(self.values) / max(profile.cardinality, 1), 1.0)
+
+    def is_noop(self, profile: ColumnProfile) -> bool:
+        return profile.kind == "categorical" and set(profile.values) <= set(self.values)
+
+    def evaluate(self, values: pd.Series, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Confronto sui codici interi delle categorie, senza toccare le stringhe
+            wanted = values.cat.categories.get_indexer(list(self.values))
+            codes = values.cat.codes.to_numpy()
+            codes = codes if positions is None else codes[positions]
+            return np.isin(codes, wanted[wanted >= 0])
+        return _take(values, positions).isin(list(self.values)).to_numpy()
+
+
+@dataclass(frozen=True)
+class RangePredicate:
+    """``low <= column <= high`` (numeric sliders and date ranges)."""
+    column: str
+    low: Any
+    high: Any
+    cost = 1
+
+    def selectivity(self, profile: ColumnProfile) -> float:
+        try:
+            span = profile.max - profile.min
+            return min(max((self.high - self.low) / span, 0.0), 1.0) if span else 1.0
+        except TypeError:
+            return 1.0
+
+    def is_noop(self, profile: ColumnProfile) -> bool:
+        try:
+            return bool(self.low <= profile.min and self.high >= profile.max)
+        except TypeError:
+            return False
+
+    def evaluate(self, values: pd.Series, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        return _take(values, positions).between(self.low, self.high).to_numpy(dtype=bool, na_value=False)
+
+
+@dataclass(frozen=True)
+class TextPredicate:
+    """``column`` contains the substring / regex ``pattern``."""
+    column: str
+    pattern: str
+    cost = 10
+
+    def selectivity(self, profile: ColumnProfile) -> float:
+        # Nessuna statistica utile per una regex: valutata per ultima
+        return 1.0
+
+    def is_noop(self, profile: ColumnProfile) -> bool:
+        return not self.pattern
+
+    def evaluate(self, values: pd.Series, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # La regex gira una volta per categoria, non una volta per riga
+            matched = np.asarray(values.cat.categories.astype(str).str.contains(self.pattern), dtype=bool)
+            codes = values.cat.codes.to_numpy()
+            codes = codes if positions is None else codes[positions]
+            return np.where(codes >= 0, matched[codes], False)
+        return _take(values, positions).astype(str).str.contains(self.pattern).to_numpy(dtype=bool, na_value=False)
+
+
+def _indexed(predicate, text_index) -> bool:
+    return isinstance(predicate, TextPredicate) and text_index is not None and predicate.column in text_index.columns
+
+
+def plan(predicates: Sequence, profiles: ColumnProfiles, text_index=None) -> List:
+    """
+    Drop the predicates that keep every row and order the others so the most
+    selective (and cheapest) ones run first.
+
+    Text predicates on columns covered by the trigram index get a real
+    selectivity estimate (share of matching distinct values) and a low cost.
+    """
+    def estimate(p):
+        if _indexed(p, text_index):
+            return (text_index.selectivity(p.column, p.pattern), 1)
+        return (p.selectivity(profiles[p.column]) * p.cost, p.cost)
+
+    active = [p for p in predicates if not p.is_noop(profiles[p.column])]
+    return sorted(active, key=estimate)
+
+
+def evaluate(df: pd.DataFrame, predicates: Sequence, profiles: Optional[ColumnProfiles] = None,
+             entity_index=None, text_index=None) -> Optional[np.ndarray]:
+    """
+    Evaluate the conjunction of ``predicates`` on ``df`` and return the
+    matching row positions (for ``df.iloc``), or None if nothing filters.
+
+    The first predicate may be answered by the entity index; text filters
+    go through the trigram index when available; each following predicate
+    is evaluated only on the rows that are still candidates, so no
+    intermediate DataFrame is built.
+    """
+    if profiles is None:
+        profiles = ColumnProfiles(df)
+    ordered = plan(predicates, profiles, text_index)
+    if not ordered:
+        return None
+
+    positions: Optional[np.ndarray] = None
+    for predicate in ordered:
+        if positions is None and entity_index is not None and isinstance(predicate, InPredicate) \
+                and predicate.column in entity_index.columns:
+            found = [entity_index.positions(predicate.column, value) for value in predicate.values]
+            positions = np.unique(np.concatenate(found)) if found else np.empty(0, dtype="int64")
+            continue
+        if _indexed(predicate, text_index):
+            mask = text_index.contains(predicate.column, predicate.pattern, positions=positions)
+        else:
+            mask = predicate.evaluate(df[predicate.column], positions)
+        positions = np.flatnonzero(mask) if positions is None else positions[mask]
+        if len(positions) == 0:
+            break
+    return positions
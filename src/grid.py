@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class GridPage:
+    """One window of the (filtered, sorted) table plus the total-count metadata."""
+    rows: pd.DataFrame
+    total: int
+    page: int
+    pages: int
+    start: int
+    end: int
+
+
+def _sort_key(values: pd.Series) -> pd.Series:
+    # Le categorie seguono l'ordine di inserimento: ordiniamo per rango alfabetico
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        rank = np.empty(len(categories), dtype="int64")
+        rank[np.argsort(categories.astype(str), kind="stable")] = np.arange(len(categories))
+        codes = values.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, rank[codes], np.nan))
+    return values.reset_index(drop=True)
+
+
+def sort_positions(df: pd.DataFrame, positions: Optional[np.ndarray], sort_by: Optional[str],
+                   ascending: bool = True) -> np.ndarray:
+    """Order the row positions by one column; only that column is touched."""
+    if positions is None:
+        positions = np.arange(len(df))
+    if not sort_by or sort_by not in df.columns:
+        return positions
+    key = _sort_key(df[sort_by].iloc[positions])
+    order = key.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+    return positions[order]
+
+
+def page_slice(df: pd.DataFrame, positions: Optional[np.ndarray] = None, page: int = 1, page_size: int = 100,
+               sort_by: Optional[str] = None, ascending: bool = True,
+               columns: Optional[Sequence[str]] = None) -> GridPage:
+    """
+    Return only the visible window of the table.
+
+    ``positions`` are the filtered row positions (None = all rows); the
+    window is sorted, paged and projected before anything is materialized,
+    so only ``page_size`` rows x ``columns`` reach st.dataframe.
+    """
+    ordered = sort_positions(df, positions, sort_by, ascending)
+    total = len(ordered)
+    page_size = max(int(page_size), 1)
+    pages = max((total + page_size - 1) // page_size, 1)
+    page = min(max(int(page), 1), pages)
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    rows = df.iloc[ordered[start:end]]
+    if columns is not None:
+        rows = rows[[c for c in columns if c in rows.columns]]
+    return GridPage(rows, total, page, pages, start, end)
@@ -0,0 +1,297 @@
+import io
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.changelog import ROW_ID
+from src.data_access import commit_changes, flush_changes, load_dataset, save_scheduling_chunks
+from src.dataset import find_issues
+from src.schema import apply_schema
+
+# Righe per chunk durante l'import di file grandi
+IMPORT_CHUNK_ROWS = int(os.getenv("SCHEDULING_IMPORT_CHUNK_ROWS", "10000"))
+
+# Chiave naturale per l'import in modalità upsert (se il file non ha ROW_ID)
+UPSERT_KEY = ["PROJECT_DESCR", "USER", "YEAR"]
+
+ProgressCallback = Callable[[float, str], None]
+
+
+@dataclass
+class ImportStats:
+    """Outcome (or dry-run preview) of a bulk import."""
+    rows: int = 0
+    chunks: int = 0
+    skipped_empty_rows: int = 0
+    rows_with_issues: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    ambiguous: int = 0
+    stale_ids: int = 0
+    issues: Counter = field(default_factory=Counter)
+    missing_columns: List[str] = field(default_factory=list)
+    unknown_columns: List[str] = field(default_factory=list)
+    dry_run: bool = False
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "rows": self.rows,
+            "chunks": self.chunks,
+            "skipped_empty_rows": self.skipped_empty_rows,
+            "rows_with_issues": self.rows_with_issues,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+            "ambiguous": self.ambiguous,
+            "stale_ids": self.stale_ids,
+            "issues": {f"{col}: {issue}": n for (col, issue), n in self.issues.most_common()},
+            "missing_columns": self.missing_columns,
+            "unknown_columns": self.unknown_columns,
+            "dry_run": self.dry_run,
+        }
+
+
+def _file_size(file) -> Optional[int]:
+    size = getattr(file, "size", None)
+    if size is None and hasattr(file, "seek"):
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(position)
+    return size
+
+
+def _iter_csv(file, chunksize: int) -> Iterator[tuple]:
+    size = _file_size(file)
+    # Wrapper testuale nostro: pandas non chiude così il file caricato a fine lettura
+    text = file if isinstance(file, io.TextIOBase) else io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for chunk in pd.read_csv(text, chunksize=chunksize):
+            done = file.tell() / size if size and hasattr(file, "tell") else None
+            yield chunk, done
+    finally:
+        if text is not file:
+            text.detach()
+
+
+def _iter_excel(file, chunksize: int) -> Iterator[tuple]:
+    # openpyxl in sola lettura: le righe vengono lette in streaming dal foglio
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        buffer, seen = [], 1
+        for row in rows:
+            buffer.append(row)
+            seen += 1
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=columns), seen / total if total else None
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns), 1.0
+    finally:
+        workbook.close()
+
+
+def iter_chunks(file, file_name: str, chunksize: int = IMPORT_CHUNK_ROWS) -> Iterator[tuple]:
+    """Yield ``(chunk, fraction_done)`` pairs from an uploaded .xlsx or .csv file."""
+    if file_name.lower().endswith(".xlsx"):
+        return _iter_excel(file, chunksize)
+    return _iter_csv(file, chunksize)
+
+
+def preview(file, file_name: str, rows: int = 5) -> pd.DataFrame:
+    """First rows of the upload, without reading the whole file."""
+    chunk = next(iter(iter_chunks(file, file_name, chunksize=rows)), (pd.DataFrame(), None))[0]
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return chunk
+
+
+def normalized_chunks(file, file_name: str, stats: ImportStats, expected_columns: Sequence[str] = (),
+                      chunksize: int = IMPORT_CHUNK_ROWS,
+                      progress: Optional[ProgressCallback] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read, clean, type and validate the upload chunk by chunk.
+
+    Fully empty rows are dropped, each chunk is cast to the dataset schema
+    and checked with the same rules as the loaded dataset; the counts are
+    accumulated in ``stats`` while the chunks are yielded.
+    """
+    for chunk, done in iter_chunks(file, file_name, chunksize):
+        if stats.chunks == 0 and expected_columns:
+            expected = [c for c in expected_columns if c != ROW_ID]
+            stats.missing_columns = [c for c in expected if c not in chunk.columns]
+            stats.unknown_columns = [c for c in chunk.columns if c not in expected and c != ROW_ID]
+        empty = chunk.isna().all(axis=1)
+        stats.skipped_empty_rows += int(empty.sum())
+        chunk = apply_schema(chunk[~empty].reset_index(drop=True))
+
+        issues = find_issues(chunk.drop(columns=[ROW_ID], errors="ignore"))
+        if len(issues):
+            stats.issues.update(zip(issues["COLUMN"], issues["ISSUE"]))
+            stats.rows_with_issues += int(issues[ROW_ID].nunique())
+        stats.rows += len(chunk)
+        stats.chunks += 1
+        if progress is not None:
+            progress(min(done, 1.0) if done is not None else 0.0, f"{stats.rows} righe elaborate")
+        yield chunk
+
+
+def _key_index(df: pd.DataFrame) -> pd.MultiIndex:
+    arrays = []
+    for col in UPSERT_KEY:
+        values = df[col] if col in df.columns else pd.Series([None] * len(df))
+        if col == "YEAR":
+            arrays.append(pd.to_numeric(values, errors="coerce").fillna(0).astype("int64").to_numpy())
+        else:
+            arrays.append(values.astype(object).where(values.notna(), "").astype(str).to_numpy(dtype=object))
+    return pd.MultiIndex.from_arrays(arrays, names=UPSERT_KEY)
+
+
+def _same(old: pd.Series, new: pd.Series) -> np.ndarray:
+    """Cell-wise equality of two aligned columns, NaN == NaN."""
+    a = old.astype(object).to_numpy() if isinstance(old.dtype, pd.CategoricalDtype) else old.to_numpy()
+    b = new.astype(object).to_numpy() if isinstance(new.dtype, pd.CategoricalDtype) else new.to_numpy()
+    both_na = pd.isna(a) & pd.isna(b)
+    try:
+        equal = np.asarray(a == b, dtype=bool)
+    except (TypeError, ValueError):
+        equal = np.array([x == y for x, y in zip(a, b)], dtype=bool)
+    return equal | both_na
+
+
+class UpsertPlanner:
+    """
+    Hash join of uploaded chunks against the current dataset.
+
+    Rows carrying a known ROW_ID whose natural key (PROJECT_DESCR, USER,
+    YEAR) agrees with the stored row match on it, the others on the key:
+    ROW_IDs are renumbered by replace imports, so a stale or foreign ID
+    never selects the row to update on its own. Matched rows are diffed column by column
+    and only the changed cells become updates; unmatched rows are inserts.
+    Keys that occur more than once in the dataset are ambiguous and skipped.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.ids = pd.Index(df[ROW_ID].to_numpy(dtype="int64"))
+        keys = _key_index(df)
+        self.all_keys = keys
+        duplicated = keys.duplicated(keep=False)
+        self.ambiguous_keys = keys[duplicated].unique()
+        self.keys = keys[~duplicated]
+        self.key_positions = np.flatnonzero(~duplicated)
+        self.inserted_keys = set()
+
+    def plan(self, chunk: pd.DataFrame, stats: ImportStats):
+        """Return (rows to insert, {row_id: changed cells}) for one chunk."""
+        chunk = chunk.reset_index(drop=True)
+        keys = _key_index(chunk)
+        positions = np.full(len(chunk), -1, dtype="int64")
+        keep = np.ones(len(chunk), dtype=bool)
+        by_id = np.zeros(len(chunk), dtype=bool)
+        if ROW_ID in chunk.columns:
+            chunk_ids = pd.to_numeric(chunk[ROW_ID], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            has_id = ~np.isnan(chunk_ids)
+            id_positions = np.full(len(chunk), -1, dtype="int64")
+            id_positions[has_id] = self.ids.get_indexer(chunk_ids[has_id].astype("int64"))
+            # Il ROW_ID vale solo se la riga che lo porta ha ancora la stessa chiave naturale
+            by_id = id_positions >= 0
+            by_id[by_id] = self.all_keys[id_positions[by_id]].to_flat_index() == keys[by_id].to_flat_index()
+            stats.stale_ids += int((has_id & ~by_id).sum())
+            positions[by_id] = id_positions[by_id]
+            keep[by_id] = ~pd.Index(chunk_ids[by_id]).duplicated(keep="last")
+        by_key = ~by_id
+        # Duplicati nello stesso file (stessa chiave di match): vince l'ultima riga
+        keep[by_key] = ~keys[by_key].duplicated(keep="last")
+        stats.duplicates += int((~keep).sum())
+        found = self.keys.get_indexer(keys[by_key])
+        positions[by_key] = np.where(found >= 0, self.key_positions[np.maximum(found, 0)], -1)
+
+        ambiguous = by_key & keys.isin(self.ambiguous_keys) & keep
+        stats.ambiguous += int(ambiguous.sum())
+        keep &= ~ambiguous
+
+        # Nuove righe (escluse le chiavi già inserite da chunk precedenti dello stesso import)
+        new_mask = keep & (positions < 0)
+        new_keys = keys[new_mask]
+        repeated = np.asarray([k in self.inserted_keys for k in new_keys], dtype=bool)
+        stats.duplicates += int(repeated.sum())
+        new_rows = np.flatnonzero(new_mask)[~repeated]
+        self.inserted_keys.update(new_keys[~repeated])
+        inserts = chunk.iloc[new_rows].drop(columns=[ROW_ID], errors="ignore")
+        stats.inserted += len(inserts)
+
+        # Righe esistenti: solo le celle cambiate diventano update
+        rows = np.flatnonzero(keep & (positions >= 0))
+        targets = positions[rows]
+        columns = [c for c in chunk.columns if c in self.df.columns and c != ROW_ID]
+        changed = np.zeros((len(rows), len(columns)), dtype=bool)
+        for j, col in enumerate(columns):
+            changed[:, j] = ~_same(self.df[col].iloc[targets], chunk[col].iloc[rows])
+        updates: Dict[int, dict] = {}
+        row_ids = self.ids[targets]
+        for i, j in zip(*np.nonzero(changed)):
+            value = chunk[columns[j]].iloc[rows[i]]
+            updates.setdefault(int(row_ids[i]), {})[columns[j]] = value
+        stats.updated += len(updates)
+        stats.unchanged += len(rows) - len(updates)
+        return inserts, updates
+
+
+def import_file(file, file_name: str, mode: str = "append", dry_run: bool = False,
+                chunksize: int = IMPORT_CHUNK_ROWS, progress: Optional[ProgressCallback] = None) -> ImportStats:
+    """
+    Stream an uploaded file into the scheduling store.
+
+    Args:
+        mode: "append" commits each chunk as row inserts (change log);
+            "replace" streams the chunks into a new main store;
+            "upsert" matches rows on ROW_ID (when its natural key agrees) or on
+            (PROJECT_DESCR, USER, YEAR) and commits only the new rows and the changed cells
+        dry_run: only read, normalize and validate, without writing anything
+        progress: called with (fraction done, message) after each chunk
+
+    Returns the import statistics (rows, chunks, validation issue counts,
+    missing / unknown columns, insert / update / unchanged counts).
+    """
+    stats = ImportStats(dry_run=dry_run)
+    current = load_dataset().frame()
+    chunks = normalized_chunks(file, file_name, stats, list(current.columns), chunksize, progress)
+    if mode == "upsert":
+        # Anche in dry run il diff viene calcolato: il riepilogo mostra cosa cambierebbe
+        planner = UpsertPlanner(current)
+        for chunk in chunks:
+            inserts, updates = planner.plan(chunk, stats)
+            if not dry_run and (len(inserts) or updates):
+                commit_changes(inserts=inserts if len(inserts) else None, updates=updates)
+    elif dry_run:
+        for _ in chunks:
+            pass
+    elif mode == "replace":
+        save_scheduling_chunks(chunks)
+    else:
+        for chunk in chunks:
+            inserts = chunk.drop(columns=[ROW_ID], errors="ignore")
+            commit_changes(inserts=inserts)
+            stats.inserted += len(inserts)
+    if not dry_run and mode != "replace":
+        # L'import è concluso solo quando le modifiche sono sul disco
+        flush_changes()
+    if progress is not None:
+        progress(1.0, f"{stats.rows} righe {'verificate' if dry_run else 'importate'}")
+    return stats
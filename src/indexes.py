@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.changelog import ROW_ID
+
+# Colonne entità con indice hash (valore -> ROW_ID)
+INDEXED_COLUMNS = ["PROJECT_DESCR", "USER", "PM_SM", "CLIENT"]
+
+_EMPTY = np.empty(0, dtype="int64")
+
+
+class EntityIndex:
+    """
+    Hash indexes from entity values (project, user, PM, client) to ROW_IDs.
+
+    Lookups cost O(matches) instead of a full boolean scan of the column.
+    The index is immutable from the readers' point of view: ``updated``
+    returns a new index sharing the untouched buckets, so it can be handed
+    out to every session without locking.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = INDEXED_COLUMNS,
+                 _buckets: Optional[Dict[str, Dict[object, np.ndarray]]] = None):
+        self.columns = [c for c in columns if c in df.columns]
+        if _buckets is None:
+            ids = df[ROW_ID].to_numpy(dtype="int64")
+            _buckets = {}
+            for col in self.columns:
+                groups = df.groupby(col, sort=False, observed=True).indices
+                _buckets[col] = {value: ids[pos] for value, pos in groups.items()}
+        self._buckets = _buckets
+        self._row_ids = df[ROW_ID]
+        self._positions: Optional[pd.Index] = None
+
+    def _position_index(self) -> pd.Index:
+        # Mappa ROW_ID -> posizione, costruita in modo vettoriale alla prima richiesta
+        if self._positions is None:
+            self._positions = pd.Index(self._row_ids.to_numpy(dtype="int64"))
+        return self._positions
+
+    def row_ids(self, column: str, value) -> np.ndarray:
+        """ROW_IDs of the rows where ``column == value``."""
+        return self._buckets.get(column, {}).get(value, _EMPTY)
+
+    def positions(self, column: str, value) -> np.ndarray:
+        """Row positions (for ``df.iloc``) of the rows where ``column == value``."""
+        ids = self.row_ids(column, value)
+        if len(ids) == 0:
+            return _EMPTY
+        positions = self._position_index().get_indexer(ids)
+        return np.sort(positions[positions >= 0])
+
+    def select(self, df: pd.DataFrame, column: str, value) -> pd.DataFrame:
+        """
+        Return the rows of ``df`` where ``column == value``.
+
+        ``df`` must have the same row order as the frame the index was built
+        on (the shared dataset or a shallow copy of it).
+        """
+        if column not in self._buckets:
+            return df[df[column] == value] if column in df.columns else df.iloc[0:0]
+        return df.iloc[self.positions(column, value)]
+
+    def _present(self, column: str) -> List:
+        # Il bucket "" (celle vuote, vedi schema._as_category) resta per select/positions,
+        # ma non è un'entità da elencare o contare
+        return [v for v in self._buckets.get(column, {}) if not (pd.isna(v) or v == "")]
+
+    def values(self, column: str) -> List:
+        """Sorted distinct non-empty values of an indexed column."""
+        return sorted(self._present(column), key=str)
+
+    def cardinality(self, column: str) -> int:
+        """Number of distinct non-empty values (like ``nunique``)."""
+        return len(self._present(column))
+
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "EntityIndex":
+        """
+        Return a new index for ``after`` by moving only the rows in ``row_ids``.
+
+        ``before`` is the frame this index was built on and ``after`` the
+        frame with the changes applied; untouched buckets are shared.
+        """
+        row_ids = np.unique(np.asarray(list(row_ids), dtype="int64"))
+        old_pos = self._position_index().get_indexer(row_ids)
+        after_ids = pd.Index(after[ROW_ID].to_numpy(dtype="int64"))
+        new_pos = after_ids.get_indexer(row_ids)
+
+        buckets = {}
+        for col in self.columns:
+            col_buckets = dict(self._buckets[col])
+            removed: Dict[object, List[int]] = {}
+            added: Dict[object, List[int]] = {}
+            for frame, positions, target in ((before, old_pos, removed), (after, new_pos, added)):
+                if col not in frame.columns:
+                    continue
+                valid = positions >= 0
+                values = frame[col].iloc[positions[valid]].tolist()
+                for row_id, value in zip(row_ids[valid], values):
+                    if not pd.isna(value):
+                        target.setdefault(value, []).append(row_id)
+            for value in set(removed) | set(added):
+                bucket = col_buckets.get(value, _EMPTY)
+                if value in removed:
+                    bucket = bucket[~np.isin(bucket, removed[value])]
+                if value in added:
+                    bucket = np.concatenate([bucket, np.asarray(added[value], dtype="int64")])
+                if len(bucket):
+                    col_buckets[value] = bucket
+                else:
+                    col_buckets.pop(value, None)
+            buckets[col] = col_buckets
+
+        index = EntityIndex(after, self.columns, _buckets=buckets)
+        index._positions = after_ids
+        return index
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.text_index import normalize_text
+
+INTENT_MODEL_FILE = Path(__file__).with_name("intent_model.json")
+INTENT_EXAMPLES_FILE = Path(__file__).with_name("intent_examples.jsonl")
+
+# Probabilità minima del modello locale per decidere senza chiedere all'LLM
+INTENT_CONFIDENCE = float(os.getenv("SCHEDULING_INTENT_CONFIDENCE", "0.75"))
+
+# Regole ad alta precisione sul testo normalizzato: decidono solo se scatta un'unica etichetta
+_MONTHS = r"gennaio|febbraio|marzo|aprile|maggio|giugno|luglio|agosto|settembre|ottobre|novembre|dicembre"
+INTENT_RULES: Dict[str, List[re.Pattern]] = {
+    "dati": [re.compile(p) for p in (
+        rf"\b({_MONTHS})\b",
+        r"\b20\d\d\b",
+        r"\bfte\b",
+        r"\b(chi lavora|chi e il pm|chi e sovra|su quali progetti|quanti progetti|quante persone|quanti utenti)\b",
+        r"\b(elenca|elenco|lista|top \d+|primi \d+)\b",
+        r"\b(sovraccaric|sovrallocat)\w*",
+        r"\b[a-z] [a-z]{3,}\b.*\b(lavora|progetti|fte|info)\b|\binfo su\b|\binformazioni su\b",
+    )],
+    "generica": [re.compile(p) for p in (
+        r"^(ciao|buongiorno|buonasera|salve|grazie|hello|help|ok)\b(\s+\w+){0,3}$",
+        r"\b(come si usa|come funziona|come faccio|come posso|come si)\b",
+        r"\b(a cosa serve|cosa sai fare|funzionalita|feature|documentazione|assistenza|supporto)\b",
+        r"\b(cosa significa|cosa vuol dire|spiegami|che cos)\b",
+    )],
+}
+
+# Prompt del classificatore LLM, usato solo per le domande che il modello locale non sa decidere
+INTENT_PROMPT = """
+# Ruolo
+Sei un classificatore di intenti per un assistente AI integrato in un'applicazione di scheduling e resource planning.
+
+# Task
+Classifica la domanda utente come:
+- 'generica' se è una richiesta di aiuto, saluto, spiegazione, onboarding, conversazione, o riguarda l'app in generale
+- 'dati' se richiede di consultare, filtrare, analizzare o aggregare i dati di scheduling
+
+# Contesto Applicazione
+L'app permette di:
+- Gestire progetti, risorse, clienti, FTE, timeline, ecc.
+- Visualizzare dashboard e report analitici sui dati di scheduling
+- Usare una chat AI per chiedere informazioni sui dati o ricevere aiuto/conversare
+
+# Struttura base dati principale
+Colonne: PROJECT_DESCR (nome progetto), CLIENT (cliente), PM_SM (project manager), USER (utente/risorsa), STATUS (stato), PLANNED_FTE, ACTUAL_FTE, ITEM_TYPE, DELIVERY_TYPE, START_DATE, END_DATE, colonne mensili (gen, feb, ... dic) con i giorni allocati (20 giorni = 1 FTE).
+
+# Esempi domande generiche
+- "Ciao"
+- "Come si usa la chat?"
+- "Spiegami le funzionalità dell'app"
+- "Quali sono le possibilità di analisi?"
+- "Come posso aggiungere un nuovo progetto?"
+- "A cosa serve questa applicazione?"
+- "Quali sono le feature principali?"
+- "Come posso ricevere supporto?"
+
+# Esempi domande dati
+- "Mostrami i progetti in corso"
+- "Quanti FTE sono allocati a marzo?"
+- "Chi lavora per il cliente ACME?"
+- "Elenca i progetti gestiti da L. Mangili"
+- "Qual è lo stato del progetto CRM Upgrade?"
+- "Dammi la lista degli utenti attivi nel 2024"
+- "Quali progetti sono terminati quest'anno?"
+- "Report FTE per ogni mese"
+
+# Reminder
+Rispondi solo con 'generica' o 'dati'.
+Non aggiungere spiegazioni.
+
+Domanda utente: {question}
+"""
+
+
+@dataclass(frozen=True)
+class IntentDecision:
+    """Intent of a chat question and how it was decided ("regole", "modello", "incerto", "llm")."""
+    intent: str
+    confidence: float
+    source: str
+
+    @property
+    def ambiguous(self) -> bool:
+        return self.source == "incerto"
+
+
+def features(text: str) -> List[str]:
+    """Word unigrams, 5-char stems (Italian inflections) and bigrams of the normalized text."""
+    words = normalize_text(text).split()
+    stems = [w[:5] for w in words]
+    return (
+        [f"w:{w}" for w in words]
+        + [f"s:{s}" for s in stems if len(s) >= 4]
+        + [f"b:{a}_{b}" for a, b in zip(stems, stems[1:])]
+    )
+
+
+def rule_intent(text: str) -> Optional[str]:
+    """Intent fixed by the rules, or None if no rule or rules for both intents match."""
+    normalized = normalize_text(text)
+    matched = {intent for intent, patterns in INTENT_RULES.items() if any(p.search(normalized) for p in patterns)}
+    return matched.pop() if len(matched) == 1 else None
+
+
+class IntentModel:
+    """
+    TF-IDF features + logistic regression (probability of "dati").
+
+    Weights, vocabulary and IDF are stored as JSON next to this module;
+    inference is one sparse dot product over the features of the question.
+    """
+
+    def __init__(self, vocabulary: Sequence[str], idf: Sequence[float], weights: Sequence[float], bias: float):
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        self.idf = np.asarray(idf, dtype="float64")
+        self.weights = np.asarray(weights, dtype="float64")
+        self.bias = float(bias)
+
+    def _vector_terms(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        ids = np.unique([self.vocabulary[f] for f in features(text) if f in self.vocabulary]).astype("int64")
+        values = self.idf[ids]
+        norm = np.linalg.norm(values)
+        return ids, values / norm if norm else values
+
+    def probability(self, text: str) -> float:
+        """Probability that ``text`` is a data question."""
+        ids, values = self._vector_terms(text)
+        z = self.bias + float(values @ self.weights[ids])
+        return float(1 / (1 + np.exp(-z)))
+
+    @classmethod
+    def train(cls, texts: Sequence[str], intents: Sequence[str], epochs: int = 2000,
+              learning_rate: float = 2.0, l2: float = 1e-3) -> "IntentModel":
+        """Fit the vocabulary, IDF and weights with full-batch gradient descent."""
+        docs = [set(features(t)) for t in texts]
+        vocabulary = sorted(set().union(*docs))
+        index = {term: i for i, term in enumerate(vocabulary)}
+        x = np.zeros((len(docs), len(vocabulary)))
+        for row, doc in enumerate(docs):
+            x[row, [index[f] for f in doc]] = 1.0
+        idf = np.log((1 + len(docs)) / (1 + x.sum(axis=0))) + 1
+        x *= idf
+        x /= np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+        y = np.asarray([intent == "dati" for intent in intents], dtype="float64")
+        weights, bias = np.zeros(len(vocabulary)), 0.0
+        for _ in range(epochs):
+            error = 1 / (1 + np.exp(-(x @ weights + bias))) - y
+            weights -= learning_rate * (x.T @ error / len(y) + l2 * weights)
+            bias -= learning_rate * error.mean()
+        return cls(vocabulary, idf, weights, bias)
+
+    def to_json(self) -> dict:
+        return {
+            "vocabulary": list(self.vocabulary),
+            "idf": [round(v, 6) for v in self.idf.tolist()],
+            "weights": [round(v, 6) for v in self.weights.tolist()],
+            "bias": round(self.bias, 6),
+        }
+
+    @classmethod
+    def from_json(cls, raw: dict) -> "IntentModel":
+        return cls(raw["vocabulary"], raw["idf"], raw["weights"], raw["bias"])
+
+    def save(self, path: Path = INTENT_MODEL_FILE) -> None:
+        path.write_text(json.dumps(self.to_json(), ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path = INTENT_MODEL_FILE) -> "IntentModel":
+        return cls.from_json(json.loads(path.read_text(encoding="utf-8")))
+
+
+def load_examples(path: Path = INTENT_EXAMPLES_FILE) -> List[dict]:
+    """Labelled questions (JSON lines with "text" and "intent")."""
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+_model: Optional[IntentModel] = None
+
+
+def get_intent_model() -> Optional[IntentModel]:
+    """The persisted model, loaded on first use (None if the weights file is missing)."""
+    global _model
+    if _model is None and INTENT_MODEL_FILE.exists():
+        _model = IntentModel.load()
+    return _model
+
+
+def classify_intent(text: str, confidence: float = INTENT_CONFIDENCE) -> IntentDecision:
+    """
+    Decide the intent locally: rules first, then the linear model. Below
+    ``confidence`` the decision is marked "incerto" (the model's best guess)
+    so the caller can escalate the question to the LLM.
+    """
+    intent = rule_intent(text)
+    if intent is not None:
+        return IntentDecision(intent, 1.0, "regole")
+    model = get_intent_model()
+    if model is None:
+        return IntentDecision("generica", 0.5, "incerto")
+    p = model.probability(text)
+    intent, p_intent = ("dati", p) if p >= 0.5 else ("generica", 1 - p)
+    return IntentDecision(intent, p_intent, "modello" if p_intent >= confidence else "incerto")
+
+
+def classify_with_llm(client, text: str, model: str) -> Optional[str]:
+    """Intent from the LLM classifier prompt, or None if the call fails or the answer is unclear."""
+    try:
+        response = client.models.generate_content(model=model, contents=[INTENT_PROMPT.format(question=text)])
+    except Exception as e:
+        print(f"LLM intent classification failed: {e}")
+        return None
+    label = (getattr(response, "text", None) or "").strip().lower()
+    if "generica" in label:
+        return "generica"
+    if "dati" in label:
+        return "dati"
+    return None
+
+
+def evaluate(examples: Iterable[dict], classify) -> Dict[str, float]:
+    """Accuracy of ``classify(text) -> intent`` on labelled examples."""
+    examples = list(examples)
+    correct = sum(classify(e["text"]) == e["intent"] for e in examples)
+    return {"examples": len(examples), "accuracy": correct / len(examples) if examples else 0.0}
@@ -0,0 +1,103 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+# Thread dedicati all'I/O su disco (change log, compattazione, snapshot, ripristino)
+IO_WORKERS = int(os.getenv("SCHEDULING_IO_WORKERS", "4"))
+
+# Finestra (ms) in cui le scritture ravvicinate vengono accorpate in una sola
+WRITE_COALESCE_MS = int(os.getenv("SCHEDULING_WRITE_COALESCE_MS", "500"))
+
+
+class _Pending:
+    """A coalesced call waiting for its delay: the last submitted arguments win."""
+
+    def __init__(self, call: tuple):
+        self.call = call
+        self.future: Future = Future()
+        self.ready = threading.Event()
+
+
+class IOExecutor:
+    """
+    Thread pool for the storage I/O, so the Streamlit script thread never
+    blocks on Parquet/Excel reads and writes.
+
+    ``submit`` runs a call as soon as a worker is free and returns its
+    future. ``submit_coalesced`` delays the call by the coalescing window:
+    further submissions with the same key before it starts replace its
+    arguments and share its future, so a burst of saves becomes one write.
+    """
+
+    def __init__(self, max_workers: int = IO_WORKERS, coalesce_ms: int = WRITE_COALESCE_MS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scheduling-io")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Pending] = {}
+        self.coalesce_delay = coalesce_ms / 1000
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def submit_coalesced(self, key: str, fn: Callable, *args, delay: Optional[float] = None, **kwargs) -> Future:
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending.call = (fn, args, kwargs)
+                return pending.future
+            pending = _Pending((fn, args, kwargs))
+            self._pending[key] = pending
+        try:
+            self._pool.submit(self._run_pending, key, pending, self.coalesce_delay if delay is None else delay)
+        except RuntimeError:
+            # Pool chiuso: la chiamata non partirà, non deve assorbire le richieste successive
+            with self._lock:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+            raise
+        return pending.future
+
+    def _run_pending(self, key: str, pending: _Pending, delay: float) -> None:
+        # flush() sveglia la chiamata prima della fine della finestra
+        pending.ready.wait(delay)
+        with self._lock:
+            if self._pending.get(key) is pending:
+                del self._pending[key]
+            fn, args, kwargs = pending.call
+        if not pending.future.set_running_or_notify_cancel():
+            return
+        try:
+            pending.future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            pending.future.set_exception(e)
+
+    def pending(self, key: str) -> Optional[Future]:
+        """Future of the coalesced call waiting under ``key``, if any."""
+        with self._lock:
+            pending = self._pending.get(key)
+            return pending.future if pending is not None else None
+
+    def flush(self, key: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """Start the waiting coalesced calls (all, or only ``key``) now and wait for them."""
+        with self._lock:
+            pendings = [p for k, p in self._pending.items() if key is None or k == key]
+        for pending in pendings:
+            pending.ready.set()
+        wait([p.future for p in pendings], timeout=timeout)
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+
+_executor: Optional[IOExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_io_executor() -> IOExecutor:
+    """Process-wide I/O executor, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = IOExecutor()
+        return _executor
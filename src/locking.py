@@ -0,0 +1,62 @@
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    Exclusive inter-process lock on a lock file (flock on POSIX, msvcrt on
+    Windows), re-entrant within the process: nested ``with`` blocks in the
+    same thread take the OS lock only once.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def acquire(self) -> None:
+        self._local.acquire()
+        if self._depth == 0:
+            try:
+                self.path.parent.mkdir(exist_ok=True, parents=True)
+                self._fh = open(self.path, "a+b")
+                if fcntl is not None:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self._fh is not None:
+                    self._fh.close()
+                    self._fh = None
+                self._local.release()
+                raise
+        self._depth += 1
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._fh.seek(0)
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self._fh.close()
+                self._fh = None
+        self._local.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
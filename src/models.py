@@ -1,6 +1,8 @@
-
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 import datetime as dt
+from typing import Optional
+
+import pandas as pd
 
 @dataclass
 class Project:
@@ -11,4 +13,35 @@ class Project:
     start: dt.date
     end: dt.date
 
+    # Colonna del dataset SCHEDULING corrispondente a ciascun campo
+    COLUMNS = {
+        "descr": "PROJECT_DESCR",
+        "client": "CLIENT",
+        "item_type": "ITEM_TYPE",
+        "delivery_type": "DELIVERY_TYPE",
+        "start": "START_DATE",
+        "end": "END_DATE",
+    }
+
+    @classmethod
+    def from_row(cls, row: pd.Series) -> "Project":
+        """Build a Project from one row of the scheduling table."""
+        values = {}
+        for field in fields(cls):
+            value = row.get(cls.COLUMNS[field.name])
+            if field.type is dt.date or field.type == "dt.date":
+                value = None if pd.isna(value) else pd.Timestamp(value).date()
+            else:
+                value = "" if value is None or pd.isna(value) else str(value)
+            values[field.name] = value
+        return cls(**values)
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    """Storage type of one column of the scheduling table (see src/schema.py)."""
+    name: str
+    kind: str  # "category", "string", "int", "date", "allocation"
+    dtype: Optional[str] = None
+
 # Additional dataclasses could go here...
@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models import ColumnSpec, Project
+
+MONTHS = ["gen", "feb", "mar", "apr", "mag", "giu", "lug", "ago", "set", "ott", "nov", "dic"]
+
+# Stringhe ad alta cardinalità (identificativi): Arrow se disponibile
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+
+# Colonne del modello Project: testo come categoria, date come datetime64
+_PROJECT_SPECS = [
+    ColumnSpec(column, "date" if field in ("start", "end") else "category")
+    for field, column in Project.COLUMNS.items()
+]
+
+SCHEMA: List[ColumnSpec] = _PROJECT_SPECS + [
+    # Dimensioni a bassa cardinalità (utenti, PM, stream, stato, ...)
+    ColumnSpec("USER", "category"),
+    ColumnSpec("PM_SM", "category"),
+    ColumnSpec("PM", "category"),
+    ColumnSpec("WORKSTREAM", "category"),
+    ColumnSpec("YEAR_OF_COMPETENCE", "category"),
+    ColumnSpec("PROJECT_STREAM", "category"),
+    ColumnSpec("AREA_CC", "category"),
+    ColumnSpec("JOB", "category"),
+    ColumnSpec("STATUS", "category"),
+    # Identificativi
+    ColumnSpec("SOW_ID", "string"),
+    ColumnSpec("JIRA_KEY", "string"),
+    # Interi piccoli
+    ColumnSpec("YEAR", "int", "int16"),
+    ColumnSpec("PROGRESS_%", "int", "int16"),
+    ColumnSpec("PLANNED_FTE", "int", "int32"),
+    ColumnSpec("ACTUAL_FTE", "int", "int32"),
+]
+
+SCHEMA_BY_NAME: Dict[str, ColumnSpec] = {spec.name: spec for spec in SCHEMA}
+
+# Allocazioni mensili (gen..dic, i derivati gen1..dic1 e il totale): float32, NaN = non pianificato
+ALLOCATION_DTYPE = "float32"
+# Nomi esatti: colonne come "SETTORE" o "MARGINE" restano testo anche se iniziano come un mese
+_ALLOCATION_NAMES = set(MONTHS) | {f"{m}1" for m in MONTHS} | {"tot_sched_next"}
+
+
+def allocation_columns(df: pd.DataFrame) -> List[str]:
+    """Month allocation columns, including the derived '...1' ones and Tot_sched_next."""
+    return [c for c in df.columns if str(c).lower() in _ALLOCATION_NAMES]
+
+
+def _as_category(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        if values.isna().any():
+            if "" not in values.cat.categories:
+                values = values.cat.add_categories([""])
+            values = values.fillna("")
+        return values
+    return values.fillna("").astype(str).astype("category")
+
+
+def _as_string(values: pd.Series) -> pd.Series:
+    if values.dtype == STRING_DTYPE and not values.isna().any():
+        return values
+    return values.fillna("").astype(str).astype(STRING_DTYPE)
+
+
+def _as_int(values: pd.Series, dtype: str) -> pd.Series:
+    if values.dtype == dtype:
+        return values
+    return pd.to_numeric(values, errors="coerce").fillna(0).astype(dtype)
+
+
+def _as_date(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, errors="coerce")
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the scheduling table to its compact in-memory schema.
+
+    Dimensions become categoricals, identifiers Arrow strings, counters
+    small ints, dates datetime64 and the monthly allocations one float32
+    block. Columns that already have the target dtype are left untouched,
+    so applying the schema to an already typed frame is cheap.
+    """
+    for col in df.columns:
+        spec = SCHEMA_BY_NAME.get(col)
+        if spec is None:
+            continue
+        if spec.kind == "category":
+            df[col] = _as_category(df[col])
+        elif spec.kind == "string":
+            df[col] = _as_string(df[col])
+        elif spec.kind == "int":
+            df[col] = _as_int(df[col], spec.dtype)
+        elif spec.kind == "date":
+            df[col] = _as_date(df[col])
+
+    allocations = [c for c in allocation_columns(df) if df[c].dtype != ALLOCATION_DTYPE]
+    if allocations:
+        for col in allocations:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(ALLOCATION_DTYPE)
+        # Ricostruzione del frame: pandas consolida le colonne float32 in un unico blocco 2-D contiguo
+        df = pd.DataFrame({col: df[col] for col in df.columns}, index=df.index)
+    return df
+
+
+def ensure_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Add the missing schema columns (empty / zero) with their schema dtype."""
+    for col in columns:
+        if col in df.columns:
+            continue
+        spec = SCHEMA_BY_NAME.get(col)
+        if spec is None or spec.kind in ("category", "string"):
+            df[col] = ""
+        elif spec.kind == "int":
+            df[col] = 0
+        else:
+            df[col] = pd.NaT
+    return apply_schema(df)
+
+
+def to_editable(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a copy with categorical / Arrow string columns as plain Python strings.
+
+    Used for the small slices shown in st.data_editor, where text cells must
+    accept values outside the existing categories.
+    """
+    out = df.copy()
+    for col in out.columns:
+        if isinstance(out[col].dtype, pd.CategoricalDtype) or out[col].dtype == STRING_DTYPE:
+            out[col] = out[col].astype(object).where(out[col].notna(), "")
+    return out
+
+
+def coerce_new_values(column: pd.Series, values: list) -> Optional[pd.Series]:
+    """
+    Cast values about to be written into ``column`` to a compatible dtype.
+
+    Categoricals get the new values added to their categories and float32
+    allocations stay float32. Returns None for columns without a schema dtype.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        new = pd.Series(["" if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v) for v in values])
+        missing = pd.Index(new.unique()).difference(column.cat.categories)
+        categories = column.cat.categories.append(missing) if len(missing) else column.cat.categories
+        return new.astype(pd.CategoricalDtype(categories))
+    if column.dtype == ALLOCATION_DTYPE:
+        return pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").astype(ALLOCATION_DTYPE)
+    return None
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-column memory footprint (bytes in total and per row), largest first."""
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": usage,
+        "bytes_per_row": usage / rows,
+    })
+    report.loc["TOTAL"] = ["", int(usage.sum()), usage.sum() / rows]
+    return report.sort_values("bytes", ascending=False)
+
+
+def compare_memory(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Side-by-side per-row footprint of the same table before and after apply_schema."""
+    b, a = memory_report(before), memory_report(after)
+    out = pd.DataFrame({
+        "dtype_before": b["dtype"],
+        "dtype_after": a["dtype"].reindex(b.index),
+        "bytes_per_row_before": b["bytes_per_row"].astype("float64").round(1),
+        "bytes_per_row_after": a["bytes_per_row"].reindex(b.index).astype("float64").round(1),
+    })
+    out["ratio"] = (out["bytes_per_row_before"] / out["bytes_per_row_after"]).replace(np.inf, np.nan).round(2)
+    return out
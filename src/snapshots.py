@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.storage import DATA_DIR, atomic_replace
+
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
+
+# Dimensione dei blocchi deduplicati: il change log è append-only, quindi tra due
+# snapshot cambia solo il blocco finale; lo storage principale cambia solo se riscritto
+CHUNK_SIZE = 64 * 1024
+
+# Retention: gli ultimi N snapshot più l'ultimo di ogni giorno per D giorni
+SNAPSHOT_KEEP_LAST = int(os.getenv("SCHEDULING_SNAPSHOT_KEEP_LAST", "50"))
+SNAPSHOT_KEEP_DAYS = int(os.getenv("SCHEDULING_SNAPSHOT_KEEP_DAYS", "30"))
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Manifest of one snapshot: the chunk list of every tracked file (None = file absent)."""
+    snapshot_id: str
+    created: float
+    reason: str
+    files: Dict[str, Optional[dict]]
+
+    @property
+    def size(self) -> int:
+        return sum(entry["size"] for entry in self.files.values() if entry)
+
+    def label(self) -> str:
+        when = datetime.fromtimestamp(self.created).strftime("%d/%m/%Y %H:%M:%S")
+        return f"{when} – {self.reason} ({self.size / 1024:.0f} KB)"
+
+
+class SnapshotStore:
+    """
+    Content-addressed snapshots of the data files.
+
+    Each file is split into fixed-size chunks stored once under
+    ``objects/<sha256>`` (zlib-compressed); a snapshot is a small JSON
+    manifest listing the chunks of each file. Files unchanged since the
+    previous snapshot (same size and mtime) are not even re-read, so a
+    snapshot costs in proportion to the bytes that changed. ``restore``
+    rebuilds the files from their chunks with atomic renames; ``prune``
+    applies the retention policy and drops the chunks no manifest uses.
+    """
+
+    def __init__(self, root: Path = SNAPSHOT_DIR, base_dir: Path = DATA_DIR):
+        self.root = root
+        self.base_dir = base_dir
+        self.objects = root / "objects"
+        self.manifests = root / "manifests"
+        self._lock = threading.Lock()
+        # Ultimo elenco di blocchi per file: (size, mtime_ns) -> chunk, per non rileggere i file invariati
+        self._known: Dict[str, tuple] = {}
+
+    # ---------- oggetti ----------
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def _put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_replace(path) as tmp_path:
+                tmp_path.write_bytes(zlib.compress(data, 1))
+        return digest
+
+    def _get(self, digest: str) -> bytes:
+        return zlib.decompress(self._object_path(digest).read_bytes())
+
+    def _file_entry(self, name: str, path: Path) -> Optional[dict]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        known = self._known.get(name)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        chunks = []
+        with open(path, "rb") as fh:
+            while True:
+                data = fh.read(CHUNK_SIZE)
+                if not data:
+                    break
+                chunks.append(self._put(data))
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunks": chunks}
+        self._known[name] = (stat.st_size, stat.st_mtime_ns, entry)
+        return entry
+
+    # ---------- snapshot ----------
+
+    def take(self, paths: Iterable[Path], reason: str = "manual") -> Snapshot:
+        """Snapshot ``paths`` (files under the data directory)."""
+        with self._lock:
+            if not self._known:
+                self._warm_up()
+            files = {str(path.relative_to(self.base_dir)): None for path in paths}
+            for name in files:
+                files[name] = self._file_entry(name, self.base_dir / name)
+            created = time.time()
+            snapshot_id = f"{datetime.fromtimestamp(created).strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:6]}"
+            snapshot = Snapshot(snapshot_id, created, reason, files)
+            self.manifests.mkdir(parents=True, exist_ok=True)
+            with atomic_replace(self.manifests / f"{snapshot_id}.json") as tmp_path:
+                tmp_path.write_text(json.dumps({
+                    "id": snapshot_id, "created": created, "reason": reason, "files": files,
+                }), encoding="utf-8")
+            return snapshot
+
+    def _warm_up(self) -> None:
+        # Dopo un riavvio: i file invariati dall'ultimo snapshot non vengono riletti
+        latest = self.list()[:1]
+        for name, entry in (latest[0].files.items() if latest else ()):
+            if entry:
+                self._known[name] = (entry["size"], entry["mtime_ns"], entry)
+
+    def list(self) -> List[Snapshot]:
+        """All snapshots, newest first."""
+        if not self.manifests.exists():
+            return []
+        snapshots = []
+        for path in self.manifests.glob("*.json"):
+            try:
+                raw = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+            snapshots.append(Snapshot(raw["id"], raw["created"], raw.get("reason", ""), raw["files"]))
+        return sorted(snapshots, key=lambda s: s.created, reverse=True)
+
+    def get(self, snapshot_id: str) -> Snapshot:
+        for snapshot in self.list():
+            if snapshot.snapshot_id == snapshot_id:
+                return snapshot
+        raise KeyError(f"Unknown snapshot '{snapshot_id}'")
+
+    def restore(self, snapshot_id: str) -> Snapshot:
+        """
+        Rewrite the tracked files as they were in the snapshot (files absent
+        from it are removed). Each file is rebuilt next to its target and
+        renamed into place.
+        """
+        snapshot = self.get(snapshot_id)
+        with self._lock:
+            for name, entry in snapshot.files.items():
+                target = self.base_dir / name
+                if entry is None:
+                    target.unlink(missing_ok=True)
+                    continue
+                with atomic_replace(target) as tmp_path:
+                    with open(tmp_path, "wb") as fh:
+                        for digest in entry["chunks"]:
+                            fh.write(self._get(digest))
+            self._known.clear()
+        return snapshot
+
+    # ---------- retention ----------
+
+    def prune(self, keep_last: int = SNAPSHOT_KEEP_LAST, keep_days: int = SNAPSHOT_KEEP_DAYS,
+              now: Optional[float] = None) -> int:
+        """
+        Keep the newest ``keep_last`` snapshots plus the newest of each day
+        for ``keep_days`` days, then delete the chunks no kept snapshot uses.
+        Returns the number of snapshots removed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            snapshots = self.list()
+            kept, days = set(), set()
+            for i, snapshot in enumerate(snapshots):
+                day = datetime.fromtimestamp(snapshot.created).date()
+                if i < keep_last or (now - snapshot.created < keep_days * 86400 and day not in days):
+                    kept.add(snapshot.snapshot_id)
+                days.add(day)
+            removed = [s for s in snapshots if s.snapshot_id not in kept]
+            for snapshot in removed:
+                (self.manifests / f"{snapshot.snapshot_id}.json").unlink(missing_ok=True)
+            if removed:
+                self._collect_garbage([s for s in snapshots if s.snapshot_id in kept])
+            return len(removed)
+
+    def _collect_garbage(self, kept: List[Snapshot]) -> None:
+        used: Set[str] = {digest for s in kept for entry in s.files.values() if entry for digest in entry["chunks"]}
+        used.update(digest for _, _, entry in self._known.values() for digest in entry["chunks"])
+        if not self.objects.exists():
+            return
+        for path in self.objects.glob("*/*"):
+            if path.name not in used and ".tmp" not in path.name:
+                path.unlink(missing_ok=True)
+
+    def disk_usage(self) -> int:
+        """Bytes used by the stored chunks and manifests."""
+        if not self.root.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.root.rglob("*") if p.is_file())
@@ -0,0 +1,281 @@
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+EXCEL_FILE = DATA_DIR / "SCHEDULING.xlsx"
+PARQUET_FILE = DATA_DIR / "SCHEDULING.parquet"
+LOVS_PARQUET_FILE = DATA_DIR / "LOVS.parquet"
+DATA_DIR.mkdir(exist_ok=True, parents=True)
+
+# Motore di storage scelto da configurazione: "parquet" (default) o "excel"
+STORAGE_ENGINE = os.getenv("SCHEDULING_STORAGE", "parquet").strip().lower()
+
+
+@contextmanager
+def atomic_replace(path: Path) -> Iterator[Path]:
+    """
+    Yield a temporary path next to ``path``; once the block completes the
+    file is synced to disk and renamed over ``path`` in one step, so readers
+    never see a half-written file. On error (or if nothing was written) the
+    temporary file is removed and ``path`` is left as it was.
+    """
+    tmp_path = path.with_name(f"{path.stem}.{uuid.uuid4().hex}.tmp{path.suffix}")
+    try:
+        yield tmp_path
+        if not tmp_path.exists():
+            return
+        with open(tmp_path, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+class StorageEngine:
+    """Base class for the scheduling storage backends."""
+
+    name = "base"
+    path: Path = EXCEL_FILE
+
+    def files(self) -> List[Path]:
+        """Files holding the dataset and the LoVs (what a snapshot has to capture)."""
+        return [self.path]
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def version(self) -> str:
+        """Return a cheap token identifying the on-disk data version (mtime + size)."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return "missing"
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def columns(self) -> List[str]:
+        raise NotImplementedError
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def write_chunks(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """Replace the dataset with the concatenation of ``chunks``. Returns the rows written."""
+        frames = list(chunks)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        self.write(df)
+        return len(df)
+
+    def read_lovs(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def write_lovs(self, lovs: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+
+class ExcelStorage(StorageEngine):
+    """Legacy backend: the whole dataset lives in SCHEDULING.xlsx."""
+
+    name = "excel"
+
+    def __init__(self, path: Path = EXCEL_FILE, sheet_name: str = "Scheduling"):
+        self.path = path
+        self.sheet_name = sheet_name
+
+    def columns(self) -> List[str]:
+        return list(pd.read_excel(self.path, sheet_name=self.sheet_name, nrows=0).columns)
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        usecols = None
+        if columns is not None:
+            wanted = set(columns)
+            usecols = lambda c: c in wanted  # noqa: E731
+        return pd.read_excel(self.path, sheet_name=self.sheet_name, usecols=usecols)
+
+    def write(self, df: pd.DataFrame) -> None:
+        # Load existing LoVs if they exist
+        try:
+            existing_lovs = self.read_lovs()
+        except Exception:
+            existing_lovs = None
+
+        with atomic_replace(self.path) as tmp_path:
+            with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+                df.to_excel(writer, sheet_name=self.sheet_name, index=False)
+                if existing_lovs is not None:
+                    existing_lovs.to_excel(writer, sheet_name="LoVs", index=False)
+
+    def read_lovs(self) -> pd.DataFrame:
+        return pd.read_excel(self.path, sheet_name="LoVs")
+
+    def write_lovs(self, lovs: pd.DataFrame) -> None:
+        with atomic_replace(self.path) as tmp_path:
+            if self.path.exists():
+                # Il foglio LoVs viene sostituito su una copia del workbook, poi rinominata
+                shutil.copy2(self.path, tmp_path)
+                with pd.ExcelWriter(tmp_path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
+                    lovs.to_excel(writer, sheet_name="LoVs", index=False)
+            else:
+                with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+                    lovs.to_excel(writer, sheet_name="LoVs", index=False)
+
+
+class ParquetStorage(StorageEngine):
+    """
+    Columnar backend: the dataset lives in SCHEDULING.parquet and the LoVs
+    in a separate LOVS.parquet, so reads can project only the needed columns
+    and writes never touch the LoVs. If the Parquet file does not exist yet
+    it is bootstrapped from the Excel workbook.
+    """
+
+    name = "parquet"
+
+    def __init__(self, path: Path = PARQUET_FILE, lovs_path: Path = LOVS_PARQUET_FILE,
+                 excel_path: Path = EXCEL_FILE):
+        self.path = path
+        self.lovs_path = lovs_path
+        self.excel_path = excel_path
+
+    def exists(self) -> bool:
+        return self.path.exists() or self.excel_path.exists()
+
+    def files(self) -> List[Path]:
+        return [self.path, self.lovs_path]
+
+    def version(self) -> str:
+        if not self.path.exists() and self.excel_path.exists():
+            return "excel-" + ExcelStorage(self.excel_path).version()
+        return super().version()
+
+    def _ensure_imported(self) -> None:
+        if not self.path.exists() and self.excel_path.exists():
+            import_excel(self.excel_path, storage=self)
+
+    def columns(self) -> List[str]:
+        import pyarrow.parquet as pq
+
+        self._ensure_imported()
+        return list(pq.read_schema(self.path).names)
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        self._ensure_imported()
+        if columns is not None:
+            available = set(self.columns())
+            columns = [c for c in columns if c in available]
+        return pd.read_parquet(self.path, columns=columns)
+
+    def write(self, df: pd.DataFrame) -> None:
+        with atomic_replace(self.path) as tmp_path:
+            _to_parquet_safe(df).to_parquet(tmp_path, index=False)
+
+    def write_chunks(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Stream ``chunks`` into a new Parquet file, one row group per chunk.
+
+        Only one chunk is in memory at a time; the file replaces the current
+        dataset once every chunk has been written.
+        """
+        return write_parquet_chunks(chunks, self.path)
+
+    def read_lovs(self) -> pd.DataFrame:
+        self._ensure_imported()
+        return pd.read_parquet(self.lovs_path)
+
+    def write_lovs(self, lovs: pd.DataFrame) -> None:
+        with atomic_replace(self.lovs_path) as tmp_path:
+            _to_parquet_safe(lovs).to_parquet(tmp_path, index=False)
+
+
+def _to_parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast mixed-type object columns to strings so Arrow can serialize them."""
+    out = df.reset_index(drop=True)
+    for col in out.columns:
+        if out[col].dtype == object:
+            values = out[col]
+            out[col] = values.where(values.isna(), values.astype(str))
+    out.columns = [str(c) for c in out.columns]
+    return out
+
+
+def write_parquet_chunks(chunks: Iterable[pd.DataFrame], path: Path) -> int:
+    """
+    Stream ``chunks`` into a Parquet file at ``path``, one row group per chunk.
+
+    The file is written next to ``path`` and moved into place only once every
+    chunk has been written. Returns the rows written (0 = nothing written).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    with atomic_replace(path) as tmp_path:
+        try:
+            for chunk in chunks:
+                # Le categorie diventano stringhe: ogni chunk ha un dizionario diverso
+                chunk = _to_parquet_safe(chunk.astype({
+                    c: "str" for c in chunk.columns if isinstance(chunk[c].dtype, pd.CategoricalDtype)
+                }))
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                else:
+                    table = table.select(writer.schema.names).cast(writer.schema)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+    return rows
+
+
+_ENGINES = {
+    "excel": ExcelStorage,
+    "parquet": ParquetStorage,
+}
+
+
+def get_storage() -> StorageEngine:
+    """Return the storage engine selected by SCHEDULING_STORAGE."""
+    engine_cls = _ENGINES.get(STORAGE_ENGINE)
+    if engine_cls is None:
+        raise ValueError(
+            f"Unknown SCHEDULING_STORAGE '{STORAGE_ENGINE}'. Available: {', '.join(_ENGINES)}"
+        )
+    return engine_cls()
+
+
+def import_excel(path: Path = EXCEL_FILE, storage: Optional[StorageEngine] = None) -> pd.DataFrame:
+    """Import an Excel workbook (Scheduling + LoVs sheets) into the storage engine."""
+    storage = storage or get_storage()
+    df = pd.read_excel(path, sheet_name="Scheduling")
+    storage.write(df)
+    try:
+        lovs = pd.read_excel(path, sheet_name="LoVs")
+    except Exception:
+        lovs = pd.DataFrame(columns=pd.Index(["Category", "Value"]))
+    storage.write_lovs(lovs)
+    return df
+
+
+def export_excel(path: Path = EXCEL_FILE, storage: Optional[StorageEngine] = None) -> Path:
+    """Export the current dataset and LoVs from the storage engine to an Excel workbook."""
+    storage = storage or get_storage()
+    df = storage.read()
+    try:
+        lovs = storage.read_lovs()
+    except Exception:
+        lovs = None
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        df.to_excel(writer, sheet_name="Scheduling", index=False)
+        if lovs is not None:
+            lovs.to_excel(writer, sheet_name="LoVs", index=False)
+    return path
@@ -0,0 +1,135 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Colonne testuali con indice a trigrammi
+TEXT_INDEXED_COLUMNS = ["PROJECT_DESCR", "USER", "CLIENT", "PM_SM", "JIRA_KEY", "SOW_ID"]
+
+_REGEX_CHARS = set(".^$*+?{}[]\\|()")
+_MAX_CACHED_QUERIES = 256
+
+
+def normalize_text(s) -> str:
+    """Lowercase, strip accents and keep only [a-z0-9 ] (the Chat matching rules)."""
+    s = str(s).lower().strip()
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(c for c in s if not unicodedata.combining(c))
+    s = re.sub(r'[^a-z0-9 ]', '', s)
+    return s
+
+
+def _trigrams(s: str) -> set:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class _ColumnTextIndex:
+    """Trigram postings over the distinct values of one column (raw or normalized)."""
+
+    def __init__(self, values: List[str]):
+        self.values = values
+        postings: Dict[str, List[int]] = {}
+        for value_id, value in enumerate(values):
+            for gram in _trigrams(value):
+                postings.setdefault(gram, []).append(value_id)
+        self.postings = {gram: np.asarray(ids, dtype="int32") for gram, ids in postings.items()}
+
+    def substring(self, needle: str) -> np.ndarray:
+        """Ids of the distinct values containing ``needle``."""
+        if len(needle) < 3:
+            candidates = range(len(self.values))
+        else:
+            grams = sorted(_trigrams(needle), key=lambda g: len(self.postings.get(g, ())))
+            candidates = self.postings.get(grams[0], np.empty(0, dtype="int32"))
+            for gram in grams[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = np.intersect1d(candidates, self.postings.get(gram, ()), assume_unique=True)
+        # Verifica: i trigrammi selezionano i candidati, il match vero è sulla stringa
+        return np.asarray([i for i in candidates if needle in self.values[i]], dtype="int32")
+
+    def regex(self, pattern: "re.Pattern") -> np.ndarray:
+        return np.asarray([i for i, v in enumerate(self.values) if pattern.search(v)], dtype="int32")
+
+
+class TextIndex:
+    """
+    N-gram index over the text dimensions of the scheduling table.
+
+    Substring searches first pick candidate distinct values from the
+    trigram postings, verify them, and only then map the matching values
+    to rows through the column codes. Regex patterns are checked once per
+    distinct value instead of once per row. Built lazily per column and
+    per data version; ``updated`` returns a fresh (lazy) index.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str] = TEXT_INDEXED_COLUMNS):
+        self._df = df
+        self.columns = [c for c in columns if c in df.columns]
+        self._codes: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        self._indexes: Dict[Tuple[str, bool], _ColumnTextIndex] = {}
+        self._queries: Dict[Tuple[str, str, bool], np.ndarray] = {}
+
+    def _column_codes(self, column: str) -> Tuple[np.ndarray, List[str]]:
+        if column not in self._codes:
+            values = self._df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes = values.cat.codes.to_numpy()
+                uniques = [str(v) for v in values.cat.categories]
+            else:
+                codes, uniques = pd.factorize(values)
+                uniques = [str(v) for v in uniques]
+            self._codes[column] = (codes, uniques)
+        return self._codes[column]
+
+    def _column_index(self, column: str, normalized: bool) -> _ColumnTextIndex:
+        key = (column, normalized)
+        if key not in self._indexes:
+            _, uniques = self._column_codes(column)
+            self._indexes[key] = _ColumnTextIndex([normalize_text(v) for v in uniques] if normalized else uniques)
+        return self._indexes[key]
+
+    def matching_value_ids(self, column: str, pattern: str, normalized: bool = False) -> np.ndarray:
+        """Ids (category codes) of the distinct values of ``column`` matching ``pattern``."""
+        key = (column, pattern, normalized)
+        cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+        index = self._column_index(column, normalized)
+        if normalized:
+            # I valori normalizzati contengono solo [a-z0-9 ]: la ricerca è sempre letterale
+            ids = index.substring(normalize_text(pattern))
+        elif any(c in _REGEX_CHARS for c in pattern):
+            ids = index.regex(re.compile(pattern))
+        else:
+            ids = index.substring(pattern)
+        if len(self._queries) >= _MAX_CACHED_QUERIES:
+            self._queries.clear()
+        self._queries[key] = ids
+        return ids
+
+    def matching_values(self, column: str, pattern: str, normalized: bool = False) -> List[str]:
+        _, uniques = self._column_codes(column)
+        return [uniques[i] for i in self.matching_value_ids(column, pattern, normalized)]
+
+    def selectivity(self, column: str, pattern: str, normalized: bool = False) -> float:
+        """Fraction of the distinct values matching ``pattern`` (planner estimate)."""
+        _, uniques = self._column_codes(column)
+        return len(self.matching_value_ids(column, pattern, normalized)) / max(len(uniques), 1)
+
+    def contains(self, column: str, pattern: str, normalized: bool = False,
+                 positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Boolean mask of the rows whose ``column`` contains ``pattern``
+        (restricted to ``positions`` when given).
+        """
+        codes, _ = self._column_codes(column)
+        if positions is not None:
+            codes = codes[positions]
+        return np.isin(codes, self.matching_value_ids(column, pattern, normalized))
+
+    def updated(self, before: pd.DataFrame, after: pd.DataFrame, row_ids: Iterable[int]) -> "TextIndex":
+        # Le colonne vengono reindicizzate pigramente sulla nuova versione
+        return TextIndex(after, self.columns)
@@ -1,6 +1,10 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Optional, Sequence
+from src.data_access import invalidate_shared_data, load_shared_scheduling_data, publish_shared_data
+from src.dataset import ColumnProfiles
+from src.filters import InPredicate, RangePredicate, TextPredicate, evaluate as evaluate_filters
 
 
 def to_fte(days: float) -> float:
@@ -8,51 +12,62 @@ def to_fte(days: float) -> float:
     return days / 20.0
 
 
-def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def filter_positions(
+    df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    profiles: Optional[ColumnProfiles] = None,
+    entity_index=None,
+    text_index=None,
+) -> Optional[np.ndarray]:
     """
-    Adds a widget on top of a dataframe to let viewers filter columns
+    Adds filter widgets on top of a dataframe and returns the matching row positions
+
+    The widgets only collect predicates; src/filters.py orders them by
+    estimated selectivity and evaluates them together, without building a
+    DataFrame per filter.
 
     Args:
         df (pd.DataFrame): Original dataframe
+        columns (Sequence[str], optional): columns offered for filtering (default: all)
+        profiles (ColumnProfiles, optional): column metadata of the dataset
+            version ``df`` comes from (``load_dataset().profiles``); widgets are
+            set up from it without scanning the data. If omitted, columns are
+            profiled on the fly.
+        entity_index (EntityIndex, optional): index built on ``df`` (``load_dataset().index``)
+        text_index (TextIndex, optional): trigram index built on ``df`` (``load_dataset().text_index``)
 
     Returns:
-        pd.DataFrame: Filtered dataframe
+        Optional[np.ndarray]: positions for ``df.iloc``, or None if no filter is active
     """
     modify = st.checkbox("Add filters")
 
     if not modify:
-        return df
-
-    df = df.copy()
-
-    # Try to convert datetimes into a standard format (datetime, no timezone)
-    for col in df.columns:
-        if is_object_dtype(df[col]):
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
+        return None
 
-        if is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.tz_localize(None)
+    # Le date arrivano già come datetime64 senza fuso orario dalla normalizzazione
+    # del dataset (src/schema.py): nessuna conversione delle colonne a ogni rerun
+    if profiles is None:
+        profiles = ColumnProfiles(df)
 
+    predicates = []
     modification_container = st.container()
 
     with modification_container:
-        to_filter_columns = st.multiselect("Filter dataframe on", df.columns)
+        to_filter_columns = st.multiselect("Filter dataframe on", list(columns) if columns is not None else df.columns)
         for column in to_filter_columns:
             left, right = st.columns((1, 20))
-            # Treat columns with < 10 unique values as categorical
-            if is_categorical_dtype(df[column]) or df[column].nunique() < 10:
+            # Tipo, valori distinti e intervallo vengono dal profilo in cache per versione dei dati
+            profile = profiles[column]
+            if profile.kind == "categorical":
                 user_cat_input = right.multiselect(
                     f"Values for {column}",
-                    df[column].unique(),
-                    default=list(df[column].unique()),
+                    profile.values,
+                    default=list(profile.values),
                 )
-                df = df[df[column].isin(user_cat_input)]
-            elif is_numeric_dtype(df[column]):
-                _min = float(df[column].min())
-                _max = float(df[column].max())
+                predicates.append(InPredicate(column, tuple(user_cat_input)))
+            elif profile.kind == "numeric":
+                _min = profile.min
+                _max = profile.max
                 step = (_max - _min) / 100
                 user_num_input = right.slider(
                     f"Values for {column}",
@@ -61,57 +76,66 @@ def filter_dataframe(df: pd.DataFrame) -> pd.DataFrame:
                     value=(_min, _max),
                     step=step,
                 )
-                df = df[df[column].between(*user_num_input)]
-            elif is_datetime64_any_dtype(df[column]):
+                predicates.append(RangePredicate(column, *user_num_input))
+            elif profile.kind == "datetime":
                 user_date_input = right.date_input(
                     f"Values for {column}",
                     value=(
-                        df[column].min(),
-                        df[column].max(),
+                        profile.min,
+                        profile.max,
                     ),
                 )
                 if len(user_date_input) == 2:
                     user_date_input = tuple(map(pd.to_datetime, user_date_input))
                     start_date, end_date = user_date_input
-                    df = df.loc[df[column].between(start_date, end_date)]
+                    predicates.append(RangePredicate(column, start_date, end_date))
             else:
                 user_text_input = right.text_input(
                     f"Substring or regex in {column}",
                 )
                 if user_text_input:
-                    df = df[df[column].astype(str).str.contains(user_text_input)]
+                    predicates.append(TextPredicate(column, user_text_input))
+
+    return evaluate_filters(df, predicates, profiles, entity_index, text_index)
+
+def filter_dataframe(df: pd.DataFrame, profiles: Optional[ColumnProfiles] = None) -> pd.DataFrame:
+    """
+    Adds a widget on top of a dataframe to let viewers filter columns
+
+    Args:
+        df (pd.DataFrame): Original dataframe
+        profiles (ColumnProfiles, optional): cached column metadata, see filter_positions
 
-    return df
+    Returns:
+        pd.DataFrame: Filtered dataframe
+    """
+    positions = filter_positions(df, profiles=profiles)
+    return df if positions is None else df.iloc[positions]
 
 def update_shared_data(df: pd.DataFrame) -> None:
     """
-    Aggiorna i dati condivisi nel session state e invalida il cache
+    Pubblica i dati (già salvati) nella cache condivisa di processo.
+    
+    Non svuota più st.cache_data: le funzioni in cache che dipendono dal dataset
+    ricevono la versione dei dati come argomento e si aggiornano da sole quando
+    cambia, mentre le altre voci in cache restano valide.
     
     Args:
         df (pd.DataFrame): DataFrame da condividere
     """
+    version = publish_shared_data(df)
     if hasattr(st, 'session_state'):
-        st.session_state.shared_scheduling_data = df.copy()
+        st.session_state.data_version = version
         st.session_state.data_last_updated = pd.Timestamp.now()
-        # Invalida il cache per forzare il ricaricamento nelle altre sezioni
-        st.cache_data.clear()
 
 def get_shared_data() -> Optional[pd.DataFrame]:
     """
-    Ottiene i dati condivisi dal session state se disponibili
+    Ottiene i dati condivisi dalla cache di processo se disponibili
     
     Returns:
-        Optional[pd.DataFrame]: DataFrame condiviso o None se non disponibile
+        Optional[pd.DataFrame]: copia superficiale (copy-on-write) del DataFrame condiviso o None se non disponibile
     """
-    try:
-        if hasattr(st, 'session_state') and 'shared_scheduling_data' in st.session_state:
-            shared_data = st.session_state.shared_scheduling_data
-            if shared_data is not None:
-                return shared_data.copy()
-    except Exception as e:
-        print(f"Error loading shared data: {e}")
-    
-    return None
+    return load_shared_scheduling_data()
 
 def show_data_update_info() -> None:
     """
@@ -123,33 +147,11 @@ def show_data_update_info() -> None:
 
 def clear_shared_data() -> None:
     """
-    Pulisce i dati condivisi dal session state
+    Pulisce i dati condivisi dalla cache di processo e dal session state
     """
+    invalidate_shared_data()
     if hasattr(st, 'session_state'):
-        if 'shared_scheduling_data' in st.session_state:
-            del st.session_state.shared_scheduling_data
+        if 'data_version' in st.session_state:
+            del st.session_state.data_version
         if 'data_last_updated' in st.session_state:
             del st.session_state.data_last_updated
-        st.cache_data.clear()
-
-# Import necessari per filter_dataframe
-try:
-    from pandas.api.types import (
-        is_categorical_dtype,
-        is_datetime64_any_dtype,
-        is_numeric_dtype,
-        is_object_dtype,
-    )
-except ImportError:
-    # Fallback per versioni più vecchie di pandas
-    def is_categorical_dtype(obj):
-        return hasattr(obj, 'dtype') and obj.dtype.name == 'category'
-    
-    def is_datetime64_any_dtype(obj):
-        return hasattr(obj, 'dtype') and 'datetime' in str(obj.dtype)
-    
-    def is_numeric_dtype(obj):
-        return hasattr(obj, 'dtype') and obj.dtype in ['int64', 'float64', 'int32', 'float32']
-    
-    def is_object_dtype(obj):
-        return hasattr(obj, 'dtype') and obj.dtype == 'object'